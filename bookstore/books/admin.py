@@ -1,9 +1,14 @@
-from django.contrib import admin
+from django import forms
+from django.contrib import admin, messages
 from import_export import resources, fields
 from import_export.widgets import ForeignKeyWidget, ManyToManyWidget
 from import_export.admin import ImportExportModelAdmin
+from django.shortcuts import redirect
+from django.urls import path
 from django.utils.safestring import mark_safe
-from .models import Category, Product, Attribute, ProductAttributeValue, ProductImage
+from .export import ExportError, FORMATS as STREAM_EXPORT_FORMATS, export_response, with_export_relations
+from .importer import FILE_FORMATS as IMPORT_FILE_FORMATS, ImportFileError, start_import
+from .models import Category, Product, Attribute, ProductAttributeValue, ProductImage, ProductImport
 
 
 class CategoryParentForeignKeyWidget(ForeignKeyWidget):
@@ -81,42 +86,39 @@ class CategoryResource(resources.ModelResource):
         if 'description' not in row or row['description'] is None:
             row['description'] = ''
     
+    def before_import(self, dataset, **kwargs):
+        super().before_import(dataset, **kwargs)
+        # category_id -> tên thuộc tính ghi trong cột 'attributes', xử lý một lần ở after_import
+        self._imported_attributes = {}
+
     def after_save_instance(self, instance, row=None, **kwargs):
         dry_run = kwargs.get('dry_run', False)
         if dry_run:
             return
 
-        # 1. Handle explicit 'attributes' column from Excel (Manual Add)
+        names = []
         if row and ('attributes' in row or 'attributes ' in row): # Check both just in case
             val = row.get('attributes') or row.get('attributes ')
             if val and str(val).strip().lower() not in ['none', 'null', '']:
-                clean_val = str(val).split(';')
-                for raw_name in clean_val:
-                    name = raw_name.strip()
-                    if name:
-                        attr_obj, _ = Attribute.objects.get_or_create(name=name)
-                        instance.attributes.add(attr_obj)
-
-        # 2. PULL: Inherit attributes from Ancestors
-        # Walk up the tree? Or just parent. If parent has it, it implies parent got it from grandparent.
-        if instance.parent:
-            parent_attrs = instance.parent.attributes.all()
-            for attr in parent_attrs:
-                instance.attributes.add(attr)
-        
-        # 3. PUSH: Propagate to ALL Descendants (Recursive)
-        # We need to define a helper function to walk down the tree
-        def propagate_down(category, attributes_to_add):
-            children = category.children.all()
-            for child in children:
-                for attr in attributes_to_add:
-                    child.attributes.add(attr)
-                # Recurse
-                propagate_down(child, attributes_to_add)
+                names = [raw_name.strip() for raw_name in str(val).split(';') if raw_name.strip()]
+        self._imported_attributes.setdefault(instance.pk, set()).update(names)
+
+    def after_import(self, dataset, result, **kwargs):
+        super().after_import(dataset, result, **kwargs)
+        if kwargs.get('dry_run', False) or not getattr(self, '_imported_attributes', None):
+            return
+        from .category_attributes import add_pairs, attributes_by_name, propagate
 
-        my_attrs = instance.attributes.all()
-        if my_attrs.exists():
-            propagate_down(instance, my_attrs)
+        # 1. Thuộc tính ghi trực tiếp trong file (thêm, không xóa thuộc tính cũ)
+        attributes, _ = attributes_by_name(set().union(*self._imported_attributes.values()))
+        add_pairs(
+            (category_id, attributes[name].pk)
+            for category_id, names in self._imported_attributes.items()
+            for name in names
+        )
+        # 2. Kế thừa: các danh mục vừa nhập nhận thuộc tính của tổ tiên và
+        # truyền thuộc tính của mình xuống toàn bộ cây con, bằng một lệnh chèn
+        propagate(list(self._imported_attributes))
 
 
 class ProductResource(resources.ModelResource):
@@ -143,7 +145,8 @@ class ProductResource(resources.ModelResource):
     def dehydrate_attributes_values(self, product):
         # Export format: "AttributeName:Value; AttributeName2:Value2"
         # Matches the expected import format in after_save_instance
-        values = product.attribute_values.select_related('attribute').all()
+        # Dùng .all() để tận dụng prefetch khi xuất (xem books.export)
+        values = product.attribute_values.all()
         return "; ".join([f"{v.attribute.name}:{v.value}" for v in values])
 
     def dehydrate_image(self, product):
@@ -305,6 +308,35 @@ class ProductAdmin(ImportExportModelAdmin):
     readonly_fields = ['created_at', 'updated_at']
     inlines = [ProductAttributeValueInline, ProductImageInline]
     list_per_page = 20
+    import_export_change_list_template = 'admin/books/product/change_list_import_export.html'
+
+    def get_export_queryset(self, request):
+        return with_export_relations(super().get_export_queryset(request))
+
+    def get_urls(self):
+        urls = [
+            path(
+                'stream-export/<str:file_format>/',
+                self.admin_site.admin_view(self.stream_export_view),
+                name='books_product_stream_export',
+            ),
+        ]
+        return urls + super().get_urls()
+
+    def stream_export_view(self, request, file_format):
+        # Xuất toàn bộ (theo bộ lọc đang chọn) theo từng lô, không giới hạn số sản phẩm
+        if not (self.has_export_permission(request) and self.has_view_permission(request)):
+            return redirect('admin:books_product_changelist')
+        try:
+            return export_response(file_format, self.get_export_queryset(request))
+        except ExportError as e:
+            messages.error(request, str(e))
+            return redirect('admin:books_product_changelist')
+
+    def changelist_view(self, request, extra_context=None):
+        extra_context = extra_context or {}
+        extra_context['stream_export_formats'] = STREAM_EXPORT_FORMATS
+        return super().changelist_view(request, extra_context)
 
     def cover_image_thumb(self, obj):
         if obj.cover_image:
@@ -333,3 +365,62 @@ class ProductAdmin(ImportExportModelAdmin):
             "fields": ("created_at", "updated_at")
         }),
     )
+
+
+class ProductImportForm(forms.ModelForm):
+    class Meta:
+        model = ProductImport
+        fields = ['file']
+
+    def clean_file(self):
+        import os
+        file = self.cleaned_data['file']
+        if os.path.splitext(file.name)[1].lower() not in IMPORT_FILE_FORMATS:
+            raise forms.ValidationError("Chỉ nhận file %s." % ", ".join(IMPORT_FILE_FORMATS))
+        return file
+
+
+@admin.register(ProductImport)
+class ProductImportAdmin(admin.ModelAdmin):
+    form = ProductImportForm
+    list_display = ['id', 'file', 'status', 'progress_display', 'created_count', 'updated_count', 'image_count', 'error_count', 'created_at']
+    list_filter = ['status']
+    actions = ['resume']
+
+    def get_fields(self, request, obj=None):
+        if obj is None:
+            return ['file']
+        return ['file', 'status', 'progress_display', 'created_count', 'updated_count', 'image_count',
+                'errors', 'last_error', 'created_by', 'created_at', 'finished_at']
+
+    def get_readonly_fields(self, request, obj=None):
+        return [] if obj is None else self.get_fields(request, obj)
+
+    def progress_display(self, obj):
+        return f"{obj.processed_rows}/{obj.total_rows} ({obj.progress}%)"
+    progress_display.short_description = "Tiến độ"
+
+    def error_count(self, obj):
+        return len(obj.errors)
+    error_count.short_description = "Số dòng lỗi"
+
+    def save_model(self, request, obj, form, change):
+        if not change:
+            obj.created_by = request.user
+        super().save_model(request, obj, form, change)
+        if not change:
+            self._start(request, obj)
+
+    def _start(self, request, obj):
+        try:
+            start_import(obj)
+        except ImportFileError as e:
+            ProductImport.objects.filter(pk=obj.pk).update(last_error=str(e))
+            self.message_user(request, f"{obj}: {e}", messages.ERROR)
+            return False
+        return True
+
+    @admin.action(description="Chạy tiếp các lượt nhập chưa xong")
+    def resume(self, request, queryset):
+        count = sum(1 for obj in queryset.exclude(status='done') if self._start(request, obj))
+        self.message_user(request, f"Đã xếp lại {count} lượt nhập vào hàng đợi.")
@@ -0,0 +1,337 @@
+# books/autocomplete.py
+"""
+Gợi ý tìm kiếm (autocomplete) phục vụ hoàn toàn từ bộ nhớ.
+
+Tên sản phẩm, tên danh mục và tên tác giả được bỏ dấu rồi đưa vào một cây
+tiền tố (trie). Mỗi node giữ sẵn top-K mục phổ biến nhất trong cây con của nó,
+nên tra cứu tiền tố chỉ tốn O(độ dài chuỗi). Khi không đủ kết quả, trie được
+duyệt theo khoảng cách Levenshtein có giới hạn để chịu được lỗi gõ.
+
+Sản phẩm thay đổi được ghi vào một nhật ký chung trong cache (số thứ tự tăng
+dần + id sản phẩm); mỗi tiến trình áp dụng các mục mới vào trie của mình ở lần
+tra cứu kế tiếp, không phải dựng lại. Thay đổi khác (danh mục, tác giả), hoặc
+nhật ký bị mất/quá dài, mới đổi version trong cache để các tiến trình dựng lại
+toàn bộ. add/remove sửa trie tại chỗ nên mọi lần đọc đều giữ _lock.
+"""
+import threading
+import uuid
+from dataclasses import dataclass
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from django.db.models import Count, Sum
+from django.urls import reverse
+
+from .search import fold, tokenize
+
+VERSION_CACHE_KEY = 'books:autocomplete:version'
+LAST_CHANGE_CACHE_KEY = 'books:autocomplete:changes:last'
+CHANGE_CACHE_PREFIX = 'books:autocomplete:changes'
+CHANGE_TIMEOUT = 24 * 3600
+MAX_PENDING_CHANGES = 1000
+TOP_K = 10
+MAX_WORDS_INDEXED = 8
+AUTHOR_ATTRIBUTES = ('tac gia',)
+
+_lock = threading.RLock()
+_index = None
+
+
+@dataclass(frozen=True)
+class Suggestion:
+    label: str
+    kind: str
+    url: str
+    popularity: int = 0
+
+    def as_dict(self):
+        return {'label': self.label, 'type': self.kind, 'url': self.url}
+
+
+class _Node:
+    __slots__ = ('children', 'entries', 'top')
+
+    def __init__(self):
+        self.children = {}
+        self.entries = set()
+        self.top = []
+
+
+def _index_keys(text):
+    """Các khóa tiền tố của một chuỗi: bắt đầu từ mỗi từ (tối đa MAX_WORDS_INDEXED từ)."""
+    words = tokenize(text)[:MAX_WORDS_INDEXED]
+    return [' '.join(words[i:]) for i in range(len(words))]
+
+
+class AutocompleteIndex:
+    def __init__(self, version, applied=0):
+        self.version = version
+        # Số thứ tự của thay đổi cuối cùng trong nhật ký đã có trong trie
+        self.applied = applied
+        self.root = _Node()
+        self.suggestions = {}
+        self._keys = {}
+
+    @property
+    def revision(self):
+        return self.version, self.applied
+
+    # --- Cập nhật ---
+
+    def _rank(self, entry_ids):
+        ordered = sorted(entry_ids, key=lambda e: (-self.suggestions[e].popularity, self.suggestions[e].label))
+        return ordered[:TOP_K]
+
+    def add(self, entry_id, suggestion):
+        if entry_id in self.suggestions:
+            self.remove(entry_id)
+        keys = _index_keys(suggestion.label)
+        if not keys:
+            return
+        self.suggestions[entry_id] = suggestion
+        self._keys[entry_id] = keys
+        for key in keys:
+            node = self.root
+            path = [node]
+            for char in key:
+                node = node.children.setdefault(char, _Node())
+                path.append(node)
+            node.entries.add(entry_id)
+            for step in path:
+                if entry_id not in step.top:
+                    step.top = self._rank(step.top + [entry_id])
+
+    def remove(self, entry_id):
+        for key in self._keys.pop(entry_id, ()):
+            node = self.root
+            path = [node]
+            for char in key:
+                node = node.children.get(char)
+                if node is None:
+                    break
+                path.append(node)
+            else:
+                node.entries.discard(entry_id)
+            # Tính lại top-K từ dưới lên cho các node từng chứa mục này
+            for step in reversed(path):
+                if entry_id in step.top:
+                    candidates = set(step.entries)
+                    for child in step.children.values():
+                        candidates.update(child.top)
+                    candidates.discard(entry_id)
+                    step.top = self._rank(candidates)
+        self.suggestions.pop(entry_id, None)
+
+    # --- Tra cứu ---
+
+    def _prefix_node(self, query):
+        node = self.root
+        for char in query:
+            node = node.children.get(char)
+            if node is None:
+                return None
+        return node
+
+    def _fuzzy_nodes(self, query, max_distance):
+        """Các node có đường đi cách `query` không quá max_distance phép sửa (Levenshtein)."""
+        found = []
+        first_row = list(range(len(query) + 1))
+        stack = [(char, child, first_row) for char, child in self.root.children.items()]
+        while stack:
+            char, node, previous = stack.pop()
+            row = [previous[0] + 1]
+            for i in range(1, len(query) + 1):
+                cost = 0 if query[i - 1] == char else 1
+                row.append(min(row[i - 1] + 1, previous[i] + 1, previous[i - 1] + cost))
+            if row[-1] <= max_distance:
+                # top-K của node đã bao phủ toàn bộ cây con
+                found.append((row[-1], node))
+            elif min(row) <= max_distance:
+                stack.extend((c, child, row) for c, child in node.children.items())
+        return found
+
+    def suggest(self, query, limit=TOP_K):
+        query = ' '.join(tokenize(query))
+        if not query:
+            return []
+        limit = min(limit, TOP_K)
+
+        results = []
+        node = self._prefix_node(query)
+        if node is not None:
+            results.extend(node.top)
+
+        if len(results) < limit and len(query) >= 3:
+            max_distance = 1 if len(query) < 6 else 2
+            candidates = {}
+            for distance, fuzzy_node in self._fuzzy_nodes(query, max_distance):
+                for entry_id in fuzzy_node.top:
+                    if entry_id not in candidates or distance < candidates[entry_id]:
+                        candidates[entry_id] = distance
+            ranked = sorted(
+                (e for e in candidates if e not in results),
+                key=lambda e: (candidates[e], -self.suggestions[e].popularity),
+            )
+            results.extend(ranked)
+
+        return [self.suggestions[e] for e in results[:limit]]
+
+
+# --- Dựng chỉ mục từ DB ---
+
+def _product_popularity(product_ids=None):
+    try:
+        from orders.models import OrderItem
+    except ImportError:
+        return {}
+    sold = OrderItem.objects.all()
+    if product_ids is not None:
+        sold = sold.filter(product_id__in=product_ids)
+    return dict(sold.values_list('product_id').annotate(total=Sum('quantity')).values_list('product_id', 'total'))
+
+
+def _product_suggestion(product, popularity):
+    return Suggestion(
+        label=product.name,
+        kind='product',
+        url=reverse('books:book_detail', args=[product.slug]),
+        popularity=popularity,
+    )
+
+
+def _active_products():
+    from .models import Product
+    return Product.objects.filter(is_active=True, category__is_active=True).only('id', 'name', 'slug')
+
+
+def _build(version, applied):
+    from .models import ProductAttributeValue
+    from .category_tree import get_category_tree
+
+    # `applied` được đọc trước khi đọc DB: các thay đổi ghi sau đó sẽ được áp dụng lại
+    index = AutocompleteIndex(version, applied)
+    popularity = _product_popularity()
+    for product in _active_products().iterator(chunk_size=2000):
+        index.add(('product', product.id), _product_suggestion(product, popularity.get(product.id, 0)))
+
+    tree = get_category_tree()
+    stack = list(tree.roots)
+    while stack:
+        node = stack.pop()
+        index.add(('category', node.id), Suggestion(
+            label=node.name,
+            kind='category',
+            url=reverse('books:category_detail', args=[node.slug]),
+        ))
+        stack.extend(node.children)
+
+    authors = (
+        ProductAttributeValue.objects.filter(product__is_active=True)
+        .values('attribute__name', 'value')
+        .annotate(total=Count('product'))
+    )
+    search_url = reverse('books:book_search')
+    for row in authors:
+        if fold(row['attribute__name']).strip() not in AUTHOR_ATTRIBUTES:
+            continue
+        name = row['value'].strip()
+        key = ('author', fold(name))
+        if not name or key in index.suggestions:
+            continue
+        index.add(key, Suggestion(
+            label=name,
+            kind='author',
+            url=f"{search_url}?{urlencode({'q': name})}",
+            popularity=row['total'],
+        ))
+    return index
+
+
+def _current_version():
+    version = cache.get(VERSION_CACHE_KEY)
+    if version is None:
+        cache.add(VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+        version = cache.get(VERSION_CACHE_KEY)
+    return version
+
+
+def _shared_state():
+    state = cache.get_many([VERSION_CACHE_KEY, LAST_CHANGE_CACHE_KEY])
+    version = state.get(VERSION_CACHE_KEY) or _current_version()
+    return version, state.get(LAST_CHANGE_CACHE_KEY, 0)
+
+
+def _apply_changes(index, last):
+    """Áp dụng các thay đổi (index.applied, last] của nhật ký; False nếu phải dựng lại."""
+    if last < index.applied or last - index.applied > MAX_PENDING_CHANGES:
+        return False
+    keys = [f'{CHANGE_CACHE_PREFIX}:{seq}' for seq in range(index.applied + 1, last + 1)]
+    changes = cache.get_many(keys)
+    if len(changes) != len(keys):
+        return False
+    product_ids = set(changes.values())
+    products = {p.id: p for p in _active_products().filter(id__in=product_ids)}
+    popularity = _product_popularity(list(products)) if products else {}
+    for product_id in product_ids:
+        product = products.get(product_id)
+        if product is None:
+            index.remove(('product', product_id))
+        else:
+            index.add(('product', product_id), _product_suggestion(product, popularity.get(product_id, 0)))
+    index.applied = last
+    return True
+
+
+def get_autocomplete_index():
+    global _index
+    version, last = _shared_state()
+    index = _index
+    if index is not None and index.revision == (version, last):
+        return index
+    with _lock:
+        if _index is not None and _index.version == version and _apply_changes(_index, last):
+            return _index
+        if _index is None or _index.revision != (version, last):
+            _index = _build(version, last)
+        return _index
+
+
+def suggest(query, limit=TOP_K):
+    index = get_autocomplete_index()
+    with _lock:
+        return index.suggest(query, limit)
+
+
+def suggestion_snapshot():
+    """(revision, danh sách gợi ý) của chỉ mục hiện tại."""
+    index = get_autocomplete_index()
+    with _lock:
+        return index.revision, list(index.suggestions.values())
+
+
+def update_products(product_ids):
+    """Ghi các sản phẩm vừa đổi vào nhật ký chung; mỗi tiến trình tự áp dụng ở lần tra cứu sau."""
+    product_ids = list(product_ids)
+    if not product_ids:
+        return
+    if len(product_ids) > MAX_PENDING_CHANGES:
+        invalidate()
+        return
+    cache.add(LAST_CHANGE_CACHE_KEY, 0, None)
+    try:
+        last = cache.incr(LAST_CHANGE_CACHE_KEY, len(product_ids))
+    except ValueError:
+        # Bộ đếm vừa bị xóa khỏi cache: dựng lại cho chắc
+        invalidate()
+        return
+    first = last - len(product_ids) + 1
+    cache.set_many(
+        {f'{CHANGE_CACHE_PREFIX}:{first + i}': product_id for i, product_id in enumerate(product_ids)},
+        CHANGE_TIMEOUT,
+    )
+
+
+def invalidate():
+    global _index
+    cache.set(VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+    _index = None
@@ -0,0 +1,78 @@
+# books/category_attributes.py
+"""
+Kế thừa thuộc tính trong cây danh mục, tính theo tập hợp.
+
+Quy ước: mỗi danh mục phải có đủ thuộc tính của mọi tổ tiên (được lưu thẳng
+vào Category.attributes). Thay vì đi từng danh mục con và add() từng thuộc
+tính, cây con được lấy một lần từ bảng CategoryClosure, các cặp (danh mục,
+thuộc tính) còn thiếu được tính trong bộ nhớ rồi chèn bằng một bulk_create
+vào bảng trung gian M2M. bulk_create không phát m2m_changed nên snapshot cây
+danh mục được làm mới thủ công sau khi commit.
+
+Lệnh `check_category_attributes` dùng missing_pairs() để kiểm tra (và --fix
+để bổ sung) toàn bộ cây; nếu bảng closure lệch, chạy `rebuild_category_tree`
+trước.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+
+from .models import Attribute, Category, CategoryClosure
+
+CategoryAttribute = Category.attributes.through
+
+
+def missing_pairs(category_ids=None):
+    """Các cặp (category_id, attribute_id) còn thiếu trong cây con của `category_ids` (None: cả cây)."""
+    links = CategoryClosure.objects.all()
+    if category_ids is not None:
+        subtree = CategoryClosure.objects.filter(ancestor_id__in=category_ids).values('descendant_id')
+        links = links.filter(descendant_id__in=subtree)
+    ancestors = defaultdict(set)
+    for ancestor_id, descendant_id in links.values_list('ancestor_id', 'descendant_id'):
+        ancestors[descendant_id].add(ancestor_id)
+
+    owned = defaultdict(set)
+    involved = set(ancestors).union(*ancestors.values()) if ancestors else set()
+    for category_id, attribute_id in CategoryAttribute.objects.filter(category_id__in=involved).values_list('category_id', 'attribute_id'):
+        owned[category_id].add(attribute_id)
+
+    missing = set()
+    for category_id, ancestor_ids in ancestors.items():
+        inherited = set().union(*(owned[a] for a in ancestor_ids))
+        missing.update((category_id, attribute_id) for attribute_id in inherited - owned[category_id])
+    return missing
+
+
+def add_pairs(pairs):
+    """Chèn các cặp (category_id, attribute_id) bằng một lệnh bulk; trả về số cặp."""
+    pairs = set(pairs)
+    if not pairs:
+        return 0
+    CategoryAttribute.objects.bulk_create(
+        [CategoryAttribute(category_id=c, attribute_id=a) for c, a in pairs],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+    from .category_tree import invalidate
+    transaction.on_commit(invalidate)
+    return len(pairs)
+
+
+def propagate(category_ids=None):
+    """Bổ sung thuộc tính kế thừa cho cây con của `category_ids` (None: cả cây); trả về số cặp đã thêm."""
+    return add_pairs(missing_pairs(category_ids))
+
+
+def attributes_by_name(names):
+    """
+    ({tên: Attribute}, các tên vừa được tạo) cho các tên; thuộc tính chưa có
+    được tạo bằng một lệnh bulk.
+    """
+    names = set(names)
+    attributes = {a.name: a for a in Attribute.objects.filter(name__in=names)}
+    created = names - attributes.keys()
+    if created:
+        Attribute.objects.bulk_create([Attribute(name=name) for name in created], ignore_conflicts=True)
+        attributes = {a.name: a for a in Attribute.objects.filter(name__in=names)}
+    return attributes, created
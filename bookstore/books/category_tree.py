@@ -0,0 +1,131 @@
+# books/category_tree.py
+"""
+Ảnh chụp (snapshot) bất biến của toàn bộ cây danh mục, dựng một lần và giữ
+trong bộ nhớ tiến trình. Menu header, breadcrumb và thuộc tính kế thừa được
+phục vụ từ snapshot mà không cần truy vấn DB.
+
+Snapshot được gắn một "version" lưu trong Django cache. Khi Category/Attribute
+thay đổi, signal gọi invalidate() để đổi version; mọi tiến trình dùng chung
+cache backend sẽ tự dựng lại snapshot ở request kế tiếp.
+"""
+import threading
+import uuid
+from dataclasses import dataclass, field
+
+from django.core.cache import cache
+
+VERSION_CACHE_KEY = 'books:category_tree:version'
+
+_lock = threading.Lock()
+_snapshot = None
+
+
+@dataclass(frozen=True, eq=False)
+class CategoryNode:
+    id: int
+    name: str
+    slug: str
+    parent_id: int
+    is_active: bool
+    attributes: tuple = ()
+    # Chỉ chứa các danh mục con đang kích hoạt (dùng cho menu)
+    children: tuple = ()
+    parent: 'CategoryNode' = field(default=None, repr=False)
+
+    def __str__(self):
+        return self.name
+
+
+class CategoryTree:
+    def __init__(self, version, nodes):
+        self.version = version
+        self._nodes = nodes
+        self._by_slug = {node.slug: node for node in nodes.values()}
+        self.roots = tuple(
+            node for node in nodes.values() if node.parent_id is None and node.is_active
+        )
+
+    def get(self, category_id):
+        return self._nodes.get(category_id)
+
+    def get_by_slug(self, slug, active_only=True):
+        node = self._by_slug.get(slug)
+        if node is None or (active_only and not node.is_active):
+            return None
+        return node
+
+    def ancestors(self, category_id):
+        """Danh sách tổ tiên, từ gốc đến cha trực tiếp."""
+        node = self._nodes.get(category_id)
+        result = []
+        while node is not None and node.parent is not None:
+            node = node.parent
+            result.append(node)
+        return result[::-1]
+
+    def inherited_attributes(self, category_id):
+        """Thuộc tính của danh mục cùng các thuộc tính kế thừa từ tổ tiên (không trùng lặp)."""
+        node = self._nodes.get(category_id)
+        result = []
+        seen = set()
+        while node is not None:
+            for attr in node.attributes:
+                if attr.pk not in seen:
+                    seen.add(attr.pk)
+                    result.append(attr)
+            node = node.parent
+        return result
+
+
+def _build(version):
+    from .models import Category
+
+    categories = list(
+        Category.objects.order_by('name').prefetch_related('attributes')
+    )
+    nodes = {}
+    for category in categories:
+        nodes[category.id] = CategoryNode(
+            id=category.id,
+            name=category.name,
+            slug=category.slug,
+            parent_id=category.parent_id,
+            is_active=category.is_active,
+            attributes=tuple(category.attributes.all()),
+        )
+
+    children = {}
+    for category in categories:
+        if category.parent_id in nodes and category.is_active:
+            children.setdefault(category.parent_id, []).append(nodes[category.id])
+
+    # Gắn liên kết cha/con một lần duy nhất khi dựng, sau đó node không đổi nữa
+    for node in nodes.values():
+        object.__setattr__(node, 'children', tuple(children.get(node.id, ())))
+        object.__setattr__(node, 'parent', nodes.get(node.parent_id))
+
+    return CategoryTree(version, nodes)
+
+
+def get_category_tree():
+    global _snapshot
+    version = cache.get(VERSION_CACHE_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        cache.add(VERSION_CACHE_KEY, version, None)
+        version = cache.get(VERSION_CACHE_KEY, version)
+
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+
+    with _lock:
+        if _snapshot is None or _snapshot.version != version:
+            _snapshot = _build(version)
+        return _snapshot
+
+
+def invalidate():
+    global _snapshot
+    cache.set(VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+    _snapshot = None
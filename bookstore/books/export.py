@@ -0,0 +1,141 @@
+# books/export.py
+"""
+Xuất danh mục sản phẩm theo luồng, không dựng cả file trong bộ nhớ.
+
+Sản phẩm được đọc theo từng lô EXPORT_CHUNK_SIZE (phân trang theo id, không
+dùng OFFSET), mỗi lô prefetch sẵn danh mục, giá trị thuộc tính và album ảnh
+nên số truy vấn không phụ thuộc số sản phẩm. Các cột giống hệt ProductResource
+(file xuất ra nhập lại được). CSV và JSONL được gửi dần qua
+StreamingHttpResponse; XLSX (cần openpyxl) được ghi ở chế độ write-only ra file
+tạm rồi mới gửi, hoặc ghi sẵn bằng lệnh `export_products`.
+"""
+import csv
+import json
+import tempfile
+
+from django.conf import settings
+from django.db.models import Prefetch
+from django.http import FileResponse, StreamingHttpResponse
+
+from .models import Product, ProductAttributeValue
+
+DEFAULT_EXPORT_CHUNK_SIZE = 500
+
+
+class ExportError(Exception):
+    pass
+
+
+def _chunk_size():
+    return getattr(settings, 'EXPORT_CHUNK_SIZE', DEFAULT_EXPORT_CHUNK_SIZE)
+
+
+def with_export_relations(queryset):
+    return queryset.select_related('category').prefetch_related(None).prefetch_related(
+        Prefetch('attribute_values', queryset=ProductAttributeValue.objects.select_related('attribute').order_by('id')),
+        'images',
+    )
+
+
+def iter_product_chunks(queryset=None, chunk_size=None):
+    """Các lô sản phẩm theo thứ tự id, mỗi lô đã prefetch quan hệ cần xuất."""
+    queryset = with_export_relations(Product.objects.all() if queryset is None else queryset).order_by('id')
+    chunk_size = chunk_size or _chunk_size()
+    last_id = 0
+    while True:
+        chunk = list(queryset.filter(id__gt=last_id)[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        last_id = chunk[-1].id
+
+
+def _resource():
+    from .admin import ProductResource
+    return ProductResource()
+
+
+class _Echo:
+    """Buffer giả cho csv.writer: trả lại chuỗi vừa ghi thay vì lưu lại."""
+
+    def write(self, value):
+        return value
+
+
+def _cell(value):
+    return '' if value is None else value
+
+
+def stream_csv(queryset=None):
+    resource = _resource()
+    writer = csv.writer(_Echo())
+    # BOM để Excel nhận đúng tiếng Việt
+    yield '\ufeff' + writer.writerow(resource.get_export_headers())
+    for chunk in iter_product_chunks(queryset):
+        yield ''.join(writer.writerow([_cell(v) for v in resource.export_resource(p)]) for p in chunk)
+
+
+def stream_jsonl(queryset=None):
+    resource = _resource()
+    headers = resource.get_export_headers()
+    for chunk in iter_product_chunks(queryset):
+        yield ''.join(
+            json.dumps(dict(zip(headers, resource.export_resource(p))), ensure_ascii=False, default=str) + '\n'
+            for p in chunk
+        )
+
+
+def write_xlsx(file, queryset=None):
+    """Ghi file XLSX vào `file` (đường dẫn hoặc file object) ở chế độ write-only."""
+    try:
+        from openpyxl import Workbook
+    except ImportError:
+        raise ExportError("Xuất XLSX cần cài thư viện openpyxl.")
+    resource = _resource()
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Product')
+    sheet.append(resource.get_export_headers())
+    for chunk in iter_product_chunks(queryset):
+        for product in chunk:
+            sheet.append([_cell(v) for v in resource.export_resource(product)])
+    workbook.save(file)
+
+
+STREAM_FORMATS = {
+    'csv': (stream_csv, 'text/csv; charset=utf-8'),
+    'jsonl': (stream_jsonl, 'application/x-ndjson; charset=utf-8'),
+}
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+FORMATS = (*STREAM_FORMATS, 'xlsx')
+
+
+def write_export(file_format, path, queryset=None):
+    if file_format == 'xlsx':
+        write_xlsx(path, queryset)
+        return
+    if file_format not in STREAM_FORMATS:
+        raise ExportError(f"Định dạng không hỗ trợ: {file_format}")
+    stream, _ = STREAM_FORMATS[file_format]
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        for part in stream(queryset):
+            f.write(part)
+
+
+def export_response(file_format, queryset=None, filename='products'):
+    """Response tải file xuất; báo ExportError nếu định dạng không dùng được."""
+    if file_format == 'xlsx':
+        # File tạm tự xóa khi FileResponse đóng nó
+        tmp = tempfile.TemporaryFile()
+        try:
+            write_xlsx(tmp, queryset)
+        except Exception:
+            tmp.close()
+            raise
+        tmp.seek(0)
+        return FileResponse(tmp, as_attachment=True, filename=f'{filename}.xlsx', content_type=XLSX_CONTENT_TYPE)
+    if file_format not in STREAM_FORMATS:
+        raise ExportError(f"Định dạng không hỗ trợ: {file_format}")
+    stream, content_type = STREAM_FORMATS[file_format]
+    response = StreamingHttpResponse(stream(queryset), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{file_format}"'
+    return response
@@ -0,0 +1,192 @@
+# books/facets.py
+"""
+Bộ lọc nhiều chiều (faceted navigation) cho trang danh sách sản phẩm.
+
+Với mỗi danh mục (cả cây con), một FacetIndex được dựng sẵn bằng 2 truy vấn
+và cache lại: mỗi giá trị bộ lọc (giá trị thuộc tính, khoảng giá, đang giảm
+giá, còn hàng) ứng với một bitmap (số nguyên Python) đánh dấu các sản phẩm có
+giá trị đó. Số lượng hiển thị cạnh mỗi lựa chọn chỉ là phép AND + đếm bit trong
+bộ nhớ, nên số truy vấn không tăng theo số bộ lọc đang chọn.
+"""
+import uuid
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import DecimalField, Exists, ExpressionWrapper, F, OuterRef, Q
+
+VERSION_CACHE_KEY = 'books:facets:version'
+INDEX_CACHE_TIMEOUT = 600
+# Bỏ qua thuộc tính có quá nhiều giá trị khác nhau (ISBN, số trang...)
+MAX_ATTRIBUTE_VALUES = 30
+
+PRICE_BUCKETS = [
+    ('0-50000', 'Dưới 50.000đ', 0, 50000),
+    ('50000-100000', '50.000đ - 100.000đ', 50000, 100000),
+    ('100000-200000', '100.000đ - 200.000đ', 100000, 200000),
+    ('200000-500000', '200.000đ - 500.000đ', 200000, 500000),
+    ('500000-', 'Trên 500.000đ', 500000, None),
+]
+
+
+class FacetIndex:
+    def __init__(self, size, groups):
+        self.universe = (1 << size) - 1
+        # groups: [(group_key, label, [(value_key, label, bitmap), ...]), ...]
+        self.groups = groups
+        self._bitmaps = {
+            group_key: {value_key: bitmap for value_key, _, bitmap in values}
+            for group_key, _, values in groups
+        }
+
+    def parse_selection(self, params):
+        """Lấy các lựa chọn hợp lệ từ query string: {group_key: set(value_key)}."""
+        selection = {}
+        for group_key, values in self._bitmaps.items():
+            chosen = {v for v in params.getlist(group_key) if v in values}
+            if chosen:
+                selection[group_key] = chosen
+        return selection
+
+    def _group_mask(self, group_key, chosen):
+        mask = 0
+        for value_key in chosen:
+            mask |= self._bitmaps[group_key][value_key]
+        return mask
+
+    def match_count(self, selection):
+        """Số sản phẩm thỏa mãn toàn bộ lựa chọn."""
+        matched = self.universe
+        for key, chosen in selection.items():
+            matched &= self._group_mask(key, chosen)
+        return matched.bit_count()
+
+    def counts(self, selection):
+        """
+        Danh sách nhóm bộ lọc kèm số sản phẩm cho từng lựa chọn.
+        Trong cùng một nhóm các lựa chọn là OR, giữa các nhóm là AND; số đếm của
+        một nhóm được tính trên kết quả lọc của các nhóm còn lại.
+        """
+        masks = {key: self._group_mask(key, chosen) for key, chosen in selection.items()}
+        result = []
+        for group_key, label, values in self.groups:
+            base = self.universe
+            for other_key, mask in masks.items():
+                if other_key != group_key:
+                    base &= mask
+            chosen = selection.get(group_key, set())
+            options = [
+                {
+                    'key': value_key,
+                    'label': value_label,
+                    'count': (bitmap & base).bit_count(),
+                    'selected': value_key in chosen,
+                }
+                for value_key, value_label, bitmap in values
+            ]
+            options = [o for o in options if o['count'] or o['selected']]
+            if options:
+                result.append({'key': group_key, 'label': label, 'options': options})
+        return result
+
+
+def _final_price(price, discount):
+    if discount > 0:
+        return price * (100 - discount) / 100
+    return price
+
+
+def build_facet_index(category_id=None):
+    from .models import Product, ProductAttributeValue
+
+    products = Product.objects.filter(is_active=True, category__is_active=True)
+    if category_id:
+        products = products.filter(category__ancestor_links__ancestor_id=category_id)
+    rows = list(products.order_by('id').values_list('id', 'price', 'discount_percentage', 'stock'))
+    positions = {row[0]: i for i, row in enumerate(rows)}
+
+    price_bitmaps = {key: 0 for key, _, _, _ in PRICE_BUCKETS}
+    on_sale = in_stock = 0
+    for product_id, price, discount, stock in rows:
+        bit = 1 << positions[product_id]
+        final = _final_price(price, discount)
+        for key, _, low, high in PRICE_BUCKETS:
+            if final >= low and (high is None or final < high):
+                price_bitmaps[key] |= bit
+                break
+        if discount > 0:
+            on_sale |= bit
+        if stock > 0:
+            in_stock |= bit
+
+    attributes = {}
+    values = (
+        ProductAttributeValue.objects.filter(product__in=products)
+        .values_list('product_id', 'attribute_id', 'attribute__name', 'value')
+    )
+    for product_id, attribute_id, attribute_name, value in values:
+        if not value.strip() or product_id not in positions:
+            continue
+        name, bitmaps = attributes.setdefault(attribute_id, (attribute_name, {}))
+        bitmaps[value] = bitmaps.get(value, 0) | (1 << positions[product_id])
+
+    groups = [
+        ('price', 'Khoảng giá', [(key, label, price_bitmaps[key]) for key, label, _, _ in PRICE_BUCKETS]),
+        ('sale', 'Khuyến mãi', [('1', 'Đang giảm giá', on_sale)]),
+        ('stock', 'Tình trạng', [('1', 'Còn hàng', in_stock)]),
+    ]
+    for attribute_id, (name, bitmaps) in sorted(attributes.items(), key=lambda item: item[1][0]):
+        if len(bitmaps) > MAX_ATTRIBUTE_VALUES:
+            continue
+        options = sorted(bitmaps.items(), key=lambda item: (-item[1].bit_count(), item[0]))
+        groups.append((f'attr_{attribute_id}', name, [(value, value, bitmap) for value, bitmap in options]))
+
+    return FacetIndex(len(rows), groups)
+
+
+def get_facet_index(category_id=None):
+    version = cache.get(VERSION_CACHE_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        cache.add(VERSION_CACHE_KEY, version, None)
+        version = cache.get(VERSION_CACHE_KEY, version)
+    key = f"books:facets:{version}:{category_id or 'all'}"
+    index = cache.get(key)
+    if index is None:
+        index = build_facet_index(category_id)
+        cache.set(key, index, INDEX_CACHE_TIMEOUT)
+    return index
+
+
+def invalidate():
+    cache.set(VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+
+
+def apply_selection(queryset, selection):
+    """Áp các bộ lọc đang chọn vào queryset sản phẩm."""
+    from .models import ProductAttributeValue
+
+    if 'price' in selection:
+        queryset = queryset.annotate(final_price=ExpressionWrapper(
+            F('price') * (100 - F('discount_percentage')) / 100,
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        ))
+        price_filter = Q()
+        for key, _, low, high in PRICE_BUCKETS:
+            if key in selection['price']:
+                bucket = Q(final_price__gte=Decimal(low))
+                if high is not None:
+                    bucket &= Q(final_price__lt=Decimal(high))
+                price_filter |= bucket
+        queryset = queryset.filter(price_filter)
+    if 'sale' in selection:
+        queryset = queryset.filter(discount_percentage__gt=0)
+    if 'stock' in selection:
+        queryset = queryset.filter(stock__gt=0)
+    for group_key, chosen in selection.items():
+        if group_key.startswith('attr_'):
+            queryset = queryset.filter(Exists(ProductAttributeValue.objects.filter(
+                product=OuterRef('pk'),
+                attribute_id=int(group_key[len('attr_'):]),
+                value__in=chosen,
+            )))
+    return queryset
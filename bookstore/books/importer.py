@@ -0,0 +1,512 @@
+# books/importer.py
+"""
+Nhập sản phẩm hàng loạt từ file (CSV/XLSX/JSON, cùng cột với file xuất).
+
+Mỗi lượt nhập (ProductImport) chạy nền trong hàng đợi 'product_import' của
+core.jobs, mỗi việc xử lý một lô PRODUCT_IMPORT_BATCH_SIZE dòng rồi xếp việc
+cho lô kế tiếp. Số dòng đã xử lý được lưu cùng transaction với dữ liệu của lô,
+nên worker chết giữa chừng thì việc được nhận lại và chạy tiếp đúng chỗ; việc
+cũ (offset không còn khớp) bị bỏ qua. File nhập chỉ được phân tích một lần
+(khi bắt đầu lượt nhập) thành file JSONL trong storage, mỗi dòng một dòng dữ
+liệu; mỗi lô chỉ đọc lướt tới offset rồi giải mã đúng các dòng của nó.
+
+Trong một lô:
+- danh mục, sản phẩm (khớp theo tên), thuộc tính và giá trị thuộc tính được
+  đọc bằng vài truy vấn IN và ghi bằng bulk_create/bulk_update;
+- ảnh (URL hoặc file trên máy) được tải song song bằng một thread pool giới
+  hạn PRODUCT_IMPORT_IMAGE_WORKERS luồng, mỗi nguồn chỉ tải một lần và được
+  lưu theo mã băm nội dung nên ảnh trùng chỉ có một file; giá trị đã là tên
+  file trong storage (file xuất ra) được dùng lại nguyên trạng.
+
+bulk_create/bulk_update không phát signal, nên sau mỗi lô chỉ mục tìm kiếm,
+gợi ý, bộ lọc và cache trang chủ được làm mới một lần cho cả lô.
+"""
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+from concurrent.futures import ThreadPoolExecutor
+from decimal import InvalidOperation
+from itertools import islice
+
+import requests
+import tablib
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.text import slugify
+from import_export.widgets import BooleanWidget, DecimalWidget, IntegerWidget
+from requests.adapters import HTTPAdapter
+from unidecode import unidecode
+
+from .category_attributes import attributes_by_name
+from .models import Category, Product, ProductAttributeValue, ProductImage, ProductImport
+
+logger = logging.getLogger(__name__)
+
+QUEUE = 'product_import'
+DEFAULT_BATCH_SIZE = 200
+DEFAULT_IMAGE_WORKERS = 8
+IMAGE_TIMEOUT = 10
+MAX_ERRORS_KEPT = 500
+STAGED_DIR = 'imports/products/staged'
+COVER_DIR = 'products/covers'
+GALLERY_DIR = 'products/gallery'
+FILE_FORMATS = {'.csv': 'csv', '.xlsx': 'xlsx', '.json': 'json'}
+
+
+class ImportFileError(Exception):
+    pass
+
+
+def _batch_size():
+    return getattr(settings, 'PRODUCT_IMPORT_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+
+
+# --- Đọc file ---
+
+def load_rows(file_field):
+    """Các dòng của file nhập dưới dạng dict (tên cột đã bỏ khoảng trắng thừa)."""
+    ext = os.path.splitext(file_field.name)[1].lower()
+    file_format = FILE_FORMATS.get(ext)
+    if file_format is None:
+        raise ImportFileError(f"Định dạng file không hỗ trợ: {ext or '(không có đuôi)'}")
+    with file_field.open('rb') as f:
+        content = f.read()
+    if file_format != 'xlsx':
+        content = content.decode('utf-8-sig')
+    try:
+        dataset = tablib.Dataset().load(content, format=file_format)
+    except Exception as e:
+        raise ImportFileError(f"Không đọc được file: {e}")
+    headers = [str(h or '').strip() for h in dataset.headers or []]
+    return [dict(zip(headers, row)) for row in dataset]
+
+
+def _staged_name(product_import):
+    return f"{STAGED_DIR}/{product_import.pk}.jsonl"
+
+
+def stage_rows(product_import):
+    """Phân tích file nhập một lần và ghi các dòng ra file JSONL; trả về số dòng."""
+    rows = load_rows(product_import.file)
+    content = ''.join(json.dumps(row, ensure_ascii=False, default=str) + '\n' for row in rows)
+    name = _staged_name(product_import)
+    default_storage.delete(name)
+    default_storage.save(name, ContentFile(content.encode('utf-8')))
+    return len(rows)
+
+
+def staged_rows(product_import, offset, limit):
+    """Các dòng [offset, offset + limit) từ file JSONL (tạo lại nếu chưa có)."""
+    name = _staged_name(product_import)
+    if not default_storage.exists(name):
+        stage_rows(product_import)
+    with default_storage.open(name, 'rb') as f:
+        return [json.loads(line) for line in islice(f, offset, offset + limit)]
+
+
+def _discard_staged(product_import):
+    default_storage.delete(_staged_name(product_import))
+
+
+def _text(value):
+    return '' if value is None else str(value).strip()
+
+
+def _split(value, separator=';'):
+    return [part.strip() for part in _text(value).split(separator) if part.strip()]
+
+
+def parse_attribute_values(value):
+    """"Màu sắc:Đỏ; Kích thước:XL" -> [('Màu sắc', 'Đỏ'), ('Kích thước', 'XL')]"""
+    pairs = []
+    for part in _split(value):
+        if ':' in part:
+            name, val = (x.strip() for x in part.split(':', 1))
+            if name and val:
+                pairs.append((name, val))
+    return pairs
+
+
+# --- Tải ảnh ---
+
+def _is_url(source):
+    return source.lower().startswith(('http://', 'https://'))
+
+
+class ImageFetcher:
+    """Tải ảnh song song; mỗi (nguồn, thư mục) chỉ tải một lần trong vòng đời fetcher."""
+
+    def __init__(self, workers=None, timeout=IMAGE_TIMEOUT):
+        self.workers = workers or getattr(settings, 'PRODUCT_IMPORT_IMAGE_WORKERS', DEFAULT_IMAGE_WORKERS)
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.workers, pool_maxsize=self.workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.stored = {}
+        self.downloaded = 0
+
+    def _read(self, source):
+        if _is_url(source):
+            response = self.session.get(source, timeout=self.timeout)
+            if response.status_code != 200:
+                return None, None
+            return response.content, response.headers.get('Content-Type', '')
+        if os.path.isfile(source):
+            with open(source, 'rb') as f:
+                return f.read(), ''
+        return None, None
+
+    def _fetch(self, source, directory):
+        try:
+            content, content_type = self._read(source)
+        except (requests.RequestException, OSError) as e:
+            logger.warning("Không tải được ảnh %s: %s", source, e)
+            return None
+        if not content:
+            return None
+        ext = os.path.splitext(source.split('?')[0])[1].lower()
+        if not ext or len(ext) > 5:
+            ext = mimetypes.guess_extension(content_type.split(';')[0].strip()) or '.jpg'
+        # Đặt tên theo nội dung: cùng một ảnh từ nhiều nguồn chỉ lưu một file
+        name = f"{directory}/{hashlib.sha256(content).hexdigest()[:32]}{ext}"
+        if not default_storage.exists(name):
+            name = default_storage.save(name, ContentFile(content))
+        return name
+
+    def fetch_all(self, requests_):
+        """requests_: các cặp (nguồn, thư mục); trả về {(nguồn, thư mục): tên file hoặc None}."""
+        pending = [key for key in dict.fromkeys(requests_) if key not in self.stored]
+        if pending:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                for key, name in zip(pending, pool.map(lambda key: self._fetch(*key), pending)):
+                    self.stored[key] = name
+                    if name:
+                        self.downloaded += 1
+        return {key: self.stored[key] for key in requests_}
+
+    def close(self):
+        self.session.close()
+
+
+def _resolve_image(source, directory, fetched):
+    """Tên file cho một giá trị ảnh: ảnh vừa tải, hoặc tên file sẵn có trong storage."""
+    if (source, directory) in fetched:
+        return fetched[(source, directory)]
+    return source if default_storage.exists(source) else None
+
+
+def _needs_fetch(source):
+    return _is_url(source) or (not default_storage.exists(source) and os.path.isfile(source))
+
+
+# --- Xử lý một lô ---
+
+class _Batch:
+    def __init__(self, rows, first_row, fetcher):
+        self.rows = rows
+        self.first_row = first_row
+        self.fetcher = fetcher
+        self.errors = []
+        self.created = 0
+        self.updated = 0
+
+    def error(self, index, message):
+        self.errors.append({'row': self.first_row + index + 1, 'message': message})
+
+    def prepare(self):
+        """Kiểm tra các dòng và tải ảnh (ngoài transaction)."""
+        categories = {c.name: c for c in Category.objects.filter(name__in={_text(r.get('category')) for r in self.rows})}
+        names = {_text(r.get('name')) for r in self.rows}
+        existing = {}
+        duplicates = set()
+        for product in Product.objects.filter(name__in=names):
+            if product.name in existing:
+                duplicates.add(product.name)
+            existing[product.name] = product
+
+        items = []
+        for index, row in enumerate(self.rows):
+            item = self._clean_row(index, row, categories, existing, duplicates)
+            if item is not None:
+                items.append(item)
+        self.items = self._merge_new_rows(items)
+        self.errors.sort(key=lambda error: error['row'])
+
+        wanted = []
+        for item in self.items:
+            if item['cover'] and _needs_fetch(item['cover']):
+                wanted.append((item['cover'], COVER_DIR))
+            wanted.extend((source, GALLERY_DIR) for source in item['album'] if _needs_fetch(source))
+        self.fetched = self.fetcher.fetch_all(wanted)
+
+    def save(self):
+        """Ghi sản phẩm, giá trị thuộc tính và album; trả về (id sản phẩm, có tạo thuộc tính mới không)."""
+        products = self._save_products(self.items, self.fetched)
+        attributes_created = self._save_attribute_values(self.items, products)
+        self._save_album(self.items, products, self.fetched)
+        return [p.pk for p in products], attributes_created
+
+    def _clean_row(self, index, row, categories, existing, duplicates):
+        name = _text(row.get('name'))
+        if not name:
+            self.error(index, "Thiếu tên sản phẩm.")
+            return None
+        if name in duplicates:
+            self.error(index, f"Có nhiều sản phẩm cùng tên \"{name}\".")
+            return None
+        product = existing.get(name)
+        values = {}
+        try:
+            if 'category' in row and _text(row['category']):
+                category = categories.get(_text(row['category']))
+                if category is None:
+                    self.error(index, f"Không có danh mục \"{_text(row['category'])}\".")
+                    return None
+                values['category'] = category
+            for field, widget in (('price', DecimalWidget()), ('discount_percentage', IntegerWidget()),
+                                  ('stock', IntegerWidget()), ('is_active', BooleanWidget())):
+                if field in row:
+                    value = widget.clean(row[field])
+                    if value is not None:
+                        values[field] = value
+        except (ValueError, InvalidOperation):
+            self.error(index, "Giá, giảm giá, tồn kho hoặc trạng thái không hợp lệ.")
+            return None
+        if 'description' in row:
+            values['description'] = _text(row['description'])
+        return {
+            'index': index,
+            'name': name,
+            'product': product,
+            'slug': _text(row.get('slug')),
+            'values': values,
+            'cover': _text(row.get('cover_image')),
+            'attributes': parse_attribute_values(row.get('attributes-values')),
+            'album': _split(row.get('image')),
+        }
+
+    def _merge_new_rows(self, items):
+        """
+        Gộp các dòng cùng tên của một sản phẩm chưa có: dòng sau ghi đè giá trị và
+        ảnh bìa của dòng trước, các dòng sau trỏ về dòng đầu. Sau khi gộp mà vẫn
+        thiếu danh mục hoặc giá thì mọi dòng của tên đó bị báo lỗi.
+        """
+        groups = {}
+        for item in items:
+            if item['product'] is None:
+                groups.setdefault(item['name'], []).append(item)
+        rejected = set()
+        for group in groups.values():
+            first = group[0]
+            for later in group[1:]:
+                first['values'].update(later['values'])
+                if later['cover']:
+                    first['cover'] = later['cover']
+                later['product'] = first
+            if 'category' not in first['values'] or 'price' not in first['values']:
+                for item in group:
+                    self.error(item['index'], "Sản phẩm mới cần có danh mục và giá.")
+                    rejected.add(item['index'])
+        return [item for item in items if item['index'] not in rejected]
+
+    def _unique_slugs(self, items):
+        bases = {item['name']: item['slug'] or slugify(unidecode(item['name'])) or 'product' for item in items}
+        query = Q()
+        for base in set(bases.values()):
+            query |= Q(slug__startswith=base)
+        taken = set(Product.objects.filter(query).values_list('slug', flat=True)) if bases else set()
+        slugs = {}
+        for name, base in bases.items():
+            slug, i = base, 1
+            while slug in taken:
+                slug, i = f"{base}-{i}", i + 1
+            taken.add(slug)
+            slugs[name] = slug
+        return slugs
+
+    def _save_products(self, items, fetched):
+        now = timezone.now()
+        # Các dòng cùng tên của sản phẩm mới đã được gộp vào dòng đầu (_merge_new_rows)
+        slugs = self._unique_slugs([item for item in items if item['product'] is None])
+
+        to_create, to_update, update_fields = [], [], {'updated_at'}
+        for item in items:
+            product = item['product']
+            if isinstance(product, dict):
+                continue
+            cover = _resolve_image(item['cover'], COVER_DIR, fetched) if item['cover'] else None
+            if product is None:
+                product = Product(name=item['name'], slug=slugs[item['name']], **item['values'])
+                if cover:
+                    product.cover_image = cover
+                item['product'] = product
+                to_create.append(product)
+                continue
+            for field, value in item['values'].items():
+                setattr(product, field, value)
+                update_fields.add(field)
+            if cover:
+                product.cover_image = cover
+                update_fields.add('cover_image')
+            product.updated_at = now
+            if product not in to_update:
+                to_update.append(product)
+        for item in items:
+            if isinstance(item['product'], dict):
+                item['product'] = item['product']['product']
+
+        Product.objects.bulk_create(to_create, batch_size=500)
+        if to_update:
+            Product.objects.bulk_update(to_update, sorted(update_fields), batch_size=500)
+        self.created += len(to_create)
+        self.updated += len(to_update)
+        return to_create + to_update
+
+    def _save_attribute_values(self, items, products):
+        names = {name for item in items for name, _ in item['attributes']}
+        if not names:
+            return False
+        attributes, created = attributes_by_name(names)
+
+        wanted = {}
+        for item in items:
+            for name, value in item['attributes']:
+                wanted[(item['product'].pk, attributes[name].pk)] = value
+        current = {
+            (v.product_id, v.attribute_id): v
+            for v in ProductAttributeValue.objects.filter(
+                product__in=[p.pk for p in products], attribute__in=[a.pk for a in attributes.values()],
+            )
+        }
+        to_create, to_update = [], []
+        for (product_id, attribute_id), value in wanted.items():
+            existing = current.get((product_id, attribute_id))
+            if existing is None:
+                to_create.append(ProductAttributeValue(product_id=product_id, attribute_id=attribute_id, value=value))
+            elif existing.value != value:
+                existing.value = value
+                to_update.append(existing)
+        ProductAttributeValue.objects.bulk_create(to_create, batch_size=500)
+        ProductAttributeValue.objects.bulk_update(to_update, ['value'], batch_size=500)
+        return bool(created)
+
+    def _save_album(self, items, products, fetched):
+        current = set(ProductImage.objects.filter(product__in=[p.pk for p in products]).values_list('product_id', 'image'))
+        to_create = []
+        for item in items:
+            for source in item['album']:
+                name = _resolve_image(source, GALLERY_DIR, fetched)
+                key = (item['product'].pk, name)
+                # Nhập lại cùng file không tạo thêm ảnh trùng
+                if name and key not in current:
+                    current.add(key)
+                    to_create.append(ProductImage(product_id=item['product'].pk, image=name))
+        ProductImage.objects.bulk_create(to_create, batch_size=500)
+
+
+def _refresh_derived(product_ids, attributes_created):
+    """Thay cho các signal mà bulk_create/bulk_update bỏ qua."""
+    from core.models import HOME_BOOK_SECTIONS
+    from core.section_cache import invalidate as invalidate_sections
+    from .autocomplete import update_products as update_suggestions
+    from .category_tree import invalidate as invalidate_category_tree
+    from .facets import invalidate as invalidate_facets
+    from .search import get_search_backend
+
+    def refresh():
+        get_search_backend().index_products(product_ids)
+        update_suggestions(product_ids)
+        invalidate_facets()
+        invalidate_sections(*HOME_BOOK_SECTIONS)
+        if attributes_created:
+            invalidate_category_tree()
+
+    transaction.on_commit(refresh)
+
+
+def process_batch(import_id, offset, fetcher=None):
+    """Xử lý lô bắt đầu từ dòng `offset`; trả về offset lô kế tiếp, hoặc None nếu đã xong/việc đã cũ."""
+    product_import = ProductImport.objects.get(pk=import_id)
+    if product_import.status == 'done' or product_import.processed_rows != offset:
+        return None
+    if not product_import.total_rows:
+        product_import.total_rows = stage_rows(product_import)
+    batch_rows = staged_rows(product_import, offset, _batch_size())
+    owns_fetcher = fetcher is None
+    fetcher = fetcher or ImageFetcher()
+    downloaded_before = fetcher.downloaded
+    try:
+        batch = _Batch(batch_rows, offset, fetcher)
+        batch.prepare()
+        with transaction.atomic():
+            locked = ProductImport.objects.select_for_update().get(pk=import_id)
+            if locked.processed_rows != offset:
+                return None
+            product_ids, attributes_created = batch.save()
+            locked.processed_rows = offset + len(batch_rows)
+            locked.total_rows = product_import.total_rows
+            locked.created_count += batch.created
+            locked.updated_count += batch.updated
+            locked.image_count += fetcher.downloaded - downloaded_before
+            locked.errors = (locked.errors + batch.errors)[:MAX_ERRORS_KEPT]
+            locked.last_error = ''
+            finished = locked.processed_rows >= locked.total_rows
+            locked.status = 'done' if finished else 'running'
+            if finished:
+                locked.finished_at = timezone.now()
+                transaction.on_commit(lambda: _discard_staged(locked))
+            locked.save()
+            if product_ids:
+                _refresh_derived(product_ids, attributes_created)
+    finally:
+        if owns_fetcher:
+            fetcher.close()
+    return None if finished else locked.processed_rows
+
+
+def start_import(product_import):
+    """Phân tích file và xếp việc chạy nền cho lượt nhập; báo ImportFileError nếu file hỏng."""
+    from core.jobs import enqueue
+
+    product_import.total_rows = stage_rows(product_import)
+    product_import.save(update_fields=['total_rows'])
+    transaction.on_commit(lambda: enqueue(QUEUE, {'import_id': product_import.pk, 'offset': product_import.processed_rows}))
+
+
+def run_import_jobs(payloads):
+    """Hàm xử lý hàng đợi 'product_import': mỗi việc là một lô, xong thì xếp việc cho lô sau."""
+    from core.jobs import enqueue
+
+    errors = []
+    for payload in payloads:
+        try:
+            next_offset = process_batch(payload['import_id'], payload['offset'])
+        except Exception as e:
+            logger.exception("Product import %s failed at row %s", payload['import_id'], payload['offset'])
+            ProductImport.objects.filter(pk=payload['import_id']).update(last_error=str(e))
+            errors.append(e)
+            continue
+        if next_offset is not None:
+            enqueue(QUEUE, {'import_id': payload['import_id'], 'offset': next_offset})
+        errors.append(None)
+    return errors
+
+
+def run_import(product_import):
+    """Chạy hết lượt nhập ngay trong tiến trình hiện tại (lệnh import_products); dùng lại một fetcher."""
+    fetcher = ImageFetcher()
+    try:
+        offset = product_import.processed_rows
+        while offset is not None:
+            offset = process_batch(product_import.pk, offset, fetcher)
+    finally:
+        fetcher.close()
+    product_import.refresh_from_db()
+    return product_import
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from books.category_attributes import add_pairs, missing_pairs
+from books.models import Attribute, Category
+
+
+class Command(BaseCommand):
+    help = "Kiểm tra mỗi danh mục có đủ thuộc tính của các danh mục tổ tiên; --fix để bổ sung."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help="Thêm các thuộc tính còn thiếu.")
+
+    def handle(self, *args, **options):
+        missing = missing_pairs()
+        if not missing:
+            self.stdout.write(self.style.SUCCESS("Thuộc tính kế thừa của cây danh mục đã đầy đủ."))
+            return
+
+        categories = dict(Category.objects.filter(pk__in={c for c, _ in missing}).values_list('pk', 'name'))
+        attributes = dict(Attribute.objects.filter(pk__in={a for _, a in missing}).values_list('pk', 'name'))
+        for category_id, attribute_id in sorted(missing):
+            self.stdout.write(f"- {categories[category_id]}: thiếu \"{attributes[attribute_id]}\"")
+
+        if options['fix']:
+            count = add_pairs(missing)
+            self.stdout.write(self.style.SUCCESS(f"Đã bổ sung {count} thuộc tính kế thừa."))
+        else:
+            self.stdout.write(self.style.WARNING(f"Thiếu {len(missing)} thuộc tính kế thừa; chạy lại với --fix để bổ sung."))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from books.export import FORMATS, ExportError, write_export
+
+
+class Command(BaseCommand):
+    help = "Xuất toàn bộ sản phẩm ra file (CSV/JSONL/XLSX) theo từng lô, bộ nhớ không tăng theo số sản phẩm."
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help="Đường dẫn file xuất")
+        parser.add_argument('--format', dest='file_format', choices=FORMATS, default='csv')
+
+    def handle(self, *args, **options):
+        try:
+            write_export(options['file_format'], options['output'])
+        except ExportError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(f"Đã xuất sản phẩm ra {options['output']}."))
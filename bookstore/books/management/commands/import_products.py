@@ -0,0 +1,41 @@
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+
+from books.importer import ImportFileError, run_import, start_import
+from books.models import ProductImport
+
+
+class Command(BaseCommand):
+    help = "Nhập sản phẩm hàng loạt từ file CSV/XLSX/JSON (cùng cột với file xuất)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', help="File cần nhập")
+        parser.add_argument('--resume', type=int, metavar='ID', help="Chạy tiếp lượt nhập có id này thay vì tạo lượt mới.")
+        parser.add_argument('--background', action='store_true', help="Chỉ xếp vào hàng đợi cho run_workers thay vì chạy ngay.")
+
+    def handle(self, *args, **options):
+        if options['resume']:
+            try:
+                product_import = ProductImport.objects.get(pk=options['resume'])
+            except ProductImport.DoesNotExist:
+                raise CommandError(f"Không có lượt nhập #{options['resume']}.")
+        elif options['path']:
+            with open(options['path'], 'rb') as f:
+                product_import = ProductImport(file=File(f, name=options['path'].replace('\\', '/').split('/')[-1]))
+                product_import.save()
+        else:
+            raise CommandError("Cần đường dẫn file hoặc --resume ID.")
+
+        try:
+            if options['background']:
+                start_import(product_import)
+                self.stdout.write(self.style.SUCCESS(f"Đã xếp {product_import} vào hàng đợi product_import."))
+                return
+            product_import = run_import(product_import)
+        except ImportFileError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(
+            f"{product_import}: {product_import.processed_rows}/{product_import.total_rows} dòng, "
+            f"{product_import.created_count} sản phẩm mới, {product_import.updated_count} cập nhật, "
+            f"{product_import.image_count} ảnh, {len(product_import.errors)} dòng lỗi."
+        ))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from books.models import CategoryClosure
+
+
+class Command(BaseCommand):
+    help = "Dựng lại bảng closure (tổ tiên/hậu duệ) của cây danh mục từ cột parent."
+
+    def handle(self, *args, **options):
+        count = CategoryClosure.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Đã dựng lại {count} quan hệ danh mục."))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from books.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Dựng lại toàn bộ chỉ mục tìm kiếm sản phẩm."
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        count = backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f"Đã đánh chỉ mục {count} sản phẩm ({backend.__class__.__name__})."
+        ))
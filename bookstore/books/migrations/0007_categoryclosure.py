@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_closure(apps, schema_editor):
+    Category = apps.get_model('books', 'Category')
+    CategoryClosure = apps.get_model('books', 'CategoryClosure')
+    parents = dict(Category.objects.values_list('id', 'parent_id'))
+    links = []
+    for category_id in parents:
+        node, depth, seen = category_id, 0, set()
+        while node is not None and node not in seen:
+            seen.add(node)
+            links.append(CategoryClosure(ancestor_id=node, descendant_id=category_id, depth=depth))
+            node = parents.get(node)
+            depth += 1
+    CategoryClosure.objects.bulk_create(links, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0006_category_is_active'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryClosure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('depth', models.PositiveIntegerField(default=0, verbose_name='Độ sâu')),
+                ('ancestor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='descendant_links', to='books.category', verbose_name='Tổ tiên')),
+                ('descendant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ancestor_links', to='books.category', verbose_name='Hậu duệ')),
+            ],
+            options={
+                'verbose_name': 'Quan hệ danh mục',
+                'verbose_name_plural': 'Quan hệ danh mục',
+                'indexes': [models.Index(fields=['descendant', 'depth'], name='books_categ_descend_2b15fa_idx')],
+                'unique_together': {('ancestor', 'descendant')},
+            },
+        ),
+        migrations.RunPython(build_closure, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+from django.db import migrations
+from unidecode import unidecode
+
+
+def _fold(text):
+    return unidecode(text or '').lower()
+
+
+def create_fts_index(apps, schema_editor):
+    # Chỉ áp dụng cho SQLite; các DB khác dùng SimpleSearchBackend
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    Product = apps.get_model('books', 'Product')
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS books_product_fts USING fts5("
+            "product_id UNINDEXED, name, description, attributes, tokenize = 'unicode61')"
+        )
+        rows = []
+        for product in Product.objects.prefetch_related('attribute_values__attribute'):
+            attributes = ' '.join(f"{v.attribute.name} {v.value}" for v in product.attribute_values.all())
+            rows.append((product.id, _fold(product.name), _fold(product.description), _fold(attributes)))
+        cursor.executemany(
+            "INSERT INTO books_product_fts (product_id, name, description, attributes) VALUES (%s, %s, %s, %s)",
+            rows,
+        )
+
+
+def drop_fts_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("DROP TABLE IF EXISTS books_product_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0007_categoryclosure'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_index, drop_fts_index),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0008_product_fts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='rating_average',
+            field=models.FloatField(db_index=True, default=0, editable=False, verbose_name='Điểm trung bình'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Số đánh giá'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_star_1',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Số đánh giá 1 sao'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_star_2',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Số đánh giá 2 sao'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_star_3',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Số đánh giá 3 sao'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_star_4',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Số đánh giá 4 sao'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_star_5',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Số đánh giá 5 sao'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Tổng điểm đánh giá'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:53
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0009_product_rating_summary'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductImport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file', models.FileField(help_text='CSV, XLSX hoặc JSON với các cột như file xuất sản phẩm.', upload_to='imports/products/', verbose_name='File dữ liệu')),
+                ('status', models.CharField(choices=[('pending', 'Chờ chạy'), ('running', 'Đang chạy'), ('done', 'Hoàn tất')], default='pending', max_length=20, verbose_name='Trạng thái')),
+                ('total_rows', models.PositiveIntegerField(default=0, verbose_name='Tổng số dòng')),
+                ('processed_rows', models.PositiveIntegerField(default=0, verbose_name='Số dòng đã xử lý')),
+                ('created_count', models.PositiveIntegerField(default=0, verbose_name='Sản phẩm mới')),
+                ('updated_count', models.PositiveIntegerField(default=0, verbose_name='Sản phẩm cập nhật')),
+                ('image_count', models.PositiveIntegerField(default=0, verbose_name='Ảnh đã tải')),
+                ('errors', models.JSONField(blank=True, default=list, verbose_name='Lỗi theo dòng')),
+                ('last_error', models.TextField(blank=True, verbose_name='Lỗi gần nhất')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Ngày tạo')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Hoàn tất lúc')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Người tạo')),
+            ],
+            options={
+                'verbose_name': 'Lượt nhập sản phẩm',
+                'verbose_name_plural': 'Nhập sản phẩm hàng loạt',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -1,4 +1,9 @@
-from django.db import models
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import F
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
 from django.utils.text import slugify
 from unidecode import unidecode
 from ckeditor_uploader.fields import RichTextUploadingField
@@ -39,12 +44,17 @@ class Category(models.Model):
         unique_together = ('slug', 'parent',)
 
     def __str__(self):
-        full_path = [self.name]
-        k = self.parent
-        while k is not None:
-            full_path.append(k.name)
-            k = k.parent
-        return ' -> '.join(full_path[::-1])
+        full_path = [a.name for a in self.get_ancestors()]
+        full_path.append(self.name)
+        return ' -> '.join(full_path)
+
+    def clean(self):
+        super().clean()
+        # Không cho phép chọn chính nó hoặc một danh mục con làm danh mục cha
+        if self.pk and self.parent_id:
+            if CategoryClosure.objects.filter(ancestor_id=self.pk, descendant_id=self.parent_id).exists():
+                from django.core.exceptions import ValidationError
+                raise ValidationError({'parent': "Không thể chọn chính danh mục này hoặc danh mục con của nó làm danh mục cha."})
 
     def save(self, *args, **kwargs):
         if not self.slug:
@@ -55,42 +65,116 @@ class Category(models.Model):
                 slug = f"{base}-{i}"
                 i += 1
             self.slug = slug
+
+        previous_parent = []
+        if self.pk is not None:
+            previous_parent = list(Category.objects.filter(pk=self.pk).values_list('parent_id', flat=True))
         super().save(*args, **kwargs)
 
+        # Đồng bộ bảng closure (tổ tiên/hậu duệ)
+        if not previous_parent:
+            CategoryClosure.insert_node(self)
+        elif previous_parent[0] != self.parent_id:
+            CategoryClosure.move_subtree(self)
+
     def get_descendants_and_self_ids(self):
-        result = [self.id]
-        for child in self.children.all():
-            result.extend(child.get_descendants_and_self_ids())
-        return result
+        return list(
+            CategoryClosure.objects.filter(ancestor_id=self.id).values_list('descendant_id', flat=True)
+        )
 
     def get_ancestors(self):
-        ancestors = []
-        k = self.parent
-        while k is not None:
-            ancestors.append(k)
-            k = k.parent
-        return ancestors[::-1]
+        if self.parent_id is None:
+            return []
+        return list(
+            Category.objects.filter(
+                descendant_links__descendant_id=self.id,
+                descendant_links__depth__gt=0,
+            ).order_by('-descendant_links__depth')
+        )
 
     def get_all_attributes(self):
         """
         Lấy tất cả thuộc tính của danh mục hiện tại và các danh mục cha (kế thừa).
+        Đọc từ snapshot cây danh mục trong bộ nhớ nên không tốn truy vấn.
         """
-        # 1. Lấy thuộc tính riêng của danh mục này
-        all_attrs = list(self.attributes.all())
-
-        # 2. Duyệt ngược lên các cha để lấy thêm thuộc tính
-        parent = self.parent
-        while parent:
-            parent_attrs = parent.attributes.all()
-            for attr in parent_attrs:
-                # Chỉ thêm nếu chưa có (tránh trùng lặp)
-                if attr not in all_attrs:
-                    all_attrs.append(attr)
-            parent = parent.parent
-            
-        return all_attrs
+        from .category_tree import get_category_tree
+        return get_category_tree().inherited_attributes(self.id)
+
+class CategoryClosure(models.Model):
+    """
+    Bảng closure lưu mọi cặp (tổ tiên, hậu duệ) của cây danh mục, kể cả cặp
+    (chính nó, chính nó) với depth = 0. Cho phép lấy cây con / tổ tiên bằng một truy vấn.
+    """
+    ancestor = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='descendant_links', verbose_name="Tổ tiên")
+    descendant = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='ancestor_links', verbose_name="Hậu duệ")
+    depth = models.PositiveIntegerField(default=0, verbose_name="Độ sâu")
+
+    class Meta:
+        verbose_name = "Quan hệ danh mục"
+        verbose_name_plural = "Quan hệ danh mục"
+        unique_together = ('ancestor', 'descendant')
+        indexes = [models.Index(fields=['descendant', 'depth'])]
+
+    def __str__(self):
+        return f"{self.ancestor_id} -> {self.descendant_id} ({self.depth})"
+
+    @classmethod
+    def insert_node(cls, category):
+        """Thêm các dòng closure cho một danh mục vừa được tạo (chưa có con)."""
+        links = [cls(ancestor_id=category.pk, descendant_id=category.pk, depth=0)]
+        if category.parent_id:
+            for ancestor_id, depth in cls.objects.filter(descendant_id=category.parent_id).values_list('ancestor_id', 'depth'):
+                links.append(cls(ancestor_id=ancestor_id, descendant_id=category.pk, depth=depth + 1))
+        cls.objects.bulk_create(links, ignore_conflicts=True)
+
+    @classmethod
+    def move_subtree(cls, category):
+        """Cập nhật closure khi danh mục (cùng cây con của nó) được chuyển sang cha khác."""
+        subtree = list(cls.objects.filter(ancestor_id=category.pk).values_list('descendant_id', 'depth'))
+        subtree_ids = [descendant_id for descendant_id, _ in subtree]
+        with transaction.atomic():
+            # Cắt liên kết giữa cây con và các tổ tiên cũ
+            cls.objects.filter(descendant_id__in=subtree_ids).exclude(ancestor_id__in=subtree_ids).delete()
+            if category.parent_id:
+                new_ancestors = list(cls.objects.filter(descendant_id=category.parent_id).values_list('ancestor_id', 'depth'))
+                cls.objects.bulk_create([
+                    cls(ancestor_id=ancestor_id, descendant_id=descendant_id, depth=a_depth + d_depth + 1)
+                    for ancestor_id, a_depth in new_ancestors
+                    for descendant_id, d_depth in subtree
+                ])
+
+    @classmethod
+    def rebuild(cls):
+        """Dựng lại toàn bộ bảng closure từ cột parent (dùng sau import hoặc khi dữ liệu lệch)."""
+        parents = dict(Category.objects.values_list('id', 'parent_id'))
+        links = []
+        for category_id in parents:
+            node, depth, seen = category_id, 0, set()
+            while node is not None and node not in seen:
+                seen.add(node)
+                links.append(cls(ancestor_id=node, descendant_id=category_id, depth=depth))
+                node = parents.get(node)
+                depth += 1
+        with transaction.atomic():
+            cls.objects.all().delete()
+            cls.objects.bulk_create(links, batch_size=1000)
+        return len(links)
 
 # 3. Sản phẩm (Product)
+SALES_WINDOWS = (7, 30, 90)
+
+
+class ProductQuerySet(models.QuerySet):
+    def with_sales(self, days=30):
+        """Gắn số lượng đã bán trong `days` ngày gần nhất (units_sold) từ bảng xếp hạng bán chạy."""
+        if days not in SALES_WINDOWS:
+            raise ValueError(f"days phải thuộc {SALES_WINDOWS}")
+        return self.annotate(units_sold=Coalesce(F(f'sales_rank__units_{days}d'), 0))
+
+    def best_sellers(self, days=30):
+        return self.with_sales(days).filter(units_sold__gt=0).order_by('-units_sold', '-id')
+
+
 class Product(models.Model):
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='products', verbose_name="Danh mục")
     name = models.CharField(max_length=255, verbose_name="Tên sản phẩm")
@@ -105,6 +189,23 @@ class Product(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Ngày tạo")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Cập nhật lần cuối")
 
+    # Tổng hợp đánh giá (chỉ tính đánh giá đã duyệt), được cập nhật bởi app reviews
+    rating_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Số đánh giá")
+    rating_sum = models.PositiveIntegerField(default=0, editable=False, verbose_name="Tổng điểm đánh giá")
+    rating_average = models.FloatField(default=0, editable=False, db_index=True, verbose_name="Điểm trung bình")
+    rating_star_1 = models.PositiveIntegerField(default=0, editable=False, verbose_name="Số đánh giá 1 sao")
+    rating_star_2 = models.PositiveIntegerField(default=0, editable=False, verbose_name="Số đánh giá 2 sao")
+    rating_star_3 = models.PositiveIntegerField(default=0, editable=False, verbose_name="Số đánh giá 3 sao")
+    rating_star_4 = models.PositiveIntegerField(default=0, editable=False, verbose_name="Số đánh giá 4 sao")
+    rating_star_5 = models.PositiveIntegerField(default=0, editable=False, verbose_name="Số đánh giá 5 sao")
+
+    RATING_FIELDS = (
+        'rating_count', 'rating_sum', 'rating_average',
+        'rating_star_1', 'rating_star_2', 'rating_star_3', 'rating_star_4', 'rating_star_5',
+    )
+
+    objects = ProductQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Sản phẩm"
         verbose_name_plural = "Danh sách sản phẩm"
@@ -119,6 +220,13 @@ class Product(models.Model):
                 slug = f"{base}-{i}"
                 i += 1
             self.slug = slug
+        # Các cột tổng hợp đánh giá chỉ do app reviews cập nhật bằng F(): không ghi
+        # đè chúng bằng giá trị cũ của một instance đã nạp từ trước
+        if self.pk and not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert') and not args:
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.RATING_FIELDS
+            ]
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -136,6 +244,10 @@ class Product(models.Model):
     def in_stock(self):
         return self.stock > 0
 
+    def get_rating_counts(self):
+        """Số đánh giá theo từng mức sao: {1: ..., 5: ...}."""
+        return {i: getattr(self, f'rating_star_{i}') for i in range(1, 6)}
+
     def get_absolute_url(self):
         from django.urls import reverse
         # Assuming URL pattern will be updated to 'product_detail'
@@ -163,3 +275,103 @@ class ProductImage(models.Model):
 
     def __str__(self):
         return f"Image for {self.product.name}"
+
+
+# Lượt nhập sản phẩm hàng loạt, chạy nền theo từng lô; xem books/importer.py
+class ProductImport(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Chờ chạy'),
+        ('running', 'Đang chạy'),
+        ('done', 'Hoàn tất'),
+    ]
+
+    file = models.FileField(upload_to='imports/products/', verbose_name="File dữ liệu", help_text="CSV, XLSX hoặc JSON với các cột như file xuất sản phẩm.")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', verbose_name="Trạng thái")
+    total_rows = models.PositiveIntegerField(default=0, verbose_name="Tổng số dòng")
+    processed_rows = models.PositiveIntegerField(default=0, verbose_name="Số dòng đã xử lý")
+    created_count = models.PositiveIntegerField(default=0, verbose_name="Sản phẩm mới")
+    updated_count = models.PositiveIntegerField(default=0, verbose_name="Sản phẩm cập nhật")
+    image_count = models.PositiveIntegerField(default=0, verbose_name="Ảnh đã tải")
+    errors = models.JSONField(default=list, blank=True, verbose_name="Lỗi theo dòng")
+    last_error = models.TextField(blank=True, verbose_name="Lỗi gần nhất")
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="Người tạo")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Ngày tạo")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Hoàn tất lúc")
+
+    class Meta:
+        verbose_name = "Lượt nhập sản phẩm"
+        verbose_name_plural = "Nhập sản phẩm hàng loạt"
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Nhập sản phẩm #{self.pk}"
+
+    @property
+    def progress(self):
+        return round(100 * self.processed_rows / self.total_rows) if self.total_rows else 0
+
+
+# Làm mới snapshot cây danh mục khi danh mục hoặc thuộc tính thay đổi
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Attribute)
+@receiver(post_delete, sender=Attribute)
+@receiver(m2m_changed, sender=Category.attributes.through)
+def invalidate_category_tree(sender, **kwargs):
+    from .category_tree import invalidate
+    transaction.on_commit(invalidate)
+
+
+# Cập nhật chỉ mục tìm kiếm khi sản phẩm hoặc giá trị thuộc tính thay đổi
+@receiver(post_save, sender=Product)
+def reindex_product(sender, instance, **kwargs):
+    from .search import schedule_reindex
+    schedule_reindex(instance.pk)
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    from .search import schedule_remove
+    schedule_remove(instance.pk)
+
+
+@receiver(post_save, sender=ProductAttributeValue)
+@receiver(post_delete, sender=ProductAttributeValue)
+def reindex_product_attributes(sender, instance, **kwargs):
+    from .search import schedule_reindex
+    schedule_reindex(instance.product_id)
+
+
+# Đồng bộ chỉ mục gợi ý tìm kiếm (autocomplete)
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def refresh_product_suggestion(sender, instance, **kwargs):
+    from .autocomplete import update_products
+    product_id = instance.pk
+    transaction.on_commit(lambda: update_products([product_id]))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_suggestions(sender, **kwargs):
+    from .autocomplete import invalidate
+    transaction.on_commit(invalidate)
+
+
+@receiver(post_save, sender=ProductAttributeValue)
+@receiver(post_delete, sender=ProductAttributeValue)
+def invalidate_author_suggestions(sender, instance, **kwargs):
+    from .autocomplete import AUTHOR_ATTRIBUTES, invalidate
+    from .search import fold
+    if fold(instance.attribute.name).strip() in AUTHOR_ATTRIBUTES:
+        transaction.on_commit(invalidate)
+
+
+# Làm mới chỉ mục bộ lọc (facet) khi sản phẩm hoặc giá trị thuộc tính thay đổi
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductAttributeValue)
+@receiver(post_delete, sender=ProductAttributeValue)
+def invalidate_facets(sender, **kwargs):
+    from .facets import invalidate
+    transaction.on_commit(invalidate)
@@ -0,0 +1,158 @@
+# books/pagination.py
+"""
+Phân trang cho danh sách sản phẩm.
+
+- KeysetPaginator: phân trang theo "con trỏ" (keyset) dựa trên giá trị cột
+  sắp xếp của phần tử cuối trang, không dùng OFFSET nên trang 500 nhanh như
+  trang 1. Con trỏ được ký (django.core.signing) và không đọc được từ URL.
+- CachedCountPaginator: phân trang OFFSET như cũ nhưng tổng số sản phẩm được
+  cache trong thời gian ngắn thay vì COUNT(*) ở mỗi trang.
+"""
+from django.core import signing
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+CURSOR_SALT = 'books.pagination.cursor'
+COUNT_CACHE_TIMEOUT = 300
+
+# Thứ tự keyset cho từng kiểu sắp xếp: (tên cột, giảm dần?); luôn kết thúc bằng id để duy nhất
+KEYSET_ORDERINGS = {
+    '-created_at': [('created_at', True), ('id', True)],
+    'price': [('price', False), ('id', False)],
+    '-price': [('price', True), ('id', True)],
+    'name': [('name', False), ('id', False)],
+    '-name': [('name', True), ('id', True)],
+    '-rating': [('rating_average', True), ('rating_count', True), ('id', True)],
+    # units_sold là giá trị annotate bởi Product.objects.with_sales()
+    '-sales': [('units_sold', True), ('id', True)],
+}
+
+
+def cached_count(queryset, cache_key, timeout=COUNT_CACHE_TIMEOUT):
+    """Tổng số bản ghi (gần đúng trong tối đa `timeout` giây)."""
+    return cache.get_or_set(cache_key, queryset.count, timeout)
+
+
+class CachedCountPaginator(Paginator):
+    def __init__(self, *args, count_cache_key=None, known_count=None, **kwargs):
+        self.count_cache_key = count_cache_key
+        self.known_count = known_count
+        super().__init__(*args, **kwargs)
+
+    @cached_property
+    def count(self):
+        if self.known_count is not None:
+            return self.known_count
+        if not self.count_cache_key:
+            return super().count
+        return cached_count(self.object_list, self.count_cache_key)
+
+
+class KeysetPage:
+    def __init__(self, object_list, has_next, has_previous, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetPaginator:
+    def __init__(self, queryset, per_page, ordering, count_cache_key=None, known_count=None):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = ordering
+        self.count_cache_key = count_cache_key
+        self.known_count = known_count
+
+    @cached_property
+    def count(self):
+        if self.known_count is not None:
+            return self.known_count
+        if self.count_cache_key:
+            return cached_count(self.queryset, self.count_cache_key)
+        return self.queryset.count()
+
+    # --- Mã hóa con trỏ ---
+
+    def _field(self, name):
+        try:
+            return self.queryset.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # Cột annotate (số nguyên), lưu nguyên giá trị vào con trỏ
+            return None
+
+    def _encode(self, obj, direction):
+        raw = []
+        for name, _ in self.ordering:
+            value = getattr(obj, name)
+            field = self._field(name)
+            if value is not None and field is not None:
+                value = field.value_to_string(obj)
+            raw.append(value)
+        return signing.dumps({'d': direction, 'v': raw}, salt=CURSOR_SALT, compress=True)
+
+    def _decode(self, cursor):
+        try:
+            data = signing.loads(cursor, salt=CURSOR_SALT)
+            raw = data['v']
+            if data['d'] not in ('next', 'prev') or len(raw) != len(self.ordering):
+                return None
+            values = []
+            for (name, _), value in zip(self.ordering, raw):
+                field = self._field(name)
+                values.append(field.to_python(value) if field is not None else value)
+            return data['d'], values
+        except (signing.BadSignature, KeyError, TypeError, ValueError, ValidationError):
+            return None
+
+    # --- Truy vấn ---
+
+    def _after(self, values, reverse=False):
+        """Điều kiện "đứng sau" bộ giá trị `values` theo thứ tự sắp xếp (hoặc đứng trước nếu reverse)."""
+        condition = Q()
+        equal = Q()
+        for (name, descending), value in zip(self.ordering, values):
+            lookup = 'lt' if descending != reverse else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def _order_by(self, reverse=False):
+        return [f"{'-' if descending != reverse else ''}{name}" for name, descending in self.ordering]
+
+    def page(self, cursor=None):
+        decoded = self._decode(cursor) if cursor else None
+        direction, values = decoded if decoded else ('next', None)
+        reverse = direction == 'prev'
+
+        queryset = self.queryset.order_by(*self._order_by(reverse))
+        if values is not None:
+            queryset = queryset.filter(self._after(values, reverse))
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if reverse:
+            rows.reverse()
+
+        if reverse:
+            has_previous, has_next = has_more, True
+        else:
+            has_previous, has_next = values is not None, has_more
+
+        return KeysetPage(
+            rows,
+            has_next=has_next and bool(rows),
+            has_previous=has_previous and bool(rows),
+            next_cursor=self._encode(rows[-1], 'next') if rows else None,
+            previous_cursor=self._encode(rows[0], 'prev') if rows else None,
+        )
@@ -0,0 +1,183 @@
+# books/search.py
+"""
+Tìm kiếm toàn văn cho sản phẩm.
+
+Backend mặc định dùng bảng ảo SQLite FTS5 (xếp hạng BM25) chứa tên, mô tả và
+giá trị thuộc tính (tác giả, NXB, ISBN...) của sản phẩm. Văn bản được bỏ dấu
+bằng unidecode trước khi đánh chỉ mục nên "nha gia kim" khớp "Nhà giả kim".
+Có thể thay backend qua setting BOOK_SEARCH_BACKEND (đường dẫn tới class).
+
+Chỉ mục chứa mọi sản phẩm; điều kiện đang bán (sản phẩm và danh mục đều
+is_active) và bộ lọc danh mục được áp ngay trong câu truy vấn tìm kiếm, nên
+ẩn một sản phẩm hay cả danh mục không cần đánh lại chỉ mục.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils.module_loading import import_string
+from unidecode import unidecode
+
+FTS_TABLE = 'books_product_fts'
+INDEX_BATCH_SIZE = 500
+
+_TOKEN_RE = re.compile(r'\w+')
+
+
+def fold(text):
+    """Bỏ dấu tiếng Việt và chuyển về chữ thường."""
+    return unidecode(text or '').lower()
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(fold(text))
+
+
+def product_document(product):
+    """Các cột văn bản cần đánh chỉ mục của một sản phẩm (đã bỏ dấu)."""
+    attributes = ' '.join(
+        f"{value.attribute.name} {value.value}" for value in product.attribute_values.all()
+    )
+    return fold(product.name), fold(product.description), fold(attributes)
+
+
+class BaseSearchBackend:
+    def search(self, query, limit=None, category_id=None):
+        """
+        Trả về danh sách id sản phẩm đang bán (thuộc danh mục `category_id` nếu
+        có), xếp theo mức độ liên quan giảm dần.
+        """
+        raise NotImplementedError
+
+    def index_products(self, product_ids):
+        pass
+
+    def remove_products(self, product_ids):
+        pass
+
+    def rebuild(self):
+        return 0
+
+
+class SimpleSearchBackend(BaseSearchBackend):
+    """Backend dự phòng không cần chỉ mục: lọc icontains trên các cột gốc."""
+
+    def search(self, query, limit=None, category_id=None):
+        from .models import Product
+
+        filters = Q(is_active=True, category__is_active=True)
+        if category_id is not None:
+            filters &= Q(category_id=category_id)
+        for token in query.split():
+            filters &= (
+                Q(name__icontains=token)
+                | Q(description__icontains=token)
+                | Q(attribute_values__value__icontains=token)
+            )
+        ids = Product.objects.filter(filters).distinct().values_list('id', flat=True)
+        return list(ids[:limit] if limit else ids)
+
+
+class SQLiteFTSSearchBackend(BaseSearchBackend):
+    # Trọng số BM25 theo thứ tự cột: product_id, name, description, attributes
+    weights = (0.0, 10.0, 1.0, 5.0)
+
+    def _match_expression(self, query):
+        tokens = tokenize(query)
+        # Mỗi từ là một tiền tố bắt buộc: "nha gia" -> "nha"* AND "gia"*
+        return ' '.join(f'"{token}"*' for token in tokens)
+
+    def search(self, query, limit=None, category_id=None):
+        from .models import Category, Product
+
+        expression = self._match_expression(query)
+        if not expression:
+            return []
+        sql = (
+            f"SELECT {FTS_TABLE}.product_id FROM {FTS_TABLE} "
+            f"JOIN {Product._meta.db_table} p ON p.id = {FTS_TABLE}.product_id "
+            f"JOIN {Category._meta.db_table} c ON c.id = p.category_id "
+            f"WHERE {FTS_TABLE} MATCH %s AND p.is_active = %s AND c.is_active = %s"
+        )
+        params = [expression, True, True]
+        if category_id is not None:
+            sql += " AND p.category_id = %s"
+            params.append(category_id)
+        sql += f" ORDER BY bm25({FTS_TABLE}, {', '.join(str(w) for w in self.weights)})"
+        if limit:
+            sql += " LIMIT %s"
+            params.append(limit)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [row[0] for row in cursor.fetchall()]
+
+    def remove_products(self, product_ids):
+        product_ids = list(product_ids)
+        with connection.cursor() as cursor:
+            for start in range(0, len(product_ids), INDEX_BATCH_SIZE):
+                chunk = product_ids[start:start + INDEX_BATCH_SIZE]
+                placeholders = ', '.join(['%s'] * len(chunk))
+                cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE product_id IN ({placeholders})", chunk)
+
+    def _write(self, products):
+        rows = [(product.id, *product_document(product)) for product in products]
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {FTS_TABLE} (product_id, name, description, attributes) VALUES (%s, %s, %s, %s)",
+                rows,
+            )
+        return len(rows)
+
+    def index_products(self, product_ids):
+        from .models import Product
+
+        product_ids = list(product_ids)
+        with transaction.atomic():
+            self.remove_products(product_ids)
+            products = Product.objects.filter(id__in=product_ids).prefetch_related('attribute_values__attribute')
+            self._write(products)
+
+    def rebuild(self):
+        from .models import Product
+
+        count = 0
+        last_id = 0
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(f"DELETE FROM {FTS_TABLE}")
+            while True:
+                chunk = list(
+                    Product.objects.filter(id__gt=last_id).order_by('id')
+                    .prefetch_related('attribute_values__attribute')[:INDEX_BATCH_SIZE]
+                )
+                if not chunk:
+                    break
+                count += self._write(chunk)
+                last_id = chunk[-1].id
+        return count
+
+
+_backend = None
+
+
+def get_search_backend():
+    global _backend
+    if _backend is None:
+        path = getattr(settings, 'BOOK_SEARCH_BACKEND', None)
+        if path:
+            _backend = import_string(path)()
+        elif connection.vendor == 'sqlite':
+            _backend = SQLiteFTSSearchBackend()
+        else:
+            _backend = SimpleSearchBackend()
+    return _backend
+
+
+def schedule_reindex(product_id):
+    """Cập nhật chỉ mục cho một sản phẩm sau khi transaction hiện tại commit."""
+    transaction.on_commit(lambda: get_search_backend().index_products([product_id]))
+
+
+def schedule_remove(product_id):
+    transaction.on_commit(lambda: get_search_backend().remove_products([product_id]))
@@ -8,5 +8,6 @@ urlpatterns = [
     path('', views.ProductListView.as_view(), name='book_list'),
     path('category/<slug:category_slug>/', views.ProductListView.as_view(), name='category_detail'),
     path('search/', views.ProductSearchView.as_view(), name='book_search'),
+    path('autocomplete/', views.autocomplete, name='autocomplete'),
     path('<slug:slug>/', views.ProductDetailView.as_view(), name='book_detail'),
 ]
\ No newline at end of file
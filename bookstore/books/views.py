@@ -1,6 +1,14 @@
 from django.views.generic import ListView, DetailView
-from django.shortcuts import get_object_or_404
-from .models import Product, Category
+from django.views.decorators.http import require_GET
+from django.http import Http404, JsonResponse
+from django.conf import settings
+from urllib.parse import urlencode
+from .models import Product
+from .category_tree import get_category_tree
+from .search import get_search_backend
+from .autocomplete import suggest, TOP_K
+from .pagination import CachedCountPaginator, KeysetPaginator, KEYSET_ORDERINGS
+from .facets import get_facet_index, apply_selection
 from .forms import BookSearchForm
 from orders.forms import CartAddProductForm
 
@@ -10,49 +18,101 @@ class ProductListView(ListView):
     context_object_name = 'books'
     paginate_by = 12
 
+    paginator_class = CachedCountPaginator
+
     def get_queryset(self):
         queryset = Product.objects.filter(is_active=True, category__is_active=True).select_related('category')
         
         # Lọc theo danh mục
-        category_slug = self.kwargs.get('category_slug')
-        if category_slug:
-            category = get_object_or_404(Category, slug=category_slug, is_active=True)
-            category_ids = category.get_descendants_and_self_ids()
-            queryset = queryset.filter(category_id__in=category_ids)
+        category = self.get_category()
+        if category:
+            queryset = queryset.filter(category__ancestor_links__ancestor_id=category.id)
+
+        # Bộ lọc nhiều chiều (thuộc tính, khoảng giá, khuyến mãi, còn hàng)
+        self.facet_index = get_facet_index(category.id if category else None)
+        self.facet_selection = self.facet_index.parse_selection(self.request.GET)
+        queryset = apply_selection(queryset, self.facet_selection)
 
         # Sắp xếp
         sort_by = self.request.GET.get('sort', '-created_at') # Mặc định là hàng mới
-        valid_sorts = [
-            'name', '-name', 
-            'price', '-price', 
-            '-created_at'
-        ]
         
         # Map title sorting to name for backward compatibility in URL params
         if sort_by == 'title': sort_by = 'name'
         if sort_by == '-title': sort_by = '-name'
 
-        if sort_by in valid_sorts:
-            queryset = queryset.order_by(sort_by)
-            
+        # Mỗi kiểu sắp xếp luôn kèm id để thứ tự ổn định (cần cho phân trang keyset)
+        if sort_by not in KEYSET_ORDERINGS:
+            sort_by = '-created_at'
+        if sort_by == '-sales':
+            queryset = queryset.with_sales()
+        queryset = queryset.order_by(*[
+            f"{'-' if descending else ''}{name}" for name, descending in KEYSET_ORDERINGS[sort_by]
+        ])
+
+        self.sort_key = sort_by
         return queryset
 
+    def use_keyset_pagination(self):
+        # Bật cho toàn site bằng BOOK_LIST_KEYSET_PAGINATION, hoặc khi URL đã mang con trỏ
+        return getattr(settings, 'BOOK_LIST_KEYSET_PAGINATION', False) or 'cursor' in self.request.GET
+
+    def count_cache_key(self):
+        category = self.get_category()
+        return f"books:product_list_count:{category.id if category else 'all'}"
+
+    def known_count(self):
+        # Khi có bộ lọc, tổng số lấy từ bitmap của FacetIndex thay vì COUNT(*)
+        if self.facet_selection:
+            return self.facet_index.match_count(self.facet_selection)
+        return None
+
+    def get_paginator(self, queryset, per_page, orphans=0, allow_empty_first_page=True, **kwargs):
+        return self.paginator_class(
+            queryset, per_page, orphans=orphans, allow_empty_first_page=allow_empty_first_page,
+            count_cache_key=self.count_cache_key(), known_count=self.known_count(), **kwargs
+        )
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.use_keyset_pagination():
+            return super().paginate_queryset(queryset, page_size)
+        paginator = KeysetPaginator(
+            queryset, page_size, KEYSET_ORDERINGS[self.sort_key],
+            count_cache_key=self.count_cache_key(), known_count=self.known_count(),
+        )
+        page = paginator.page(self.request.GET.get('cursor'))
+        self.keyset_page = page
+        return (paginator, page, page.object_list, page.has_next or page.has_previous)
+
+    def get_category(self):
+        """Danh mục đang xem (node trong snapshot cây danh mục) hoặc None."""
+        if not hasattr(self, '_category'):
+            self._category = None
+            category_slug = self.kwargs.get('category_slug')
+            if category_slug:
+                self._category = get_category_tree().get_by_slug(category_slug)
+                if self._category is None:
+                    raise Http404("Không tìm thấy danh mục.")
+        return self._category
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['category'] = None
-        category_slug = self.kwargs.get('category_slug')
+        category = self.get_category()
+        context['category'] = category
 
-        if category_slug:
-            category = get_object_or_404(Category, slug=category_slug, is_active=True)
-            context['category'] = category
-            context['subcategories'] = category.children.filter(is_active=True)
-            context['breadcrumb'] = category.get_ancestors()
+        if category:
+            context['subcategories'] = category.children
+            context['breadcrumb'] = get_category_tree().ancestors(category.id)
         else:
             # Nếu không có danh mục nào được chọn, hiển thị các danh mục cấp cao nhất
-            context['top_level_categories'] = Category.objects.filter(parent__isnull=True, is_active=True)
+            context['top_level_categories'] = get_category_tree().roots
         
         # Giữ lại tham số sort khi chuyển trang
         context['current_sort'] = self.request.GET.get('sort', '-created_at')
+        context['keyset_page'] = getattr(self, 'keyset_page', None)
+        context['facets'] = self.facet_index.counts(self.facet_selection)
+        context['facet_query'] = urlencode(
+            [(key, value) for key, values in self.facet_selection.items() for value in sorted(values)]
+        )
         
         return context
 
@@ -65,9 +125,10 @@ class ProductDetailView(DetailView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['cart_product_form'] = CartAddProductForm()
-        approved_reviews = self.object.reviews.filter(is_approved=True)
-        total_reviews = approved_reviews.count()
-        rating_counts = {i: approved_reviews.filter(rating=i).count() for i in range(1, 6)}
+        approved_reviews = self.object.reviews.filter(is_approved=True).select_related('user')
+        # Số liệu đánh giá đã được tổng hợp sẵn trên Product, không cần truy vấn thêm
+        total_reviews = self.object.rating_count
+        rating_counts = self.object.get_rating_counts()
         rating_percent = {
             i: int((rating_counts[i] / total_reviews) * 100) if total_reviews else 0
             for i in range(1, 6)
@@ -76,36 +137,56 @@ class ProductDetailView(DetailView):
             {"star": i, "count": rating_counts[i], "percent": rating_percent[i]}
             for i in range(5, 0, -1)
         ]
-        avg_rating = (
-            sum(rating * count for rating, count in rating_counts.items()) / total_reviews
-            if total_reviews else 0
-        )
+        avg_rating = self.object.rating_average
         context["approved_reviews"] = approved_reviews
         context["total_reviews"] = total_reviews
         context["rating_rows"] = rating_rows
         context["avg_rating"] = avg_rating
         
         # Breadcrumb logic
-        if self.object.category:
-            context['breadcrumb'] = self.object.category.get_ancestors()
-            context['category'] = self.object.category
+        category = get_category_tree().get(self.object.category_id)
+        if category:
+            context['breadcrumb'] = get_category_tree().ancestors(category.id)
+            context['category'] = category
             
         return context
 
 
+class RankedProducts:
+    """Danh sách sản phẩm theo thứ tự id cho trước; chỉ truy vấn DB cho phần được cắt ra (một trang)."""
+
+    def __init__(self, ranked_ids):
+        self.ranked_ids = ranked_ids
+
+    def count(self):
+        return len(self.ranked_ids)
+
+    def __len__(self):
+        return len(self.ranked_ids)
+
+    def __getitem__(self, index):
+        ids = self.ranked_ids[index] if isinstance(index, slice) else [self.ranked_ids[index]]
+        products = Product.objects.filter(id__in=ids).select_related('category').in_bulk()
+        page = [products[pk] for pk in ids if pk in products]
+        return page if isinstance(index, slice) else page[0]
+
+
 class ProductSearchView(ListView):
     model = Product
     template_name = 'books/search.html'
     context_object_name = 'books'
+    paginate_by = 12
 
     def get_queryset(self):
         form = BookSearchForm(self.request.GET)
         if form.is_valid():
             q = form.cleaned_data.get('q')
             category = form.cleaned_data.get('category')
-            queryset = Product.objects.filter(is_active=True, category__is_active=True)
             if q:
-                queryset = queryset.filter(name__icontains=q)
+                # Id theo thứ tự liên quan (BM25), đã lọc sản phẩm đang bán và danh mục;
+                # mỗi trang chỉ nạp sản phẩm của trang đó
+                return RankedProducts(get_search_backend().search(q, category_id=category.pk if category else None))
+            queryset = Product.objects.filter(is_active=True, category__is_active=True)
             if category:
                 queryset = queryset.filter(category=category)
             return queryset
@@ -114,4 +195,19 @@ class ProductSearchView(ListView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['form'] = BookSearchForm(self.request.GET)
+        params = self.request.GET.copy()
+        params.pop('page', None)
+        context['search_query'] = params.urlencode()
         return context
+
+
+@require_GET
+def autocomplete(request):
+    """Gợi ý sản phẩm, danh mục, tác giả cho ô tìm kiếm (JSON, không truy vấn DB)."""
+    q = request.GET.get('q', '').strip()[:100]
+    try:
+        limit = max(1, min(int(request.GET.get('limit', TOP_K)), TOP_K))
+    except ValueError:
+        limit = TOP_K
+    results = [item.as_dict() for item in suggest(q, limit)] if q else []
+    return JsonResponse({'query': q, 'results': results})
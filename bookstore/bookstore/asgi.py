@@ -3,6 +3,12 @@ ASGI config for bookstore project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Chạy qua ASGI server (uvicorn/daphne) để luồng trạng thái thanh toán
+/payment/status-stream/<id>/ giữ được kết nối SSE mà không chiếm worker;
+dưới WSGI endpoint này chỉ trả trạng thái hiện tại và để trình duyệt tự hỏi lại.
+Chatbot /chatbot/stream/ cũng là view bất đồng bộ: gọi Gemini không chiếm
+thread và stream câu trả lời từng đoạn (dưới WSGI vẫn chạy nhưng giữ worker).
+
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 """
@@ -130,6 +130,28 @@ DATABASES = {
     }
 }
 
+# ================== CACHE ==================
+# Cây danh mục, gợi ý tìm kiếm, bộ lọc, mã giảm giá và trạng thái thanh toán báo
+# thay đổi cho các tiến trình khác qua cache, nên mọi worker phải dùng chung một
+# backend (không dùng LocMemCache). Mặc định lưu trong DB: tạo bảng bằng
+# `python manage.py createcachetable`; đặt REDIS_URL để dùng Redis.
+REDIS_URL = config('REDIS_URL', default='')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'django_cache',
+            'OPTIONS': {'MAX_ENTRIES': 20000},
+        }
+    }
+
 # ================== PASSWORD VALIDATION ==================
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -176,6 +198,8 @@ LOGIN_URL = '/users/login/'
 # ================== SESSION & MESSAGES ==================
 MESSAGE_STORAGE = 'django.contrib.messages.storage.session.SessionStorage'
 CART_SESSION_ID = 'cart'
+# Giỏ hàng lưu trong DB; dùng 'orders.cart.Cart' để lưu trong session như trước
+CART_BACKEND = 'orders.cart.DatabaseCart'
 
 # ================== DEFAULT AUTO FIELD ==================
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -184,6 +208,14 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 PAYOS_CLIENT_ID = os.getenv('PAYOS_CLIENT_ID', default='').strip()
 PAYOS_API_KEY = os.getenv('PAYOS_API_KEY', default='').strip()
 PAYOS_CHECKSUM_KEY = os.getenv('PAYOS_CHECKSUM_KEY', default='').strip()
+# Để trống dùng địa chỉ chính thức; trỏ tới máy chủ giả lập khi chạy thử
+PAYOS_BASE_URL = os.getenv('PAYOS_BASE_URL', default='').strip()
+# Client PayOS dùng chung (payment/gateway.py): timeout tính bằng giây
+PAYOS_CONNECT_TIMEOUT = 3
+PAYOS_READ_TIMEOUT = 10
+PAYOS_LOOKUP_RETRIES = 2
+PAYOS_BREAKER_THRESHOLD = 5
+PAYOS_BREAKER_RESET = 30
 
 # ================== MANUAL PAYMENT (VIETQR) ==================
 VIETQR_BANK_NAME = os.getenv('VIETQR_BANK_NAME', default='BIDV')
@@ -193,7 +225,9 @@ VIETQR_ACCOUNT_NUMBER = os.getenv('VIETQR_ACCOUNT_NUMBER', default='8871946801')
 VIETQR_QR_URL = os.getenv('VIETQR_QR_URL', default='')
 
 # ================== EMAIL CONFIGURATION ==================
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+# Request chỉ đưa email vào hàng đợi; `manage.py run_workers` gửi bằng EMAIL_WORKER_BACKEND
+EMAIL_BACKEND = 'core.mail.QueuedEmailBackend'
+EMAIL_WORKER_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 
 EMAIL_HOST = 'smtp.gmail.com'
 EMAIL_PORT = 587
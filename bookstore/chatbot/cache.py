@@ -0,0 +1,97 @@
+# chatbot/cache.py
+"""
+Cache trong bộ nhớ cho chatbot: kết quả phân tích ý định và câu trả lời cuối.
+
+Mỗi cache giới hạn số mục (bỏ mục ít dùng nhất - LRU) và thời gian sống
+(TTL). Câu hỏi được chuẩn hóa trước khi làm khóa nên "Gợi ý sách văn học!" và
+"gợi ý  sách văn học" dùng chung kết quả. Số lượt trúng/trượt cache và số lần
+phải gọi Gemini được đếm để xem qua stats().
+"""
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+
+from books.search import tokenize
+
+DEFAULT_MAX_ENTRIES = 500
+DEFAULT_INTENT_TTL = 24 * 3600
+DEFAULT_ANSWER_TTL = 600
+
+_SPACE_RE = re.compile(r'\s+')
+
+
+class TTLCache:
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] <= now:
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+def intent_key(message):
+    """Khóa cho ý định: bỏ dấu, chữ thường, chỉ giữ các từ."""
+    return ' '.join(tokenize(message))
+
+
+def answer_key(message, catalog_version):
+    # Giữ dấu (câu trả lời phụ thuộc nghĩa câu hỏi) và gắn version danh mục; sửa từng sản phẩm
+    # không đổi version nên giá/tồn kho trong câu trả lời cũ tối đa CHATBOT_ANSWER_TTL
+    return catalog_version, _SPACE_RE.sub(' ', message).strip().strip('?!.').lower()
+
+
+_max_entries = getattr(settings, 'CHATBOT_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES)
+intent_cache = TTLCache(_max_entries, getattr(settings, 'CHATBOT_INTENT_TTL', DEFAULT_INTENT_TTL))
+answer_cache = TTLCache(_max_entries, getattr(settings, 'CHATBOT_ANSWER_TTL', DEFAULT_ANSWER_TTL))
+
+# Nguồn của ý định (local / cache / llm) và số lần gọi Gemini
+counters = Counter()
+_counters_lock = threading.Lock()
+
+
+def count(name):
+    with _counters_lock:
+        counters[name] += 1
+
+
+def stats():
+    with _counters_lock:
+        snapshot = dict(counters)
+    return {'intent_cache': intent_cache.stats(), 'answer_cache': answer_cache.stats(), 'counters': snapshot}
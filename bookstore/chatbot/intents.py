@@ -0,0 +1,100 @@
+# chatbot/intents.py
+"""
+Nhận diện ý định tại chỗ, không cần gọi Gemini.
+
+Tên danh mục, tác giả và tên sách lấy từ chỉ mục autocomplete (đã nằm sẵn
+trong bộ nhớ) được bỏ dấu và đưa vào một dict. Tin nhắn được tách từ, rồi mọi
+cụm từ liên tiếp được tra trong dict; cụm dài nhất thắng (ưu tiên danh mục,
+rồi tác giả, rồi sách). Kết quả chỉ được dùng khi "chắc chắn": cụm khớp phủ
+gần hết các từ có nghĩa của tin nhắn, hoặc tin nhắn chỉ là lời chào. Các
+trường hợp còn lại vẫn để Gemini phân tích.
+"""
+import threading
+from dataclasses import dataclass
+
+from books.autocomplete import MAX_WORDS_INDEXED, get_autocomplete_index, suggestion_snapshot
+from books.search import tokenize
+
+# Các từ không mang nội dung tìm kiếm (đã bỏ dấu)
+STOP_WORDS = frozenset("""
+    a ah alo ban bao cac can cho chi co cua cuon danh di duoc gi giup goi hay hot khong
+    la loai minh moi mua muon mot nao nhat nhe nhung oi quyen san pham sach shop the thu tim
+    to toi top tot xem ve voi vs y ak ha nhi
+""".split())
+GREETING_WORDS = frozenset(('chao', 'xin', 'hello', 'hi', 'hey', 'alo'))
+KIND_PRIORITY = {'category': 0, 'author': 1, 'product': 2}
+MIN_COVERAGE = 0.6
+
+
+@dataclass(frozen=True)
+class Intent:
+    search_query: object
+    kind: str = ''
+    source: str = 'local'
+
+
+class _CatalogNames:
+    def __init__(self, version, suggestions):
+        self.version = version
+        self.names = {}
+        for suggestion in suggestions:
+            words = tokenize(suggestion.label)
+            # Bỏ tên quá ngắn hoặc chỉ gồm từ chung chung ("Sách", "Top 10")
+            if not words or len(' '.join(words)) < 3 or all(w in STOP_WORDS or w.isdigit() for w in words):
+                continue
+            key = ' '.join(words)
+            current = self.names.get(key)
+            if current is None or KIND_PRIORITY[suggestion.kind] < KIND_PRIORITY[current.kind]:
+                self.names[key] = suggestion
+
+    def longest_match(self, words):
+        best, best_len = None, 0
+        for start in range(len(words)):
+            for end in range(min(len(words), start + MAX_WORDS_INDEXED), start, -1):
+                if end - start < best_len:
+                    break
+                suggestion = self.names.get(' '.join(words[start:end]))
+                if suggestion is None:
+                    continue
+                if end - start > best_len or KIND_PRIORITY[suggestion.kind] < KIND_PRIORITY[best[0].kind]:
+                    best, best_len = (suggestion, start, end), end - start
+                break
+        return best
+
+
+_lock = threading.Lock()
+_names = None
+
+
+def _catalog_names():
+    global _names
+    revision = get_autocomplete_index().revision
+    names = _names
+    if names is not None and names.version == revision:
+        return names
+    with _lock:
+        if _names is None or _names.version != revision:
+            _names = _CatalogNames(*suggestion_snapshot())
+        return _names
+
+
+def _is_content(word):
+    return word not in STOP_WORDS and word not in GREETING_WORDS and not word.isdigit()
+
+
+def extract_intent(message):
+    """Ý định nhận diện tại chỗ, hoặc None nếu không đủ chắc chắn."""
+    words = tokenize(message)
+    content = [word for word in words if _is_content(word)]
+    if not content:
+        # Lời chào hoặc câu chung chung ("gợi ý sách hay"): không có gì để tìm
+        return Intent(None)
+
+    match = _catalog_names().longest_match(words)
+    if match is None:
+        return None
+    suggestion, start, end = match
+    matched_content = sum(1 for word in words[start:end] if _is_content(word))
+    if matched_content / len(content) < MIN_COVERAGE:
+        return None
+    return Intent(suggestion.label, suggestion.kind)
@@ -0,0 +1,47 @@
+# chatbot/limits.py
+"""
+Giới hạn số cuộc trò chuyện chatbot chạy đồng thời trong một tiến trình.
+
+Mỗi khách (user hoặc IP) chỉ được giữ CHATBOT_MAX_CONCURRENT_PER_CLIENT câu
+trả lời đang stream, và cả tiến trình tối đa CHATBOT_MAX_CONCURRENT, để một
+đợt hỏi dồn dập không chiếm hết kết nối của các trang sách.
+"""
+import threading
+from collections import Counter
+
+DEFAULT_MAX_CONCURRENT = 20
+DEFAULT_MAX_CONCURRENT_PER_CLIENT = 2
+
+
+class ConcurrencyLimiter:
+    def __init__(self, max_total, max_per_client):
+        self.max_total = max_total
+        self.max_per_client = max_per_client
+        self._active = Counter()
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def has_room(self, client_key):
+        """Kiểm tra nhanh (không giữ chỗ) để từ chối sớm bằng 429."""
+        with self._lock:
+            return self._total < self.max_total and self._active[client_key] < self.max_per_client
+
+    def acquire(self, client_key):
+        """Giữ một chỗ cho khách; trả về False nếu đã hết chỗ."""
+        with self._lock:
+            if self._total >= self.max_total or self._active[client_key] >= self.max_per_client:
+                return False
+            self._active[client_key] += 1
+            self._total += 1
+            return True
+
+    def release(self, client_key):
+        with self._lock:
+            self._active[client_key] -= 1
+            if self._active[client_key] <= 0:
+                del self._active[client_key]
+            self._total -= 1
+
+    def active(self):
+        with self._lock:
+            return self._total
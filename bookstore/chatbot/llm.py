@@ -0,0 +1,103 @@
+# chatbot/llm.py
+"""
+Client gọi mô hình ngôn ngữ cho chatbot.
+
+Chọn client qua setting CHATBOT_LLM_CLIENT (đường dẫn tới class); mặc định là
+Gemini. FakeLLMClient trả lời cố định, không cần mạng hay API key, để chạy
+thử luồng stream ở máy local.
+"""
+import asyncio
+import json
+import logging
+import threading
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+MODEL_ID = 'gemini-flash-latest'
+
+
+class BaseLLMClient:
+    def generate(self, prompt, json_output=False):
+        raise NotImplementedError
+
+    async def agenerate(self, prompt, json_output=False):
+        raise NotImplementedError
+
+    async def astream(self, prompt):
+        """Trả về từng đoạn văn bản của câu trả lời ngay khi mô hình sinh ra."""
+        yield await self.agenerate(prompt)
+
+
+class GeminiClient(BaseLLMClient):
+    def __init__(self):
+        from google import genai
+
+        api_key = settings.GEMINI_API_KEY
+        if not api_key:
+            raise ValueError("GEMINI_API_KEY is missing in settings.")
+        masked_key = api_key[:5] + "..." + api_key[-5:] if len(api_key) > 10 else "***"
+        logger.info("Chatbot using Gemini API key %s", masked_key)
+        self.client = genai.Client(api_key=api_key)
+
+    def _config(self, json_output):
+        from google.genai import types
+        return types.GenerateContentConfig(response_mime_type='application/json') if json_output else None
+
+    def generate(self, prompt, json_output=False):
+        response = self.client.models.generate_content(
+            model=MODEL_ID, contents=prompt, config=self._config(json_output),
+        )
+        return response.text
+
+    async def agenerate(self, prompt, json_output=False):
+        response = await self.client.aio.models.generate_content(
+            model=MODEL_ID, contents=prompt, config=self._config(json_output),
+        )
+        return response.text
+
+    async def astream(self, prompt):
+        async for chunk in await self.client.aio.models.generate_content_stream(model=MODEL_ID, contents=prompt):
+            if chunk.text:
+                yield chunk.text
+
+
+class FakeLLMClient(BaseLLMClient):
+    """Trả lời cố định từng từ một (giãn cách CHATBOT_FAKE_LLM_DELAY giây)."""
+    answer = "Chào bạn! Mình đã tìm được vài cuốn sách phù hợp, bạn xem các thẻ bên dưới nhé."
+
+    def __init__(self):
+        self.delay = getattr(settings, 'CHATBOT_FAKE_LLM_DELAY', 0.05)
+
+    def generate(self, prompt, json_output=False):
+        return json.dumps({'search_query': None}) if json_output else self.answer
+
+    async def agenerate(self, prompt, json_output=False):
+        await asyncio.sleep(self.delay)
+        return self.generate(prompt, json_output)
+
+    async def astream(self, prompt):
+        for i, word in enumerate(self.answer.split(' ')):
+            await asyncio.sleep(self.delay)
+            yield word if i == 0 else ' ' + word
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_llm_client():
+    """Client dùng chung cho tiến trình, hoặc None nếu chưa cấu hình được."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                path = getattr(settings, 'CHATBOT_LLM_CLIENT', 'chatbot.llm.GeminiClient')
+                try:
+                    _client = import_string(path)()
+                except Exception:
+                    logger.exception("Chatbot LLM client %s could not be initialised", path)
+                    return None
+    return _client
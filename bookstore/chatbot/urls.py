@@ -5,4 +5,6 @@ app_name = 'chatbot'
 
 urlpatterns = [
     path('ask/', views.chat_view, name='ask'),
+    path('stream/', views.chat_stream, name='stream'),
+    path('stats/', views.chat_stats, name='stats'),
 ]
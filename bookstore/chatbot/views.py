@@ -1,36 +1,188 @@
 import json
-from django.http import JsonResponse
+import logging
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 from django.conf import settings
 from django.urls import reverse
-from google import genai
-from google.genai import types
+from django.contrib.admin.views.decorators import staff_member_required
+from books.autocomplete import get_autocomplete_index
 from books.models import Product, Category
+from . import cache
+from .intents import Intent, extract_intent
+from .limits import DEFAULT_MAX_CONCURRENT, DEFAULT_MAX_CONCURRENT_PER_CLIENT, ConcurrencyLimiter
+from .llm import get_llm_client
 
-# Khởi tạo Client
-def get_client():
+logger = logging.getLogger(__name__)
+
+limiter = ConcurrencyLimiter(
+    getattr(settings, 'CHATBOT_MAX_CONCURRENT', DEFAULT_MAX_CONCURRENT),
+    getattr(settings, 'CHATBOT_MAX_CONCURRENT_PER_CLIENT', DEFAULT_MAX_CONCURRENT_PER_CLIENT),
+)
+
+
+def _intent_prompt(user_message):
+    return f"""
+    Bạn là trợ lý cửa hàng sách. Phân tích tin nhắn: "{user_message}"
+    Nhiệm vụ:
+    1. Xác định xem khách có đang tìm sách, hỏi về sách, hay muốn gợi ý sách không.
+    2. Trích xuất từ khóa chính (Subject/Title/Category). 
+       - Loại bỏ các từ chỉ tính chất: 'hay', 'tốt nhất', 'mới nhất', 'hot', 'giúp tôi', 'gợi ý', 'top', 'những', 'các'.
+       - Loại bỏ các từ chỉ số lượng hoặc đối tượng chung chung nếu chúng không phải là tên riêng: '5', '10', 'sản phẩm', 'quyển', 'cuốn', 'sách'.
+       - Giữ lại tên tác giả, tên tác phẩm, hoặc thể loại cụ thể.
+    
+    Ví dụ:
+    - "Gợi ý 5 sách văn học hay" -> "Văn học"
+    - "cho mình xem 5 san pham ve tam ly" -> "Tâm lý"
+    - "Tìm sách Nhà giả kim" -> "Nhà giả kim"
+    - "Có truyện doremon không" -> "Doremon"
+    - "Chào shop" -> null
+
+    Trả về định dạng JSON duy nhất: {{"search_query": "tên sách/danh mục hoặc null"}}
+    """
+
+
+def _parse_intent(text):
+    search_query = json.loads(text).get('search_query')
+    logger.debug("Chatbot search query: %r", search_query)
+    if not search_query or str(search_query).lower() == 'null':
+        search_query = None
+    return Intent(search_query, source='llm')
+
+
+def _llm_intent(client, user_message):
+    """Phân tích ý định bằng Gemini; trả về None nếu lỗi (không cache kết quả lỗi)."""
+    cache.count('llm_calls')
     try:
-        api_key = settings.GEMINI_API_KEY
-        if not api_key:
-            print("Chatbot Error: GEMINI_API_KEY is missing in settings.")
-            return None
-        # Debug: Print masked key to verify which key is being used
-        masked_key = api_key[:5] + "..." + api_key[-5:] if len(api_key) > 10 else "***"
-        print(f"Chatbot: Using API Key: {masked_key}")
-        return genai.Client(api_key=api_key)
-    except Exception as e:
-        print(f"Chatbot Init Error: {e}")
+        return _parse_intent(client.generate(_intent_prompt(user_message), json_output=True))
+    except Exception:
+        logger.warning("Chatbot intent analysis failed", exc_info=True)
+        return None
+
+
+async def _allm_intent(client, user_message):
+    cache.count('llm_calls')
+    try:
+        return _parse_intent(await client.agenerate(_intent_prompt(user_message), json_output=True))
+    except Exception:
+        logger.warning("Chatbot intent analysis failed", exc_info=True)
         return None
 
-client = None
 
-MODEL_ID = 'gemini-flash-latest' 
+def _answer_prompt(user_message, context_info):
+    system_role = "Bạn là trợ lý AI của 'The Bookstore'. Hãy trả lời thân thiện, ngắn gọn bằng tiếng Việt. Nếu có danh sách sách, hãy mời khách xem thẻ bên dưới."
+    return f"{system_role}\nKhách hỏi: {user_message}\nThông tin hệ thống: {context_info}\nTrả lời khách:"
+
+
+def _known_intent(user_message):
+    """Ý định nhận diện tại chỗ hoặc đã có trong cache; None nếu phải hỏi Gemini."""
+    intent = extract_intent(user_message)
+    if intent is not None:
+        cache.count('intent_local')
+        return intent
+    intent = cache.intent_cache.get(cache.intent_key(user_message))
+    if intent is not None:
+        cache.count('intent_cached')
+    return intent
+
+
+def _remember_intent(user_message, intent):
+    if intent is None:
+        return Intent(None, source='error')
+    cache.intent_cache.set(cache.intent_key(user_message), intent)
+    return intent
+
+
+def _detect_intent(client, user_message):
+    """Ý định của tin nhắn: nhận diện tại chỗ, rồi cache, cuối cùng mới gọi Gemini."""
+    intent = _known_intent(user_message)
+    if intent is None:
+        intent = _remember_intent(user_message, _llm_intent(client, user_message))
+    return intent
+
+
+def _answer_key(user_message):
+    return cache.answer_key(user_message, get_autocomplete_index().version)
+
+
+def _search_products(search_query):
+    """Trả về (context_info, products_data) cho câu hỏi đã phân tích."""
+    context_info = ""
+    products_data = [] # Dữ liệu sản phẩm gửi về frontend
+
+    if search_query:
+        # Tìm kiếm trong Database Django (Tên hoặc Danh mục)
+        from django.db.models import Q
+
+        # 1. Tìm các Categories khớp với keyword để lấy cả danh mục con
+        matching_cats = Category.objects.filter(name__icontains=search_query, is_active=True)
+
+        # 2. Tìm sản phẩm: Theo tên HOẶC theo danh mục (bao gồm cả danh mục con)
+        products = Product.objects.filter(
+            Q(name__icontains=search_query) | 
+            Q(category__ancestor_links__ancestor__in=matching_cats) |
+            Q(category__name__icontains=search_query),
+            is_active=True,
+            category__is_active=True
+        ).distinct()[:5]
+        
+        logger.debug("Chatbot found %d products for %r", len(products), search_query)
+
+        if products.exists():
+            product_list_text = []
+            for p in products:
+                if p.is_on_sale:
+                    price_str = f"{p.get_final_price():,.0f}đ (Gốc: {p.price:,.0f}đ - Giảm {p.discount_percentage}%)".replace(",", ".")
+                    final_price = f"{p.get_final_price():,.0f}đ".replace(",", ".")
+                else:
+                    price_str = f"{p.price:,.0f}đ".replace(",", ".")
+                    final_price = f"{p.price:,.0f}đ".replace(",", ".")
+
+                product_list_text.append(f"- {p.name} (Giá: {price_str})")
+                
+                # Build info for card
+                try:
+                    img_url = p.cover_image.url if p.cover_image else '/static/img/default-book-cover.jpg'
+                except:
+                    img_url = '/static/img/default-book-cover.jpg'
+
+                products_data.append({
+                    'name': p.name,
+                    'price': final_price,
+                    'original_price': f"{p.price:,.0f}đ".replace(",", ".") if p.is_on_sale else "",
+                    'is_on_sale': p.is_on_sale,
+                    'image': img_url,
+                    'url': reverse('books:book_detail', args=[p.slug])
+                })
+
+            context_info = f"Hệ thống tìm thấy {len(products)} sách phù hợp với '{search_query}':\n" + "\n".join(product_list_text)
+        else:
+            context_info = f"Hệ thống tìm kiếm '{search_query}' nhưng không thấy sản phẩm nào khớp."
+
+    return context_info, products_data
+
+
+def _error_message(e):
+    logger.exception("Chatbot request failed")
+
+    # Xử lý lỗi API Key bị lộ hoặc hết hạn
+    error_str = str(e)
+    if "403" in error_str or "PERMISSION_DENIED" in error_str:
+        return "Xin lỗi, hệ thống AI đang bảo trì (Lỗi API Key). Vui lòng liên hệ Admin."
+
+    if "400" in error_str and "API key expired" in error_str:
+        return "Xin lỗi, key AI đã hết hạn. Vui lòng cập nhật key mới."
+
+    if "429" in error_str or "RESOURCE_EXHAUSTED" in error_str:
+        return "Xin lỗi, chatbot đang bị quá tải giới hạn miễn phí của Google (Rate Limit). Bạn vui lòng đợi khoảng 15-30 giây rồi thử lại nhé!"
+
+    return "Xin lỗi, hiện tại mình đang gặp chút sự cố. Bạn thử lại sau nhé!"
+
 
 @csrf_exempt
 def chat_view(request):
-    global client
-    if client is None:
-        client = get_client()
+    client = get_llm_client()
 
     if request.method == 'POST':
         try:
@@ -43,129 +195,104 @@ def chat_view(request):
             if not user_message:
                 return JsonResponse({'response': "Chào bạn! Shop có thể giúp gì cho bạn?"})
 
+            # Câu hỏi lặp lại (cùng dữ liệu sách) trả luôn câu trả lời đã có
+            answer_key = _answer_key(user_message)
+            answer = cache.answer_cache.get(answer_key)
+            if answer is not None:
+                return JsonResponse(answer)
+
             # Bước 1: Phân tích ý định (Intent Detection)
-            interpretation_prompt = f"""
-            Bạn là trợ lý cửa hàng sách. Phân tích tin nhắn: "{user_message}"
-            Nhiệm vụ:
-            1. Xác định xem khách có đang tìm sách, hỏi về sách, hay muốn gợi ý sách không.
-            2. Trích xuất từ khóa chính (Subject/Title/Category). 
-               - Loại bỏ các từ chỉ tính chất: 'hay', 'tốt nhất', 'mới nhất', 'hot', 'giúp tôi', 'gợi ý', 'top', 'những', 'các'.
-               - Loại bỏ các từ chỉ số lượng hoặc đối tượng chung chung nếu chúng không phải là tên riêng: '5', '10', 'sản phẩm', 'quyển', 'cuốn', 'sách'.
-               - Giữ lại tên tác giả, tên tác phẩm, hoặc thể loại cụ thể.
-            
-            Ví dụ:
-            - "Gợi ý 5 sách văn học hay" -> "Văn học"
-            - "cho mình xem 5 san pham ve tam ly" -> "Tâm lý"
-            - "Tìm sách Nhà giả kim" -> "Nhà giả kim"
-            - "Có truyện doremon không" -> "Doremon"
-            - "Chào shop" -> null
-
-            Trả về định dạng JSON duy nhất: {{"search_query": "tên sách/danh mục hoặc null"}}
-            """
-            
-            try:
-                response1 = client.models.generate_content(
-                    model=MODEL_ID, 
-                    contents=interpretation_prompt,
-                    config=types.GenerateContentConfig(
-                        response_mime_type='application/json'
-                    )
-                )
-                interpretation = json.loads(response1.text)
-                search_query = interpretation.get('search_query')
-                print(f"Chatbot: Search Query = '{search_query}'")
-            except Exception as e:
-                print(f"Lỗi phân tích: {e}")
-                search_query = None
-
-            context_info = ""
-            products_data = [] # Dữ liệu sản phẩm gửi về frontend
-
-            if search_query and str(search_query).lower() != 'null':
-                # Tìm kiếm trong Database Django (Tên hoặc Danh mục)
-                from django.db.models import Q
-
-                # 1. Tìm các Categories khớp với keyword để lấy cả danh mục con
-                target_cat_ids = set()
-                try:
-                    matching_cats = Category.objects.filter(name__icontains=search_query, is_active=True)
-                    for cat in matching_cats:
-                        target_cat_ids.update(cat.get_descendants_and_self_ids())
-                except Exception as e:
-                    print(f"Lỗi tìm danh mục: {e}")
-
-                # 2. Tìm sản phẩm: Theo tên HOẶC theo danh mục (bao gồm cả danh mục con)
-                products = Product.objects.filter(
-                    Q(name__icontains=search_query) | 
-                    Q(category__id__in=target_cat_ids) |
-                    Q(category__name__icontains=search_query),
-                    is_active=True,
-                    category__is_active=True
-                ).distinct()[:5]
-                
-                print(f"Chatbot: Found {products.count()} products for '{search_query}'")
-
-                if products.exists():
-                    product_list_text = []
-                    for p in products:
-                        if p.is_on_sale:
-                            price_str = f"{p.get_final_price():,.0f}đ (Gốc: {p.price:,.0f}đ - Giảm {p.discount_percentage}%)".replace(",", ".")
-                            final_price = f"{p.get_final_price():,.0f}đ".replace(",", ".")
-                        else:
-                            price_str = f"{p.price:,.0f}đ".replace(",", ".")
-                            final_price = f"{p.price:,.0f}đ".replace(",", ".")
-
-                        product_list_text.append(f"- {p.name} (Giá: {price_str})")
-                        
-                        # Build info for card
-                        try:
-                            img_url = p.cover_image.url if p.cover_image else '/static/img/default-book-cover.jpg'
-                        except:
-                            img_url = '/static/img/default-book-cover.jpg'
-
-                        products_data.append({
-                            'name': p.name,
-                            'price': final_price,
-                            'original_price': f"{p.price:,.0f}đ".replace(",", ".") if p.is_on_sale else "",
-                            'is_on_sale': p.is_on_sale,
-                            'image': img_url,
-                            'url': reverse('books:book_detail', args=[p.slug])
-                        })
-
-                    context_info = f"Hệ thống tìm thấy {len(products)} sách phù hợp với '{search_query}':\n" + "\n".join(product_list_text)
-                else:
-                    context_info = f"Hệ thống tìm kiếm '{search_query}' nhưng không thấy sản phẩm nào khớp."
+            intent = _detect_intent(client, user_message)
+            context_info, products_data = _search_products(intent.search_query)
 
             # Bước 2: Tạo câu trả lời thân thiện
-            system_role = "Bạn là trợ lý AI của 'The Bookstore'. Hãy trả lời thân thiện, ngắn gọn bằng tiếng Việt. Nếu có danh sách sách, hãy mời khách xem thẻ bên dưới."
-            full_prompt = f"{system_role}\nKhách hỏi: {user_message}\nThông tin hệ thống: {context_info}\nTrả lời khách:"
-
-            response2 = client.models.generate_content(
-                model=MODEL_ID,
-                contents=full_prompt
-            )
-            
-            return JsonResponse({
-                'response': response2.text,
+            cache.count('llm_calls')
+            answer = {
+                'response': client.generate(_answer_prompt(user_message, context_info)),
                 'products': products_data
-            })
+            }
+            cache.answer_cache.set(answer_key, answer)
+            return JsonResponse(answer)
 
         except Exception as e:
-            import traceback
-            error_details = traceback.format_exc()
-            print(f"Lỗi hệ thống Chatbot:\n{error_details}")
-            
-            # Xử lý lỗi API Key bị lộ hoặc hết hạn
-            error_str = str(e)
-            if "403" in error_str or "PERMISSION_DENIED" in error_str:
-                return JsonResponse({'response': "Xin lỗi, hệ thống AI đang bảo trì (Lỗi API Key). Vui lòng liên hệ Admin."}, status=200)
-            
-            if "400" in error_str and "API key expired" in error_str:
-                 return JsonResponse({'response': "Xin lỗi, key AI đã hết hạn. Vui lòng cập nhật key mới."}, status=200)
+            return JsonResponse({'response': _error_message(e)}, status=200)
+    
+    return JsonResponse({'error': 'Method not allowed'}, status=405)
 
-            if "429" in error_str or "RESOURCE_EXHAUSTED" in error_str:
-                 return JsonResponse({'response': "Xin lỗi, chatbot đang bị quá tải giới hạn miễn phí của Google (Rate Limit). Bạn vui lòng đợi khoảng 15-30 giây rồi thử lại nhé!"}, status=200)
 
-            return JsonResponse({'response': "Xin lỗi, hiện tại mình đang gặp chút sự cố. Bạn thử lại sau nhé!"}, status=200)
-    
-    return JsonResponse({'error': 'Method not allowed'}, status=405)
\ No newline at end of file
+RATE_LIMITED_MESSAGE = "Bạn đang hỏi hơi nhanh, vui lòng đợi câu trả lời trước rồi thử lại nhé!"
+
+
+def _event(**data):
+    # Mỗi sự kiện một dòng JSON (NDJSON) để chatbot.js đọc dần khi nhận được
+    return json.dumps(data, ensure_ascii=False) + '\n'
+
+
+async def _answer_events(client, user_message, client_key):
+    # Giữ chỗ ngay trong generator: nếu response bị hủy trước khi stream bắt đầu
+    # thì generator chưa chạy và cũng chưa giữ chỗ nào, không bị mất chỗ
+    if not limiter.acquire(client_key):
+        cache.count('rejected')
+        yield _event(type='error', message=RATE_LIMITED_MESSAGE)
+        return
+    try:
+        answer_key = await sync_to_async(_answer_key)(user_message)
+        answer = cache.answer_cache.get(answer_key)
+        if answer is not None:
+            yield _event(type='products', products=answer['products'])
+            yield _event(type='token', text=answer['response'])
+            yield _event(type='done')
+            return
+
+        # Bước 1: Phân tích ý định; chỉ truy vấn DB (qua thread) khi cần, còn Gemini gọi bất đồng bộ
+        intent = await sync_to_async(_known_intent)(user_message)
+        if intent is None:
+            intent = _remember_intent(user_message, await _allm_intent(client, user_message))
+        context_info, products_data = await sync_to_async(_search_products)(intent.search_query)
+        yield _event(type='products', products=products_data)
+
+        # Bước 2: Stream câu trả lời tới trình duyệt ngay khi Gemini sinh ra
+        cache.count('llm_calls')
+        parts = []
+        async for text in client.astream(_answer_prompt(user_message, context_info)):
+            parts.append(text)
+            yield _event(type='token', text=text)
+        cache.answer_cache.set(answer_key, {'response': ''.join(parts), 'products': products_data})
+        yield _event(type='done')
+    except Exception as e:
+        yield _event(type='error', message=_error_message(e))
+    finally:
+        limiter.release(client_key)
+
+
+@require_POST
+async def chat_stream(request):
+    """Phiên bản bất đồng bộ của chat_view, stream câu trả lời; nên chạy qua ASGI."""
+    client = get_llm_client()
+    if not client:
+        return JsonResponse({'response': "Lỗi: Hệ thống chưa cấu hình API Key chính xác."}, status=500)
+    try:
+        user_message = json.loads(request.body).get('message', '')
+    except ValueError:
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    if not user_message:
+        return JsonResponse({'response': "Chào bạn! Shop có thể giúp gì cho bạn?"})
+
+    user = await request.auser()
+    client_key = f"user:{user.pk}" if user.is_authenticated else f"ip:{request.META.get('REMOTE_ADDR')}"
+    if not limiter.has_room(client_key):
+        cache.count('rejected')
+        return JsonResponse({'response': RATE_LIMITED_MESSAGE}, status=429)
+
+    response = StreamingHttpResponse(
+        _answer_events(client, user_message, client_key), content_type='application/x-ndjson; charset=utf-8',
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@staff_member_required
+def chat_stats(request):
+    """Tỉ lệ trúng cache và số lần gọi Gemini của tiến trình hiện tại."""
+    return JsonResponse(dict(cache.stats(), active_streams=limiter.active()))
@@ -1,6 +1,7 @@
 from django.contrib import admin
 from import_export.admin import ImportExportModelAdmin
-from .models import Store, ContentPage, NewsPost, Banner
+from django.utils import timezone
+from .models import Store, ContentPage, NewsPost, Banner, Job
 
 admin.site.site_header = "Admin"
 admin.site.site_title = "Admin"
@@ -37,3 +38,16 @@ class BannerAdmin(ImportExportModelAdmin):
     list_filter = ("is_active",)
     search_fields = ("title",)
     ordering = ("display_order", "-created_at")
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("id", "queue", "status", "attempts", "run_at", "created_at", "finished_at")
+    list_filter = ("queue", "status")
+    readonly_fields = ("queue", "payload", "attempts", "locked_at", "last_error", "created_at", "finished_at")
+    actions = ["retry_now"]
+
+    @admin.action(description="Chạy lại ngay")
+    def retry_now(self, request, queryset):
+        count = queryset.exclude(status="running").update(status="pending", run_at=timezone.now(), attempts=0)
+        self.message_user(request, f"Đã đưa {count} việc trở lại hàng đợi.")
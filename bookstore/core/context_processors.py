@@ -1,20 +1,12 @@
 # core/context_processors.py
-from django.db.models import Prefetch
-from books.models import Category
+from books.category_tree import get_category_tree
 
 def categories_processor(request):
     """
     Cung cấp danh sách các thể loại cha (top-level) cho mọi template.
     Mỗi thể loại cha sẽ chứa các thể loại con của nó.
     """
-    # Lấy các danh mục cha (không có parent) và tải trước các con của chúng để tối ưu
-    active_children = Prefetch(
-        'children',
-        queryset=Category.objects.filter(is_active=True).prefetch_related(
-            Prefetch('children', queryset=Category.objects.filter(is_active=True))
-        )
-    )
-    parent_categories = Category.objects.filter(parent__isnull=True, is_active=True).prefetch_related(active_children)
+    # Đọc từ snapshot cây danh mục trong bộ nhớ, không truy vấn DB mỗi request
     return {
-        'parent_categories': parent_categories
+        'parent_categories': get_category_tree().roots
     }
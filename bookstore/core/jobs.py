@@ -0,0 +1,115 @@
+# core/jobs.py
+"""
+Hàng đợi việc chạy nền lưu trong DB.
+
+enqueue() chỉ ghi một dòng Job (cùng transaction với request nên không mất
+việc khi rollback). Lệnh run_workers nhận từng lô việc cùng hàng đợi bằng
+UPDATE có điều kiện, nên có thể chạy nhiều worker song song, rồi giao cả lô
+cho hàm xử lý của hàng đợi đó. Việc lỗi được chạy lại sau một khoảng chờ tăng
+dần (có jitter) cho tới max_attempts; việc bị kẹt ở trạng thái đang chạy quá
+LOCK_TIMEOUT (worker chết) được nhận lại.
+
+Hàm xử lý khai báo trong setting JOB_QUEUES (tên hàng đợi -> đường dẫn hàm).
+Hàm nhận danh sách payload và trả về danh sách lỗi cùng thứ tự (None nếu
+thành công).
+"""
+import logging
+import random
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUES = {
+    'email': 'core.mail.send_queued_emails',
+    'product_import': 'books.importer.run_import_jobs',
+}
+DEFAULT_BATCH_SIZE = 20
+LOCK_TIMEOUT = timedelta(minutes=10)
+RETRY_BASE_DELAY = 30
+RETRY_MAX_DELAY = 3600
+
+
+@dataclass
+class RunResult:
+    done: int = 0
+    retried: int = 0
+    failed: int = 0
+
+    @property
+    def total(self):
+        return self.done + self.retried + self.failed
+
+
+def queues():
+    return getattr(settings, 'JOB_QUEUES', DEFAULT_QUEUES)
+
+
+def enqueue(queue, payload, max_attempts=None, delay=None):
+    if queue not in queues():
+        raise ValueError(f"Unknown job queue: {queue}")
+    job = Job(queue=queue, payload=payload)
+    if max_attempts is not None:
+        job.max_attempts = max_attempts
+    if delay:
+        job.run_at = timezone.now() + timedelta(seconds=delay)
+    job.save()
+    return job
+
+
+def retry_delay(attempts):
+    """Số giây chờ trước lần chạy thứ attempts + 1: tăng gấp đôi mỗi lần, có jitter."""
+    delay = min(RETRY_BASE_DELAY * 2 ** (attempts - 1), RETRY_MAX_DELAY)
+    return delay * random.uniform(0.5, 1.0)
+
+
+def claim(queue, batch_size=DEFAULT_BATCH_SIZE):
+    now = timezone.now()
+    ready = Q(status='pending', run_at__lte=now) | Q(status='running', locked_at__lt=now - LOCK_TIMEOUT)
+    ids = list(Job.objects.filter(ready, queue=queue).order_by('run_at', 'id').values_list('id', flat=True)[:batch_size])
+    if not ids:
+        return []
+    # Chỉ nhận được việc còn đúng điều kiện lúc UPDATE: hai worker không nhận trùng
+    Job.objects.filter(ready, pk__in=ids).update(status='running', locked_at=now, attempts=F('attempts') + 1)
+    return list(Job.objects.filter(pk__in=ids, status='running', locked_at=now).order_by('run_at', 'id'))
+
+
+def _finish(job, error, result):
+    now = timezone.now()
+    if error is None:
+        job.status, job.finished_at, job.last_error = 'done', now, ''
+        result.done += 1
+    elif job.attempts >= job.max_attempts:
+        job.status, job.finished_at, job.last_error = 'failed', now, str(error)
+        result.failed += 1
+        logger.error("Job %s failed after %d attempts: %s", job, job.attempts, error)
+    else:
+        job.status, job.last_error = 'pending', str(error)
+        job.run_at = now + timedelta(seconds=retry_delay(job.attempts))
+        result.retried += 1
+        logger.warning("Job %s failed (attempt %d), retrying at %s: %s", job, job.attempts, job.run_at, error)
+    job.locked_at = None
+
+
+def run_batch(queue, batch_size=DEFAULT_BATCH_SIZE):
+    result = RunResult()
+    jobs = claim(queue, batch_size)
+    if not jobs:
+        return result
+    handler = import_string(queues()[queue])
+    try:
+        errors = handler([job.payload for job in jobs])
+    except Exception as e:
+        logger.exception("Job handler for %s crashed", queue)
+        errors = [e] * len(jobs)
+    for job, error in zip(jobs, errors):
+        _finish(job, error, result)
+    Job.objects.bulk_update(jobs, ['status', 'run_at', 'locked_at', 'last_error', 'finished_at'])
+    return result
@@ -0,0 +1,87 @@
+# core/mail.py
+"""
+Gửi email qua hàng đợi việc chạy nền.
+
+Đặt EMAIL_BACKEND = 'core.mail.QueuedEmailBackend' thì mọi lời gọi send()
+(form liên hệ, đặt lại mật khẩu, ...) chỉ lưu email vào hàng đợi 'email' và
+trả về ngay. Worker (run_workers) gửi cả lô qua backend thật
+(EMAIL_WORKER_BACKEND, mặc định SMTP) trên một kết nối SMTP duy nhất.
+"""
+import base64
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+
+from . import jobs
+
+QUEUE = 'email'
+DEFAULT_WORKER_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+
+
+def serialize_message(message):
+    attachments = []
+    for attachment in message.attachments:
+        filename, content, mimetype = attachment
+        if isinstance(content, str):
+            content = content.encode()
+        attachments.append([filename, base64.b64encode(content).decode('ascii'), mimetype])
+    return {
+        'subject': message.subject,
+        'body': message.body,
+        'from_email': message.from_email,
+        'to': message.to,
+        'cc': message.cc,
+        'bcc': message.bcc,
+        'reply_to': message.reply_to,
+        'headers': message.extra_headers,
+        'content_subtype': message.content_subtype,
+        'alternatives': [list(alternative) for alternative in getattr(message, 'alternatives', [])],
+        'attachments': attachments,
+    }
+
+
+def deserialize_message(data, connection=None):
+    message = EmailMultiAlternatives(
+        subject=data['subject'],
+        body=data['body'],
+        from_email=data['from_email'],
+        to=data['to'],
+        cc=data['cc'],
+        bcc=data['bcc'],
+        reply_to=data['reply_to'],
+        headers=data['headers'],
+        connection=connection,
+    )
+    message.content_subtype = data['content_subtype']
+    for content, mimetype in data['alternatives']:
+        message.attach_alternative(content, mimetype)
+    for filename, content, mimetype in data['attachments']:
+        message.attach(filename, base64.b64decode(content), mimetype)
+    return message
+
+
+class QueuedEmailBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        for message in email_messages:
+            jobs.enqueue(QUEUE, serialize_message(message))
+        return len(email_messages)
+
+
+def send_queued_emails(payloads):
+    """Hàm xử lý hàng đợi 'email': gửi cả lô trên một kết nối, trả về lỗi của từng email."""
+    backend = getattr(settings, 'EMAIL_WORKER_BACKEND', DEFAULT_WORKER_BACKEND)
+    connection = get_connection(backend, fail_silently=False)
+    connection.open()
+    errors = []
+    try:
+        for payload in payloads:
+            try:
+                connection.send_messages([deserialize_message(payload, connection)])
+            except Exception as e:
+                errors.append(e)
+            else:
+                errors.append(None)
+    finally:
+        connection.close()
+    return errors
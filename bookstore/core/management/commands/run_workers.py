@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import jobs
+
+
+class Command(BaseCommand):
+    help = "Chạy các việc nền trong hàng đợi (gửi email, ...)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queue', action='append', dest='queues', help="Chỉ chạy hàng đợi này (có thể lặp lại). Mặc định: tất cả.")
+        parser.add_argument('--batch-size', type=int, default=jobs.DEFAULT_BATCH_SIZE, help=f"Số việc nhận mỗi lượt (mặc định {jobs.DEFAULT_BATCH_SIZE}).")
+        parser.add_argument('--once', action='store_true', help="Chạy hết các việc đang đến hạn rồi dừng.")
+        parser.add_argument('--interval', type=float, default=2.0, help="Số giây nghỉ khi không có việc.")
+
+    def handle(self, *args, **options):
+        names = options['queues'] or list(jobs.queues())
+        unknown = set(names) - set(jobs.queues())
+        if unknown:
+            raise CommandError(f"Không có hàng đợi: {', '.join(sorted(unknown))}")
+
+        while True:
+            busy = False
+            for name in names:
+                result = jobs.run_batch(name, options['batch_size'])
+                if result.total:
+                    busy = True
+                    self.stdout.write(
+                        f"[{name}] xong {result.done}, chạy lại sau {result.retried}, thất bại {result.failed}."
+                    )
+            if busy:
+                continue
+            if options['once']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:41
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_banner'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('queue', models.CharField(max_length=50, verbose_name='Hàng đợi')),
+                ('payload', models.JSONField(verbose_name='Dữ liệu')),
+                ('status', models.CharField(choices=[('pending', 'Chờ chạy'), ('running', 'Đang chạy'), ('done', 'Hoàn tất'), ('failed', 'Thất bại')], default='pending', max_length=20, verbose_name='Trạng thái')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Số lần chạy')),
+                ('max_attempts', models.PositiveIntegerField(default=5, verbose_name='Số lần chạy tối đa')),
+                ('run_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Chạy từ')),
+                ('locked_at', models.DateTimeField(blank=True, null=True, verbose_name='Bắt đầu chạy lúc')),
+                ('last_error', models.TextField(blank=True, verbose_name='Lỗi gần nhất')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Hoàn tất lúc')),
+            ],
+            options={
+                'verbose_name': 'Việc chạy nền',
+                'verbose_name_plural': 'Việc chạy nền',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['queue', 'status', 'run_at'], name='core_job_queue_59db87_idx')],
+            },
+        ),
+    ]
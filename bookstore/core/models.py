@@ -1,4 +1,6 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from ckeditor_uploader.fields import RichTextUploadingField
 from django.utils.text import slugify
 from django.urls import reverse
@@ -128,3 +130,55 @@ class Banner(models.Model):
         if self.end_at and now > self.end_at:
             return False
         return True
+
+
+class Job(models.Model):
+    """Việc chạy nền (ví dụ gửi email), được lệnh run_workers xử lý; xem core/jobs.py."""
+    STATUS_CHOICES = [
+        ("pending", "Chờ chạy"),
+        ("running", "Đang chạy"),
+        ("done", "Hoàn tất"),
+        ("failed", "Thất bại"),
+    ]
+
+    queue = models.CharField("Hàng đợi", max_length=50)
+    payload = models.JSONField("Dữ liệu")
+    status = models.CharField("Trạng thái", max_length=20, choices=STATUS_CHOICES, default="pending")
+    attempts = models.PositiveIntegerField("Số lần chạy", default=0)
+    max_attempts = models.PositiveIntegerField("Số lần chạy tối đa", default=5)
+    run_at = models.DateTimeField("Chạy từ", default=timezone.now)
+    locked_at = models.DateTimeField("Bắt đầu chạy lúc", blank=True, null=True)
+    last_error = models.TextField("Lỗi gần nhất", blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField("Hoàn tất lúc", blank=True, null=True)
+
+    class Meta:
+        ordering = ["id"]
+        verbose_name = "Việc chạy nền"
+        verbose_name_plural = "Việc chạy nền"
+        indexes = [models.Index(fields=["queue", "status", "run_at"])]
+
+    def __str__(self):
+        return f"{self.queue} #{self.pk}"
+
+
+# Làm mới cache các khối trang chủ khi dữ liệu nguồn thay đổi
+HOME_BOOK_SECTIONS = ('domestic_books', 'new_books', 'best_sellers')
+
+
+@receiver(post_save, sender='books.Product')
+@receiver(post_delete, sender='books.Product')
+@receiver(post_save, sender='books.Category')
+@receiver(post_delete, sender='books.Category')
+@receiver(post_save, sender='books.ProductAttributeValue')
+@receiver(post_delete, sender='books.ProductAttributeValue')
+def invalidate_home_book_sections(sender, **kwargs):
+    from .section_cache import invalidate
+    transaction.on_commit(lambda: invalidate(*HOME_BOOK_SECTIONS))
+
+
+@receiver(post_save, sender=Banner)
+@receiver(post_delete, sender=Banner)
+def invalidate_home_banners(sender, **kwargs):
+    from .section_cache import invalidate
+    transaction.on_commit(lambda: invalidate('banners'))
@@ -0,0 +1,99 @@
+# core/section_cache.py
+"""
+Cache theo từng khối (section) của trang chủ.
+
+Mỗi section được lưu trong Django cache kèm thời điểm "hết hạn mềm". Sau thời
+điểm đó, chỉ một request giành được khóa (cache.add) mới tính lại dữ liệu;
+các request khác vẫn dùng bản cũ thay vì cùng đổ xuống DB (chống stampede).
+Khi dữ liệu nguồn thay đổi, invalidate() đánh dấu section là đã hết hạn mềm
+chứ không xóa hẳn, nên trang chủ không bao giờ phải chờ nhiều lần tính lại.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+DEFAULT_TTLS = {
+    'domestic_books': 300,
+    'new_books': 300,
+    'best_sellers': 600,
+    'banners': 120,
+}
+LOCK_TIMEOUT = 30
+WAIT_INTERVAL = 0.05
+WAIT_ATTEMPTS = 40
+
+_local_locks = {}
+_local_locks_guard = threading.Lock()
+
+
+def get_ttl(name):
+    ttls = {**DEFAULT_TTLS, **getattr(settings, 'HOME_SECTION_TTLS', {})}
+    return ttls.get(name, 300)
+
+
+def _key(name):
+    return f'core:home_section:{name}'
+
+
+def _local_lock(name):
+    with _local_locks_guard:
+        return _local_locks.setdefault(name, threading.Lock())
+
+
+def _store(name, value):
+    ttl = get_ttl(name)
+    # Giữ bản cũ lâu hơn TTL để còn dùng trong lúc đang tính lại
+    cache.set(_key(name), {'value': value, 'expires_at': time.time() + ttl}, ttl * 10)
+
+
+def _recompute(name, compute):
+    """Tính lại nếu giành được khóa; trả về (value,) hoặc None nếu nơi khác đang tính."""
+    lock_key = _key(name) + ':lock'
+    if not cache.add(lock_key, 1, LOCK_TIMEOUT):
+        return None
+    try:
+        value = compute()
+        _store(name, value)
+        return (value,)
+    finally:
+        cache.delete(lock_key)
+
+
+def get_section(name, compute):
+    """Trả về dữ liệu section `name`, chỉ gọi compute() khi cần và chỉ ở một nơi."""
+    entry = cache.get(_key(name))
+    if entry is not None:
+        if entry['expires_at'] < time.time():
+            # Hết hạn mềm: một request tính lại, các request khác dùng bản cũ
+            result = _recompute(name, compute)
+            if result is not None:
+                return result[0]
+        return entry['value']
+
+    # Chưa có dữ liệu: trong một tiến trình chỉ một thread được tính
+    with _local_lock(name):
+        entry = cache.get(_key(name))
+        if entry is not None:
+            return entry['value']
+        for _ in range(WAIT_ATTEMPTS):
+            result = _recompute(name, compute)
+            if result is not None:
+                return result[0]
+            # Tiến trình khác đang tính: chờ kết quả của nó
+            time.sleep(WAIT_INTERVAL)
+            entry = cache.get(_key(name))
+            if entry is not None:
+                return entry['value']
+        # Quá thời gian chờ: tự tính, không lưu đè
+        return compute()
+
+
+def invalidate(*names):
+    """Đánh dấu các section đã hết hạn mềm (giữ lại bản cũ để phục vụ trong lúc tính lại)."""
+    for name in names or DEFAULT_TTLS:
+        entry = cache.get(_key(name))
+        if entry is not None:
+            entry['expires_at'] = 0
+            cache.set(_key(name), entry, get_ttl(name) * 10)
@@ -6,7 +6,6 @@ import json
 import math
 import re
 import uuid
-from django.db import models
 from django.http import JsonResponse, HttpResponse
 from django.views.decorators.http import require_GET, require_http_methods
 from django.views.generic import TemplateView, ListView, DetailView, FormView
@@ -19,69 +18,72 @@ from django.template.loader import render_to_string
 from django.utils import timezone
 from books.models import Product, Category
 from .models import Store, ContentPage, NewsPost, Banner
+from . import section_cache
 from .forms import ContactForm
+
+
+def _category_products(slugs, order_by='-created_at', limit=10, fallback_order=None):
+    """Sản phẩm mới nhất thuộc danh mục đầu tiên khớp `slugs` (kể cả danh mục con)."""
+    products = Product.objects.filter(is_active=True, category__is_active=True)
+    category = Category.objects.filter(slug__in=slugs, is_active=True).first()
+    if category:
+        products = products.filter(category__ancestor_links__ancestor=category)
+    elif fallback_order:
+        order_by = fallback_order
+    else:
+        return []
+    # Trả về list đã nạp sẵn thuộc tính để lưu cache và render thẻ sách không cần truy vấn
+    return list(
+        products.prefetch_related('attribute_values__attribute')
+        .order_by(order_by)[:limit]
+    )
+
+
+def _domestic_books():
+    # Ưu tiên tìm slug 'sach-viet-nam' như cũ, hiển thị là "Sách Trong Nước"
+    return _category_products(['sach-viet-nam', 'sach-trong-nuoc'])
+
+
+def _new_books():
+    # Ưu tiên Văn Học, không có thì lấy sách mới nhất
+    return _category_products(['van-hoc', 'van-hoc-nghe-thuat'], fallback_order='-created_at')
+
+
+def _best_sellers():
+    # Bán chạy nhất 30 ngày qua (bảng xếp hạng do lệnh refresh_sales_rank cập nhật)
+    best_sellers = list(
+        Product.objects.filter(is_active=True, category__is_active=True)
+        .best_sellers(days=30)
+        .prefetch_related('attribute_values__attribute')[:10]
+    )
+    if best_sellers:
+        return best_sellers
+    # Chưa có dữ liệu bán hàng: lấy từ Tiểu Thuyết, không có thì lấy sách giá cao nhất
+    novels = _category_products(['tieu-thuyet'])
+    if novels:
+        return novels
+    return _category_products([], fallback_order='-price', limit=5)
+
+
+def _active_banners():
+    # Lọc theo khung thời gian hiển thị được làm lúc request, nên cache được cả danh sách
+    return list(Banner.objects.filter(is_active=True).order_by('display_order', '-created_at'))
+
+
 class HomeView(TemplateView):
     template_name = 'home.html'
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        
-        # 1. Sách Trong Nước (lấy từ category 'sach-viet-nam' hoặc 'sach-trong-nuoc')
-        try:
-            # Ưu tiên tìm slug 'sach-viet-nam' như cũ, hiển thị là "Sách Trong Nước"
-            vn_category = Category.objects.filter(slug__in=['sach-viet-nam', 'sach-trong-nuoc'], is_active=True).first()
-            if vn_category:
-                vn_category_ids = vn_category.get_descendants_and_self_ids()
-                context['domestic_books'] = Product.objects.filter(
-                    is_active=True,
-                    category__is_active=True,
-                    category_id__in=vn_category_ids
-                ).order_by('-created_at')[:10]
-            else:
-                context['domestic_books'] = Product.objects.none()
-        except:
-            context['domestic_books'] = Product.objects.none()
-
-        # 2. Sách Mới Nhất - Ưu tiên Văn Học
-        try:
-            lit_category = Category.objects.filter(slug__in=['van-hoc', 'van-hoc-nghe-thuat'], is_active=True).first()
-            if lit_category:
-                lit_ids = lit_category.get_descendants_and_self_ids()
-                context['new_books'] = Product.objects.filter(
-                    is_active=True,
-                    category__is_active=True,
-                    category_id__in=lit_ids
-                ).order_by('-created_at')[:10]
-            else:
-                 # Fallback nếu không có danh mục Văn học
-                context['new_books'] = Product.objects.filter(is_active=True, category__is_active=True).order_by('-created_at')[:10]
-        except:
-            context['new_books'] = Product.objects.none()
-
-        # 3. Sách Nổi Bật - Lấy từ Tiểu Thuyết
-        try:
-            novel_category = Category.objects.filter(slug__in=['tieu-thuyet'], is_active=True).first()
-            if novel_category:
-                novel_ids = novel_category.get_descendants_and_self_ids()
-                context['best_sellers'] = Product.objects.filter(
-                    is_active=True,
-                    category__is_active=True,
-                    category_id__in=novel_ids
-                ).order_by('-created_at')[:10] # Hoặc order theo logic khác
-            else:
-                 # Fallback
-                context['best_sellers'] = Product.objects.filter(is_active=True, category__is_active=True).order_by('-price')[:5]
-        except:
-             context['best_sellers'] = Product.objects.none()
-
-        now = timezone.now()
-        context['banners'] = Banner.objects.filter(
-            is_active=True
-        ).filter(
-            models.Q(start_at__isnull=True) | models.Q(start_at__lte=now),
-            models.Q(end_at__isnull=True) | models.Q(end_at__gte=now)
-        ).order_by('display_order', '-created_at')
-        
+
+        # 1. Sách Trong Nước, 2. Sách Mới Nhất, 3. Sách Nổi Bật: mỗi khối cache riêng
+        context['domestic_books'] = section_cache.get_section('domestic_books', _domestic_books)
+        context['new_books'] = section_cache.get_section('new_books', _new_books)
+        context['best_sellers'] = section_cache.get_section('best_sellers', _best_sellers)
+
+        banners = section_cache.get_section('banners', _active_banners)
+        context['banners'] = [banner for banner in banners if banner.is_available()]
+
         return context
 
 
@@ -3,14 +3,22 @@ from django.contrib import admin
 from import_export.admin import ImportExportModelAdmin
 from django.utils.html import format_html
 from .models import Order, OrderItem, Coupon
+from .coupons import coupon_status
 
 
 @admin.register(Coupon)
 class CouponAdmin(ImportExportModelAdmin):
-    list_display = ['code', 'discount_type', 'value', 'min_order_value', 'valid_to', 'is_active', 'used_count']
+    list_display = ['code', 'discount_type', 'value', 'min_order_value', 'valid_to', 'is_active', 'used_count', 'status']
     list_filter = ['is_active', 'valid_from', 'valid_to', 'discount_type']
     search_fields = ['code']
 
+    def status(self, obj):
+        reason = coupon_status(obj)
+        if reason is None:
+            return format_html('<span style="color: green;">{}</span>', 'Đang áp dụng')
+        return format_html('<span style="color: gray;">{}</span>', reason)
+    status.short_description = "Tình trạng"
+
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
@@ -0,0 +1,214 @@
+# orders/analytics.py
+"""
+Số liệu cho API thống kê trên trang admin.
+
+Mọi báo cáo chỉ đọc các bảng gom sẵn theo ngày: ProductSalesDaily (sản phẩm,
+danh mục), OrderStatsDaily (số đơn, doanh thu, giỏ hàng mới) và
+CouponUsageDaily (mã giảm giá), không quét bảng đơn hàng lúc xem. Hai bảng sau
+được tính lại cùng các ngày mà refresh_sales_rank() tính lại; riêng số giỏ
+hàng mới được cộng dồn khi giỏ được tạo (giỏ cũ bị xóa định kỳ nên không thể
+đếm lại). Kết quả từng báo cáo được cache theo khoảng ngày và đổi version sau
+mỗi lần tổng hợp.
+"""
+import uuid
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import CouponUsageDaily, Order, OrderStatsDaily, ProductSalesDaily
+
+VERSION_CACHE_KEY = 'orders:analytics:version'
+CACHE_TIMEOUT = 600
+DEFAULT_DAYS = 30
+MAX_DAYS = 366
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+
+
+def sold_orders():
+    # Cùng định nghĩa với bảng xếp hạng bán chạy: đơn COD hoặc đã thanh toán, chưa bị hủy
+    return Order.objects.exclude(status='canceled').filter(
+        Q(payment__method='cod') | Q(payment__status='completed')
+    )
+
+
+# --- Tổng hợp ---
+
+def rebuild_days(days=None):
+    """Tính lại OrderStatsDaily (trừ số giỏ hàng) và CouponUsageDaily cho các ngày `days` (None: toàn bộ)."""
+    orders = sold_orders()
+    stats = OrderStatsDaily.objects.all()
+    usage = CouponUsageDaily.objects.all()
+    if days is not None:
+        orders = orders.filter(created_at__date__in=days)
+        stats = stats.filter(date__in=days)
+        usage = usage.filter(date__in=days)
+    orders = orders.order_by().annotate(day=TruncDate('created_at'))
+
+    stats.update(orders=0, revenue=0, discount_total=0)
+    day_rows = orders.values('day').annotate(
+        count=Count('id'), revenue=Sum('total_amount'), discount=Sum('discount_amount'),
+    )
+    OrderStatsDaily.objects.bulk_create(
+        [
+            OrderStatsDaily(date=row['day'], orders=row['count'], revenue=row['revenue'], discount_total=row['discount'])
+            for row in day_rows
+        ],
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['date'],
+        update_fields=['orders', 'revenue', 'discount_total'],
+    )
+
+    usage.delete()
+    coupon_rows = orders.filter(coupon__isnull=False).values('coupon_id', 'day').annotate(
+        count=Count('id'), revenue=Sum('total_amount'), discount=Sum('discount_amount'),
+    )
+    CouponUsageDaily.objects.bulk_create(
+        [
+            CouponUsageDaily(
+                coupon_id=row['coupon_id'], date=row['day'], orders=row['count'],
+                revenue=row['revenue'], discount_total=row['discount'],
+            )
+            for row in coupon_rows
+        ],
+        batch_size=1000,
+    )
+
+
+def record_cart_created(created_at):
+    day = timezone.localdate(created_at)
+    counter = OrderStatsDaily.objects.filter(date=day)
+    if not counter.update(carts_created=F('carts_created') + 1):
+        OrderStatsDaily.objects.get_or_create(date=day)
+        counter.update(carts_created=F('carts_created') + 1)
+
+
+# --- Báo cáo ---
+
+def _money(value):
+    return float(value or 0)
+
+
+def _ratio(numerator, denominator):
+    return round(float(numerator) / float(denominator), 4) if denominator else None
+
+
+def summary(start, end):
+    totals = OrderStatsDaily.objects.filter(date__range=(start, end)).aggregate(
+        orders=Sum('orders', default=0),
+        revenue=Sum('revenue', default=Decimal('0')),
+        discount_total=Sum('discount_total', default=Decimal('0')),
+        carts_created=Sum('carts_created', default=0),
+    )
+    return {
+        'orders': totals['orders'],
+        'revenue': _money(totals['revenue']),
+        'discount_total': _money(totals['discount_total']),
+        'average_order_value': _ratio(totals['revenue'], totals['orders']),
+        'carts_created': totals['carts_created'],
+        'cart_conversion_rate': _ratio(totals['orders'], totals['carts_created']),
+    }
+
+
+def top_products(start, end, limit=DEFAULT_LIMIT):
+    rows = (
+        ProductSalesDaily.objects.filter(date__range=(start, end)).order_by()
+        .values('product_id', 'product__name')
+        .annotate(units=Sum('units'), revenue=Sum('revenue'))
+        .order_by('-revenue', '-units')[:limit]
+    )
+    return [
+        {'id': row['product_id'], 'name': row['product__name'], 'units': row['units'], 'revenue': _money(row['revenue'])}
+        for row in rows
+    ]
+
+
+def top_categories(start, end, limit=DEFAULT_LIMIT):
+    rows = (
+        ProductSalesDaily.objects.filter(date__range=(start, end)).order_by()
+        .values('product__category_id', 'product__category__name')
+        .annotate(units=Sum('units'), revenue=Sum('revenue'))
+        .order_by('-revenue', '-units')[:limit]
+    )
+    return [
+        {
+            'id': row['product__category_id'],
+            'name': row['product__category__name'],
+            'units': row['units'],
+            'revenue': _money(row['revenue']),
+        }
+        for row in rows
+    ]
+
+
+def coupons(start, end, limit=DEFAULT_LIMIT):
+    rows = (
+        CouponUsageDaily.objects.filter(date__range=(start, end)).order_by()
+        .values('coupon_id', 'coupon__code')
+        .annotate(orders=Sum('orders'), discount_total=Sum('discount_total'), revenue=Sum('revenue'))
+        .order_by('-orders', '-revenue')[:limit]
+    )
+    return [
+        {
+            'id': row['coupon_id'],
+            'code': row['coupon__code'],
+            'redemptions': row['orders'],
+            'discount_total': _money(row['discount_total']),
+            'revenue': _money(row['revenue']),
+            # Doanh thu mang về trên mỗi đồng giảm giá
+            'revenue_per_discount': _ratio(row['revenue'], row['discount_total']),
+        }
+        for row in rows
+    ]
+
+
+REPORTS = {
+    'summary': summary,
+    'top-products': top_products,
+    'top-categories': top_categories,
+    'coupons': coupons,
+}
+
+
+def date_range(params, today=None):
+    """(start, end) từ tham số start/end (YYYY-MM-DD) hoặc days; báo ValueError nếu không hợp lệ."""
+    today = today or timezone.localdate()
+    end = date.fromisoformat(params['end']) if params.get('end') else today
+    if params.get('start'):
+        start = date.fromisoformat(params['start'])
+    else:
+        start = end - timedelta(days=int(params.get('days') or DEFAULT_DAYS) - 1)
+    if start > end:
+        raise ValueError("start phải trước end")
+    if (end - start).days + 1 > MAX_DAYS:
+        raise ValueError(f"Khoảng thời gian tối đa {MAX_DAYS} ngày")
+    return start, end
+
+
+def _version():
+    version = cache.get(VERSION_CACHE_KEY)
+    if version is None:
+        cache.add(VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+        version = cache.get(VERSION_CACHE_KEY)
+    return version
+
+
+def report(name, start, end, limit=DEFAULT_LIMIT):
+    """Kết quả báo cáo `name` (có cache); báo KeyError nếu không có báo cáo này."""
+    compute = REPORTS[name]
+    args = (start, end) if name == 'summary' else (start, end, min(limit, MAX_LIMIT))
+    key = f"orders:analytics:{_version()}:{name}:{':'.join(str(arg) for arg in args)}"
+    result = cache.get(key)
+    if result is None:
+        result = compute(*args)
+        cache.set(key, result, CACHE_TIMEOUT)
+    return result
+
+
+def invalidate():
+    cache.set(VERSION_CACHE_KEY, uuid.uuid4().hex, None)
@@ -1,5 +1,9 @@
 from decimal import Decimal
 from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, When
+from django.utils import timezone
+from django.utils.module_loading import import_string
 from books.models import Product
 
 class Cart(object):
@@ -78,6 +82,12 @@ class Cart(object):
         """
         return sum(item['quantity'] for item in self.cart.values())
 
+    def item_count(self):
+        """
+        Number of distinct products in the cart.
+        """
+        return len(self.cart)
+
     def get_total_price(self):
         return sum(Decimal(item['price']) * item['quantity'] for item in self.cart.values())
 
@@ -130,3 +140,227 @@ class Cart(object):
         # remove cart from session
         del self.session[settings.CART_SESSION_ID]
         self.save()
+
+
+CART_ID_SESSION_KEY = f'{settings.CART_SESSION_ID}_id'
+PRICE_QUANTUM = Decimal('0.01')
+
+
+def _current_price(product):
+    return Decimal(product.get_final_price()).quantize(PRICE_QUANTUM)
+
+
+class DatabaseCart(object):
+    """
+    Cart stored in ShoppingCart/CartLine rows instead of the session.
+
+    Lines are loaded once (joined with their products) and every read works on
+    that snapshot; the session only keeps the cart id of anonymous visitors.
+    Prices are refreshed against the current product prices on load.
+    """
+
+    def __init__(self, request):
+        self.session = request.session
+        self.user = request.user if request.user.is_authenticated else None
+        self._lines = None
+        self._cart_id = None
+
+    # --- Loading ---
+
+    def _line_queryset(self):
+        from .models import CartLine
+
+        if self.user is not None:
+            return CartLine.objects.filter(cart__user=self.user)
+        cart_id = self.session.get(CART_ID_SESSION_KEY)
+        if cart_id:
+            return CartLine.objects.filter(cart_id=cart_id, cart__user__isnull=True)
+        return CartLine.objects.none()
+
+    def _load(self):
+        if self._lines is None:
+            lines = list(self._line_queryset().select_related('product__category').order_by('id'))
+            self._lines = {line.product_id: line for line in lines}
+            if lines:
+                self._cart_id = lines[0].cart_id
+            self._refresh_prices()
+            self._import_session_cart()
+        return self._lines
+
+    def _refresh_prices(self):
+        changed = []
+        for line in self._lines.values():
+            price = _current_price(line.product)
+            if line.price != price:
+                line.price = price
+                changed.append(line)
+        if changed:
+            from .models import CartLine
+            CartLine.objects.bulk_update(changed, ['price'])
+
+    def _import_session_cart(self):
+        """Move a cart left in the session by the session backend into the database."""
+        legacy = self.session.get(settings.CART_SESSION_ID)
+        if not isinstance(legacy, dict):
+            return
+        del self.session[settings.CART_SESSION_ID]
+        products = Product.objects.in_bulk([int(pid) for pid in legacy])
+        for product_id, item in legacy.items():
+            product = products.get(int(product_id))
+            if product is not None and int(product_id) not in self._lines:
+                self.add(product, quantity=item.get('quantity', 1))
+
+    def _get_cart_id(self):
+        from .models import ShoppingCart
+
+        if self._cart_id is None:
+            if self.user is not None:
+                cart, _ = ShoppingCart.objects.get_or_create(user=self.user)
+            else:
+                cart_id = self.session.get(CART_ID_SESSION_KEY)
+                cart = ShoppingCart.objects.filter(pk=cart_id, user__isnull=True).first() if cart_id else None
+                if cart is None:
+                    cart = ShoppingCart.objects.create()
+                    self.session[CART_ID_SESSION_KEY] = cart.pk
+            self._cart_id = cart.pk
+        return self._cart_id
+
+    def _lines_queryset_for_update(self):
+        from .models import CartLine
+        return CartLine.objects.filter(cart_id=self._cart_id)
+
+    # --- Changes ---
+
+    def add(self, product, quantity=1, override_quantity=False):
+        from .models import CartLine, ShoppingCart
+
+        lines = self._load()
+        line = lines.get(product.id)
+        if line is None:
+            line, _ = CartLine.objects.get_or_create(
+                cart_id=self._get_cart_id(),
+                product=product,
+                defaults={'quantity': 0, 'price': _current_price(product)},
+            )
+            line.product = product
+            lines[product.id] = line
+        line.quantity = quantity if override_quantity else line.quantity + quantity
+        line.save(update_fields=['quantity'])
+        ShoppingCart.objects.filter(pk=line.cart_id).update(updated_at=timezone.now())
+
+    def save(self):
+        # Changes are written immediately; kept for API compatibility with Cart
+        pass
+
+    def remove(self, product):
+        lines = self._load()
+        if lines.pop(product.id, None) is not None:
+            self._lines_queryset_for_update().filter(product_id=product.id).delete()
+
+    # --- Reading ---
+
+    def _item(self, line):
+        return {
+            'product': line.product,
+            'quantity': line.quantity,
+            'price': line.price,
+            'total_price': line.price * line.quantity,
+            'selected': line.selected,
+        }
+
+    def __iter__(self):
+        for line in self._load().values():
+            yield self._item(line)
+
+    def __len__(self):
+        return sum(line.quantity for line in self._load().values())
+
+    def item_count(self):
+        return len(self._load())
+
+    def get_total_price(self):
+        return sum((line.price * line.quantity for line in self._load().values()), Decimal('0'))
+
+    def get_selected_items(self):
+        return [
+            self._item(line) for line in self._load().values()
+            if line.selected and line.product.is_active and line.product.category.is_active
+        ]
+
+    def get_selected_total_price(self):
+        return sum(
+            (line.price * line.quantity for line in self._load().values() if line.selected),
+            Decimal('0'),
+        )
+
+    # --- Selection ---
+
+    def set_selected(self, selected_ids):
+        selected_ids = {int(pid) for pid in selected_ids if str(pid).isdigit()}
+        lines = self._load()
+        if not lines:
+            return
+        for product_id, line in lines.items():
+            line.selected = product_id in selected_ids
+        self._lines_queryset_for_update().update(
+            selected=Case(When(product_id__in=selected_ids, then=True), default=False)
+        )
+
+    def set_all_selected(self, selected=True):
+        lines = self._load()
+        if not lines:
+            return
+        for line in lines.values():
+            line.selected = selected
+        self._lines_queryset_for_update().update(selected=selected)
+
+    def remove_selected(self):
+        lines = self._load()
+        to_remove = [product_id for product_id, line in lines.items() if line.selected]
+        for product_id in to_remove:
+            del lines[product_id]
+        if to_remove:
+            self._lines_queryset_for_update().filter(product_id__in=to_remove).delete()
+
+    def clear(self):
+        lines = self._load()
+        if lines:
+            self._lines_queryset_for_update().delete()
+            lines.clear()
+
+
+def get_cart(request):
+    """
+    Return the cart of the current request, created once per request.
+    The class is chosen by settings.CART_BACKEND (session-based Cart by default).
+    """
+    cart = getattr(request, '_cart', None)
+    if cart is None:
+        backend = import_string(getattr(settings, 'CART_BACKEND', 'orders.cart.Cart'))
+        cart = request._cart = backend(request)
+    return cart
+
+
+def merge_anonymous_cart(request, user):
+    """Move the lines of the visitor's anonymous cart into the user's cart after login."""
+    from .models import CartLine, ShoppingCart
+
+    cart_id = request.session.pop(CART_ID_SESSION_KEY, None)
+    if not cart_id:
+        return
+    with transaction.atomic():
+        anonymous = ShoppingCart.objects.filter(pk=cart_id, user__isnull=True).first()
+        if anonymous is None:
+            return
+        user_cart, _ = ShoppingCart.objects.get_or_create(user=user)
+        existing = {line.product_id: line for line in user_cart.lines.all()}
+        for line in anonymous.lines.all():
+            current = existing.get(line.product_id)
+            if current is not None:
+                current.quantity += line.quantity
+                current.save(update_fields=['quantity'])
+            else:
+                CartLine.objects.filter(pk=line.pk).update(cart=user_cart)
+        anonymous.delete()
+    # The request may already hold a cart built for the anonymous visitor
+    request.__dict__.pop('_cart', None)
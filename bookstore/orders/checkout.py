@@ -0,0 +1,164 @@
+# orders/checkout.py
+"""
+Đặt hàng trong một transaction duy nhất.
+
+Tồn kho được trừ bằng UPDATE có điều kiện (stock >= số lượng) nên hai người
+mua cùng lúc không thể cùng lấy món hàng cuối cùng; lượt dùng mã giảm giá cũng
+được tăng bằng UPDATE có điều kiện (used_count < max_uses). Nếu một bước thất
+bại thì toàn bộ đơn hàng được rollback. Thời gian từng bước được ghi log và
+trả về cùng kết quả để view gắn vào header Server-Timing.
+"""
+import logging
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from books import facets
+from books.models import Product
+from payment.models import Payment
+from . import coupons
+from .models import Coupon, Order, OrderItem
+from .order_numbers import generate_order_number
+
+logger = logging.getLogger(__name__)
+
+
+class CheckoutError(Exception):
+    """Lỗi nghiệp vụ khi đặt hàng; thông báo có thể hiển thị cho người dùng."""
+
+
+class OutOfStockError(CheckoutError):
+    def __init__(self, products):
+        self.products = products
+        names = ', '.join(product.name for product in products)
+        super().__init__(f"Sản phẩm không đủ số lượng trong kho: {names}. Vui lòng cập nhật lại giỏ hàng.")
+
+
+@dataclass
+class CheckoutResult:
+    order: Order
+    coupon_applied: bool = False
+    timings: dict = field(default_factory=dict)
+
+    def server_timing(self):
+        return ', '.join(f'checkout-{name};dur={duration:.1f}' for name, duration in self.timings.items())
+
+
+@contextmanager
+def _stage(timings, name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = (time.perf_counter() - started) * 1000
+
+
+def _reserve_stock(items):
+    """Trừ tồn kho cho từng sản phẩm; báo lỗi nếu có sản phẩm không đủ hàng."""
+    missing = []
+    # Luôn khóa theo thứ tự id để hai đơn hàng không chờ lẫn nhau
+    for item in sorted(items, key=lambda item: item['product'].id):
+        product = item['product']
+        updated = Product.objects.filter(pk=product.pk, is_active=True, stock__gte=item['quantity']).update(
+            stock=F('stock') - item['quantity'],
+        )
+        if not updated:
+            missing.append(product)
+    if missing:
+        raise OutOfStockError(missing)
+
+
+def _redeem_coupon(coupon_id, subtotal, shipping_fee):
+    """Tăng lượt dùng mã giảm giá nếu còn hiệu lực; trả về (coupon, số tiền giảm) hoặc (None, 0)."""
+    now = timezone.now()
+    redeemed = Coupon.objects.filter(
+        pk=coupon_id, is_active=True, valid_from__lte=now, valid_to__gte=now, used_count__lt=F('max_uses'),
+    ).update(used_count=F('used_count') + 1)
+    if not redeemed:
+        return None, Decimal('0')
+    coupon = Coupon.objects.get(pk=coupon_id)
+    if coupon.used_count >= coupon.max_uses:
+        # Hết lượt: bỏ mã khỏi danh sách đang dùng được của mọi tiến trình
+        transaction.on_commit(coupons.invalidate)
+    return coupon, Decimal(coupon.calculate_discount(subtotal, shipping_fee))
+
+
+def _invalidate_stock_caches(product_ids):
+    # Sản phẩm vừa hết hàng phải biến mất khỏi bộ lọc "Còn hàng"
+    if Product.objects.filter(pk__in=product_ids, stock=0).exists():
+        transaction.on_commit(facets.invalidate)
+
+
+def place_order(user, address, items, payment_method, coupon_id=None, note=''):
+    """
+    Tạo đơn hàng, chi tiết đơn hàng và thanh toán cho các dòng giỏ hàng `items`
+    (dict có product, price, quantity). Báo CheckoutError nếu không thể đặt hàng.
+    """
+    if not items:
+        raise CheckoutError("Vui lòng chọn ít nhất 1 sản phẩm để thanh toán.")
+
+    timings = {}
+    # Sinh mã trước khi mở transaction để bộ cấp khối giữ được khối số của nó
+    order_number = generate_order_number()
+    subtotal = sum((Decimal(item['price']) * item['quantity'] for item in items), Decimal('0'))
+    shipping_fee = coupons.default_shipping_fee()
+
+    with transaction.atomic():
+        with _stage(timings, 'stock'):
+            _reserve_stock(items)
+            _invalidate_stock_caches([item['product'].id for item in items])
+
+        coupon, discount = None, Decimal('0')
+        if coupon_id:
+            with _stage(timings, 'coupon'):
+                coupon, discount = _redeem_coupon(coupon_id, subtotal, shipping_fee)
+
+        with _stage(timings, 'order'):
+            order = Order.objects.create(
+                order_number=order_number,
+                user=user,
+                shipping_address=address,
+                coupon=coupon,
+                total_amount=subtotal + shipping_fee - discount,
+                shipping_fee=shipping_fee,
+                discount_amount=discount,
+                note=note,
+            )
+
+        with _stage(timings, 'items'):
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, product=item['product'], price=item['price'], quantity=item['quantity'])
+                for item in items
+            ])
+
+        with _stage(timings, 'payment'):
+            Payment.objects.create(order=order, method=payment_method, amount=order.total_amount)
+
+    logger.info(
+        "Checkout %s: %s",
+        order.order_number,
+        ' '.join(f'{name}={duration:.1f}ms' for name, duration in timings.items()),
+    )
+    return CheckoutResult(order=order, coupon_applied=coupon is not None, timings=timings)
+
+
+def cancel_order(order):
+    """Hủy đơn hàng đang chờ xác nhận và hoàn lại tồn kho; trả về False nếu không hủy được."""
+    with transaction.atomic():
+        canceled = Order.objects.filter(pk=order.pk, status='pending').update(
+            status='canceled', updated_at=timezone.now(),
+        )
+        if not canceled:
+            return False
+        for product_id, quantity in order.items.values_list('product_id', 'quantity'):
+            Product.objects.filter(pk=product_id).update(stock=F('stock') + quantity)
+        Payment.objects.filter(order=order).update(status='canceled')
+    order.status = 'canceled'
+    # Sản phẩm có thể có hàng trở lại
+    transaction.on_commit(facets.invalidate)
+    return True
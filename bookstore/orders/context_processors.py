@@ -1,4 +1,7 @@
-from .cart import Cart
+from django.utils.functional import SimpleLazyObject
+
+from .cart import get_cart
 
 def cart(request):
-    return {'cart': Cart(request)}
+    # Chỉ tải giỏ hàng khi template thực sự dùng tới
+    return {'cart': SimpleLazyObject(lambda: get_cart(request))}
@@ -0,0 +1,116 @@
+# orders/coupons.py
+"""
+Xét điều kiện áp dụng mã giảm giá.
+
+Danh sách mã đang kích hoạt được giữ trong bộ nhớ của từng tiến trình (kèm
+version trong Django cache để mọi tiến trình cùng làm mới khi mã giảm giá được
+lưu). Snapshot còn tự hết hạn ở mốc valid_from/valid_to gần nhất, nên một mã
+vừa bắt đầu hoặc vừa hết hiệu lực được phản ánh đúng lúc mà không cần truy
+vấn lại ở mỗi lần gõ mã. Trang thanh toán, apply_coupon và admin dùng chung
+các hàm ở đây.
+"""
+import threading
+import uuid
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.utils import timezone
+
+VERSION_CACHE_KEY = 'orders:coupons:version'
+
+_lock = threading.Lock()
+_snapshot = None
+
+
+@dataclass(frozen=True)
+class CouponOption:
+    coupon: object
+    eligible: bool
+    reason: str
+    discount: Decimal = Decimal('0')
+
+
+def default_shipping_fee():
+    from .models import Order
+    return Decimal(Order._meta.get_field('shipping_fee').default)
+
+
+def coupon_status(coupon, now=None):
+    """Lý do mã không dùng được (bỏ qua giá trị đơn hàng), hoặc None nếu còn hiệu lực."""
+    now = now or timezone.now()
+    if not coupon.is_active:
+        return 'Mã đã ngừng áp dụng'
+    if not (coupon.valid_from <= now <= coupon.valid_to):
+        return 'Hết hạn hoặc chưa đến ngày áp dụng'
+    if coupon.used_count >= coupon.max_uses:
+        return 'Đã hết lượt sử dụng'
+    return None
+
+
+class CouponSet:
+    def __init__(self, version, coupons, now):
+        self.version = version
+        self.coupons = coupons
+        self._by_code = {coupon.code: coupon for coupon in coupons}
+        # Mốc thời gian gần nhất làm thay đổi trạng thái của một mã
+        boundaries = [
+            moment for coupon in coupons for moment in (coupon.valid_from, coupon.valid_to)
+            if moment > now
+        ]
+        self.expires_at = min(boundaries, default=None)
+
+    def is_stale(self, version, now):
+        return self.version != version or (self.expires_at is not None and now >= self.expires_at)
+
+    def get(self, code):
+        return self._by_code.get(code)
+
+    def evaluate_coupon(self, coupon, subtotal, shipping_fee, now=None):
+        reason = coupon_status(coupon, now)
+        if reason is not None:
+            return CouponOption(coupon, False, reason)
+        if subtotal < coupon.min_order_value:
+            return CouponOption(coupon, False, f'Đơn tối thiểu {coupon.min_order_value:,.0f}₫')
+        discount = Decimal(coupon.calculate_discount(subtotal, shipping_fee))
+        return CouponOption(coupon, True, 'Có thể áp dụng', discount)
+
+    def evaluate(self, subtotal, shipping_fee, now=None):
+        """Tình trạng của mọi mã đang kích hoạt với đơn hàng này, trong một lượt duyệt."""
+        now = now or timezone.now()
+        return [self.evaluate_coupon(coupon, subtotal, shipping_fee, now) for coupon in self.coupons]
+
+    def best(self, subtotal, shipping_fee, now=None):
+        """Mã đủ điều kiện giảm được nhiều tiền nhất, hoặc None."""
+        options = [option for option in self.evaluate(subtotal, shipping_fee, now) if option.eligible and option.discount > 0]
+        return max(options, key=lambda option: option.discount, default=None)
+
+
+def _build(version, now):
+    from .models import Coupon
+    return CouponSet(version, list(Coupon.objects.filter(is_active=True).order_by('-value', 'code')), now)
+
+
+def get_coupon_set():
+    global _snapshot
+    version = cache.get(VERSION_CACHE_KEY)
+    if version is None:
+        version = uuid.uuid4().hex
+        cache.add(VERSION_CACHE_KEY, version, None)
+        version = cache.get(VERSION_CACHE_KEY, version)
+
+    now = timezone.now()
+    snapshot = _snapshot
+    if snapshot is not None and not snapshot.is_stale(version, now):
+        return snapshot
+
+    with _lock:
+        if _snapshot is None or _snapshot.is_stale(version, now):
+            _snapshot = _build(version, now)
+        return _snapshot
+
+
+def invalidate():
+    global _snapshot
+    cache.set(VERSION_CACHE_KEY, uuid.uuid4().hex, None)
+    _snapshot = None
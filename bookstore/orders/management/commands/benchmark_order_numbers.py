@@ -0,0 +1,62 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils.module_loading import import_string
+
+
+class Command(BaseCommand):
+    help = (
+        "Đo tốc độ sinh mã đơn hàng với nhiều worker chạy song song và kiểm tra không có mã trùng. "
+        "Mỗi worker dùng một bộ sinh riêng, giống như các tiến trình web khác nhau."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8, help="Số worker song song (mặc định 8).")
+        parser.add_argument('--count', type=int, default=20000, help="Tổng số mã cần sinh (mặc định 20000).")
+        parser.add_argument('--block-size', type=int, default=None, help="Kích thước khối cho mỗi worker.")
+        parser.add_argument(
+            '--generator', default='orders.order_numbers.BlockOrderNumberGenerator',
+            help="Đường dẫn tới class sinh mã cần đo.",
+        )
+
+    def handle(self, *args, **options):
+        generator_class = import_string(options['generator'])
+        workers = options['workers']
+        per_worker = max(1, options['count'] // workers)
+        results = [[] for _ in range(workers)]
+        errors = []
+        start_barrier = threading.Barrier(workers)
+
+        def run(index):
+            try:
+                kwargs = {'block_size': options['block_size']} if options['block_size'] else {}
+                generator = generator_class(**kwargs)
+                start_barrier.wait()
+                results[index] = [generator.next_number() for _ in range(per_worker)]
+            except Exception as e:  # báo lỗi của worker sau khi tất cả kết thúc
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(workers)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        if errors:
+            raise CommandError(f"Worker lỗi: {errors[0]!r}")
+        numbers = [number for chunk in results for number in chunk]
+        duplicates = len(numbers) - len(set(numbers))
+        rate = len(numbers) / elapsed if elapsed else float('inf')
+        self.stdout.write(
+            f"{len(numbers)} mã / {workers} worker trong {elapsed:.3f}s ({rate:,.0f} mã/giây), "
+            f"độ dài tối đa {max(map(len, numbers))} ký tự."
+        )
+        if duplicates:
+            raise CommandError(f"Phát hiện {duplicates} mã trùng lặp.")
+        self.stdout.write(self.style.SUCCESS("Không có mã trùng lặp."))
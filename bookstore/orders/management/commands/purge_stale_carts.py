@@ -0,0 +1,18 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from orders.models import ShoppingCart
+
+
+class Command(BaseCommand):
+    help = "Xóa giỏ hàng của khách chưa đăng nhập không được cập nhật trong một khoảng thời gian."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30, help="Số ngày không hoạt động (mặc định 30).")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        deleted, _ = ShoppingCart.objects.filter(user__isnull=True, updated_at__lt=cutoff).delete()
+        self.stdout.write(self.style.SUCCESS(f"Đã xóa {deleted} bản ghi giỏ hàng cũ."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from orders.recommendations import rebuild_associations
+
+
+class Command(BaseCommand):
+    help = "Dựng lại bảng gợi ý sản phẩm mua kèm từ lịch sử đơn hàng. Nên chạy định kỳ (cron)."
+
+    def handle(self, *args, **options):
+        count = rebuild_associations()
+        self.stdout.write(self.style.SUCCESS(f"Đã ghi {count} gợi ý sản phẩm."))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from orders.sales import refresh_sales_rank
+
+
+class Command(BaseCommand):
+    help = "Cập nhật bảng xếp hạng bán chạy (7/30/90 ngày) từ các đơn hàng mới thay đổi. Nên chạy định kỳ (cron)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help="Tính lại toàn bộ thay vì chỉ các ngày có thay đổi.")
+
+    def handle(self, *args, **options):
+        count = refresh_sales_rank(full=options['full'])
+        self.stdout.write(self.style.SUCCESS(f"Đã cập nhật xếp hạng bán chạy cho {count} sản phẩm."))
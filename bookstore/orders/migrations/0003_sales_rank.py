@@ -0,0 +1,69 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0009_product_rating_summary'),
+        ('orders', '0002_alter_coupon_options_alter_order_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategorySalesRank',
+            fields=[
+                ('category', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='sales_rank', serialize=False, to='books.category', verbose_name='Danh mục')),
+                ('units_7d', models.PositiveIntegerField(db_index=True, default=0, verbose_name='Đã bán 7 ngày')),
+                ('units_30d', models.PositiveIntegerField(db_index=True, default=0, verbose_name='Đã bán 30 ngày')),
+                ('units_90d', models.PositiveIntegerField(db_index=True, default=0, verbose_name='Đã bán 90 ngày')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Cập nhật lần cuối')),
+            ],
+            options={
+                'verbose_name': 'Xếp hạng bán chạy theo danh mục',
+                'verbose_name_plural': 'Xếp hạng bán chạy theo danh mục',
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductSalesRank',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='sales_rank', serialize=False, to='books.product', verbose_name='Sản phẩm')),
+                ('units_7d', models.PositiveIntegerField(db_index=True, default=0, verbose_name='Đã bán 7 ngày')),
+                ('units_30d', models.PositiveIntegerField(db_index=True, default=0, verbose_name='Đã bán 30 ngày')),
+                ('units_90d', models.PositiveIntegerField(db_index=True, default=0, verbose_name='Đã bán 90 ngày')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Cập nhật lần cuối')),
+            ],
+            options={
+                'verbose_name': 'Xếp hạng bán chạy',
+                'verbose_name_plural': 'Xếp hạng bán chạy',
+            },
+        ),
+        migrations.CreateModel(
+            name='SalesRankCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('processed_until', models.DateTimeField(blank=True, null=True, verbose_name='Đã tổng hợp tới')),
+            ],
+            options={
+                'verbose_name': 'Mốc tổng hợp doanh số',
+                'verbose_name_plural': 'Mốc tổng hợp doanh số',
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductSalesDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Ngày')),
+                ('units', models.PositiveIntegerField(default=0, verbose_name='Số lượng bán')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_daily', to='books.product', verbose_name='Sản phẩm')),
+            ],
+            options={
+                'verbose_name': 'Doanh số theo ngày',
+                'verbose_name_plural': 'Doanh số theo ngày',
+                'indexes': [models.Index(fields=['date'], name='orders_prod_date_f312c4_idx')],
+                'unique_together': {('product', 'date')},
+            },
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:29
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0009_product_rating_summary'),
+        ('orders', '0003_sales_rank'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingCart',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Ngày tạo')),
+                ('updated_at', models.DateTimeField(auto_now=True, db_index=True, verbose_name='Cập nhật lần cuối')),
+                ('user', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='shopping_cart', to=settings.AUTH_USER_MODEL, verbose_name='Người dùng')),
+            ],
+            options={
+                'verbose_name': 'Giỏ hàng',
+                'verbose_name_plural': 'Giỏ hàng',
+            },
+        ),
+        migrations.CreateModel(
+            name='CartLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField(default=1, verbose_name='Số lượng')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Giá')),
+                ('selected', models.BooleanField(default=True, verbose_name='Được chọn')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='books.product', verbose_name='Sản phẩm')),
+                ('cart', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='orders.shoppingcart', verbose_name='Giỏ hàng')),
+            ],
+            options={
+                'verbose_name': 'Sản phẩm trong giỏ',
+                'verbose_name_plural': 'Sản phẩm trong giỏ',
+                'unique_together': {('cart', 'product')},
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0009_product_rating_summary'),
+        ('orders', '0004_shopping_cart'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductAssociation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.PositiveIntegerField(default=0, verbose_name='Điểm')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='associations', to='books.product', verbose_name='Sản phẩm')),
+                ('related_product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='associated_from', to='books.product', verbose_name='Sản phẩm gợi ý')),
+            ],
+            options={
+                'verbose_name': 'Sản phẩm mua kèm',
+                'verbose_name_plural': 'Sản phẩm mua kèm',
+                'indexes': [models.Index(fields=['product', '-score'], name='orders_prod_product_a33094_idx')],
+                'unique_together': {('product', 'related_product')},
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0005_product_association'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderNumberSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True, verbose_name='Tên')),
+                ('next_value', models.BigIntegerField(default=1, verbose_name='Giá trị tiếp theo')),
+            ],
+            options={
+                'verbose_name': 'Bộ đếm mã đơn hàng',
+                'verbose_name_plural': 'Bộ đếm mã đơn hàng',
+            },
+        ),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def backfill_carts_and_reset_checkpoint(apps, schema_editor):
+    ShoppingCart = apps.get_model('orders', 'ShoppingCart')
+    OrderStatsDaily = apps.get_model('orders', 'OrderStatsDaily')
+    SalesRankCheckpoint = apps.get_model('orders', 'SalesRankCheckpoint')
+    # Giỏ hàng đã bị dọn không đếm lại được; chỉ lấy những giỏ còn lại
+    rows = ShoppingCart.objects.annotate(day=TruncDate('created_at')).values('day').annotate(count=Count('id')).order_by()
+    OrderStatsDaily.objects.bulk_create(
+        [OrderStatsDaily(date=row['day'], carts_created=row['count']) for row in rows], batch_size=500,
+    )
+    # Lần refresh_sales_rank kế tiếp tính lại toàn bộ lịch sử (doanh thu, đơn hàng, mã giảm giá)
+    SalesRankCheckpoint.objects.update(processed_until=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0006_order_number_sequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderStatsDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True, verbose_name='Ngày')),
+                ('orders', models.PositiveIntegerField(default=0, verbose_name='Số đơn bán được')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Doanh thu')),
+                ('discount_total', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Tổng tiền giảm')),
+                ('carts_created', models.PositiveIntegerField(default=0, verbose_name='Số giỏ hàng mới')),
+            ],
+            options={
+                'verbose_name': 'Thống kê đơn hàng theo ngày',
+                'verbose_name_plural': 'Thống kê đơn hàng theo ngày',
+            },
+        ),
+        migrations.AddField(
+            model_name='productsalesdaily',
+            name='revenue',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Doanh thu'),
+        ),
+        migrations.CreateModel(
+            name='CouponUsageDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Ngày')),
+                ('orders', models.PositiveIntegerField(default=0, verbose_name='Số đơn dùng mã')),
+                ('discount_total', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Tổng tiền giảm')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Doanh thu')),
+                ('coupon', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='usage_daily', to='orders.coupon', verbose_name='Mã giảm giá')),
+            ],
+            options={
+                'verbose_name': 'Sử dụng mã giảm giá theo ngày',
+                'verbose_name_plural': 'Sử dụng mã giảm giá theo ngày',
+                'indexes': [models.Index(fields=['date'], name='orders_coup_date_0ce366_idx')],
+                'unique_together': {('coupon', 'date')},
+            },
+        ),
+        migrations.RunPython(backfill_carts_and_reset_checkpoint, migrations.RunPython.noop),
+    ]
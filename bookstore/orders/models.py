@@ -1,6 +1,9 @@
-from django.db import models
+from django.db import models, transaction
+from django.contrib.auth.signals import user_logged_in
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from django.contrib.auth.models import User
-from books.models import Product
+from books.models import Category, Product
 from users.models import Address
 
 # Create your models here.
@@ -32,9 +35,8 @@ class Coupon(models.Model):
         return f"{self.code} - {self.get_discount_type_display()}"
 
     def is_valid(self):
-        from django.utils import timezone
-        now = timezone.now()
-        return (self.is_active and self.valid_from <= now <= self.valid_to and self.used_count < self.max_uses)
+        from .coupons import coupon_status
+        return coupon_status(self) is None
     
     def calculate_discount(self, order_total, shipping_fee=0):
         discount = 0
@@ -82,8 +84,8 @@ class Order(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.order_number:
-            from django.utils import timezone
-            self.order_number = f"ORD{timezone.now().strftime('%Y%m%d%H%M%S')}"
+            from .order_numbers import generate_order_number
+            self.order_number = generate_order_number()
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -101,3 +103,152 @@ class OrderItem(models.Model):
 
     def get_subtotal(self):
         return self.price * self.quantity
+
+
+class OrderNumberSequence(models.Model):
+    # Bộ đếm cấp khối mã đơn hàng cho orders.order_numbers.BlockOrderNumberGenerator
+    name = models.CharField(max_length=50, unique=True, verbose_name="Tên")
+    next_value = models.BigIntegerField(default=1, verbose_name="Giá trị tiếp theo")
+
+    class Meta:
+        verbose_name = "Bộ đếm mã đơn hàng"
+        verbose_name_plural = "Bộ đếm mã đơn hàng"
+
+
+# Giỏ hàng lưu trong DB (dùng khi CART_BACKEND = 'orders.cart.DatabaseCart')
+class ShoppingCart(models.Model):
+    # Giỏ của khách chưa đăng nhập không có user; id giỏ được giữ trong session
+    user = models.OneToOneField(User, on_delete=models.CASCADE, null=True, blank=True, related_name='shopping_cart', verbose_name="Người dùng")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Ngày tạo")
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name="Cập nhật lần cuối")
+
+    class Meta:
+        verbose_name = "Giỏ hàng"
+        verbose_name_plural = "Giỏ hàng"
+
+    def __str__(self):
+        return f"Giỏ hàng #{self.pk} ({self.user or 'khách'})"
+
+
+class CartLine(models.Model):
+    cart = models.ForeignKey(ShoppingCart, on_delete=models.CASCADE, related_name='lines', verbose_name="Giỏ hàng")
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, verbose_name="Sản phẩm")
+    quantity = models.PositiveIntegerField(default=1, verbose_name="Số lượng")
+    price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Giá")
+    selected = models.BooleanField(default=True, verbose_name="Được chọn")
+
+    class Meta:
+        verbose_name = "Sản phẩm trong giỏ"
+        verbose_name_plural = "Sản phẩm trong giỏ"
+        unique_together = ('cart', 'product')
+
+
+# Bảng xếp hạng bán chạy, được tổng hợp định kỳ bởi orders.sales.refresh_sales_rank()
+class ProductSalesDaily(models.Model):
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='sales_daily', verbose_name="Sản phẩm")
+    date = models.DateField(verbose_name="Ngày")
+    units = models.PositiveIntegerField(default=0, verbose_name="Số lượng bán")
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Doanh thu")
+
+    class Meta:
+        verbose_name = "Doanh số theo ngày"
+        verbose_name_plural = "Doanh số theo ngày"
+        unique_together = ('product', 'date')
+        indexes = [models.Index(fields=['date'])]
+
+
+class ProductSalesRank(models.Model):
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='sales_rank', verbose_name="Sản phẩm")
+    units_7d = models.PositiveIntegerField(default=0, db_index=True, verbose_name="Đã bán 7 ngày")
+    units_30d = models.PositiveIntegerField(default=0, db_index=True, verbose_name="Đã bán 30 ngày")
+    units_90d = models.PositiveIntegerField(default=0, db_index=True, verbose_name="Đã bán 90 ngày")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Cập nhật lần cuối")
+
+    class Meta:
+        verbose_name = "Xếp hạng bán chạy"
+        verbose_name_plural = "Xếp hạng bán chạy"
+
+
+class CategorySalesRank(models.Model):
+    # Tính trên cả cây con của danh mục
+    category = models.OneToOneField(Category, on_delete=models.CASCADE, primary_key=True, related_name='sales_rank', verbose_name="Danh mục")
+    units_7d = models.PositiveIntegerField(default=0, db_index=True, verbose_name="Đã bán 7 ngày")
+    units_30d = models.PositiveIntegerField(default=0, db_index=True, verbose_name="Đã bán 30 ngày")
+    units_90d = models.PositiveIntegerField(default=0, db_index=True, verbose_name="Đã bán 90 ngày")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Cập nhật lần cuối")
+
+    class Meta:
+        verbose_name = "Xếp hạng bán chạy theo danh mục"
+        verbose_name_plural = "Xếp hạng bán chạy theo danh mục"
+
+
+class SalesRankCheckpoint(models.Model):
+    # Chỉ có một bản ghi: mốc thời gian đơn hàng đã được tổng hợp tới
+    processed_until = models.DateTimeField(null=True, blank=True, verbose_name="Đã tổng hợp tới")
+
+    class Meta:
+        verbose_name = "Mốc tổng hợp doanh số"
+        verbose_name_plural = "Mốc tổng hợp doanh số"
+
+
+class OrderStatsDaily(models.Model):
+    # Số liệu đơn hàng theo ngày cho API thống kê; carts_created được cộng dồn khi giỏ hàng được tạo
+    date = models.DateField(unique=True, verbose_name="Ngày")
+    orders = models.PositiveIntegerField(default=0, verbose_name="Số đơn bán được")
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Doanh thu")
+    discount_total = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Tổng tiền giảm")
+    carts_created = models.PositiveIntegerField(default=0, verbose_name="Số giỏ hàng mới")
+
+    class Meta:
+        verbose_name = "Thống kê đơn hàng theo ngày"
+        verbose_name_plural = "Thống kê đơn hàng theo ngày"
+
+
+class CouponUsageDaily(models.Model):
+    coupon = models.ForeignKey(Coupon, on_delete=models.CASCADE, related_name='usage_daily', verbose_name="Mã giảm giá")
+    date = models.DateField(verbose_name="Ngày")
+    orders = models.PositiveIntegerField(default=0, verbose_name="Số đơn dùng mã")
+    discount_total = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Tổng tiền giảm")
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Doanh thu")
+
+    class Meta:
+        verbose_name = "Sử dụng mã giảm giá theo ngày"
+        verbose_name_plural = "Sử dụng mã giảm giá theo ngày"
+        unique_together = ('coupon', 'date')
+        indexes = [models.Index(fields=['date'])]
+
+
+class ProductAssociation(models.Model):
+    # Gợi ý "thường được mua cùng", được dựng lại bởi orders.recommendations.rebuild_associations()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='associations', verbose_name="Sản phẩm")
+    related_product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='associated_from', verbose_name="Sản phẩm gợi ý")
+    # Số đơn hàng có cả hai sản phẩm; 0 là gợi ý dự phòng cùng danh mục
+    score = models.PositiveIntegerField(default=0, verbose_name="Điểm")
+
+    class Meta:
+        verbose_name = "Sản phẩm mua kèm"
+        verbose_name_plural = "Sản phẩm mua kèm"
+        unique_together = ('product', 'related_product')
+        indexes = [models.Index(fields=['product', '-score'])]
+
+
+@receiver(post_save, sender=ShoppingCart)
+def count_new_cart(sender, instance, created, **kwargs):
+    if created:
+        from .analytics import record_cart_created
+        record_cart_created(instance.created_at)
+
+
+@receiver(user_logged_in)
+def merge_cart_on_login(sender, request, user, **kwargs):
+    from .cart import merge_anonymous_cart
+    if request is not None:
+        merge_anonymous_cart(request, user)
+
+
+# Làm mới danh sách mã giảm giá đang dùng được khi mã thay đổi
+@receiver(post_save, sender=Coupon)
+@receiver(post_delete, sender=Coupon)
+def invalidate_coupon_set(sender, **kwargs):
+    from .coupons import invalidate
+    transaction.on_commit(invalidate)
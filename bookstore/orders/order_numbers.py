@@ -0,0 +1,86 @@
+# orders/order_numbers.py
+"""
+Sinh mã đơn hàng không trùng lặp.
+
+Mặc định mỗi tiến trình xin một khối số liên tiếp (ORDER_NUMBER_BLOCK_SIZE,
+mặc định 1000) từ bảng OrderNumberSequence bằng một UPDATE ngắn, rồi cấp số
+trong khối đó từ bộ nhớ. Các khối không giao nhau nên không cần thử lại khi
+trùng, và DB chỉ bị chạm một lần cho mỗi khối.
+
+Khối chỉ được giữ lại khi được xin ngoài transaction: nếu đang ở trong
+transaction.atomic() (ví dụ admin), số được xin riêng lẻ để khi rollback thì
+cả số lẫn đơn hàng cùng bị hủy, không có tiến trình nào khác nhận trùng khối.
+Vì vậy nên sinh mã trước khi mở transaction đặt hàng.
+
+Có thể thay cách sinh mã qua setting ORDER_NUMBER_GENERATOR (đường dẫn tới class).
+"""
+import threading
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+DEFAULT_BLOCK_SIZE = 1000
+
+
+class BaseOrderNumberGenerator:
+    def next_number(self):
+        raise NotImplementedError
+
+
+class BlockOrderNumberGenerator(BaseOrderNumberGenerator):
+    sequence_name = 'order_number'
+
+    def __init__(self, block_size=None):
+        self.block_size = block_size or getattr(settings, 'ORDER_NUMBER_BLOCK_SIZE', DEFAULT_BLOCK_SIZE)
+        self._lock = threading.Lock()
+        self._next = self._end = 0
+
+    def _allocate(self, size):
+        """Giữ chỗ `size` số liên tiếp trong DB; trả về số đầu tiên."""
+        from .models import OrderNumberSequence
+
+        sequences = OrderNumberSequence.objects.filter(name=self.sequence_name)
+        with transaction.atomic():
+            # UPDATE trước để khóa ghi ngay từ đầu (SELECT rồi mới UPDATE dễ bị "database is locked" trên SQLite)
+            if not sequences.update(next_value=F('next_value') + size):
+                OrderNumberSequence.objects.get_or_create(name=self.sequence_name)
+                sequences.update(next_value=F('next_value') + size)
+            end = sequences.values_list('next_value', flat=True).get()
+        return end - size
+
+    def next_value(self):
+        with self._lock:
+            if self._next < self._end:
+                value = self._next
+                self._next += 1
+                return value
+            if connection.in_atomic_block:
+                return self._allocate(1)
+            start = self._allocate(self.block_size)
+            self._next, self._end = start + 1, start + self.block_size
+            return start
+
+    def next_number(self):
+        # 9 chữ số trở lên nên không thể trùng mã kiểu cũ ORD + 14 chữ số thời gian
+        return f"ORD{timezone.localdate():%y%m%d}{self.next_value():09d}"
+
+
+_generator = None
+_generator_lock = threading.Lock()
+
+
+def get_order_number_generator():
+    global _generator
+    if _generator is None:
+        with _generator_lock:
+            if _generator is None:
+                path = getattr(settings, 'ORDER_NUMBER_GENERATOR', 'orders.order_numbers.BlockOrderNumberGenerator')
+                _generator = import_string(path)()
+    return _generator
+
+
+def generate_order_number():
+    return get_order_number_generator().next_number()
@@ -0,0 +1,138 @@
+# orders/recommendations.py
+"""
+Gợi ý sản phẩm cho giỏ hàng.
+
+rebuild_associations() đếm số đơn hàng có từng cặp sản phẩm (mua cùng nhau)
+và giữ lại tối đa ASSOCIATIONS_PER_PRODUCT gợi ý cho mỗi sản phẩm trong bảng
+ProductAssociation; sản phẩm chưa đủ gợi ý được bổ sung bằng sản phẩm bán
+chạy cùng danh mục (điểm 0). Khi xem giỏ hàng chỉ cần một truy vấn theo chỉ
+mục (product, -score); nếu vẫn thiếu thì lấy ngẫu nhiên theo id mà không tải
+toàn bộ danh mục sản phẩm.
+"""
+import heapq
+import random
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Max, Min, Sum
+from django.db.models import prefetch_related_objects
+
+from books.models import Product
+from .models import OrderItem, ProductAssociation
+
+ASSOCIATIONS_PER_PRODUCT = 8
+ID_RANGE_CACHE_KEY = 'orders:recommendations:id_range'
+ID_RANGE_CACHE_TIMEOUT = 600
+RANDOM_ATTEMPTS = 3
+
+
+def _active_products():
+    return Product.objects.filter(is_active=True, category__is_active=True)
+
+
+def _co_purchases():
+    """{product_id: [(score, related_id), ...]} giữ top ASSOCIATIONS_PER_PRODUCT mỗi sản phẩm."""
+    pairs = (
+        OrderItem.objects.exclude(order__status='canceled')
+        .order_by()
+        .values('product_id', related_id=F('order__items__product_id'))
+        .annotate(score=Count('order_id', distinct=True))
+    )
+    top = {}
+    for row in pairs.iterator(chunk_size=5000):
+        if row['related_id'] == row['product_id']:
+            continue
+        heap = top.setdefault(row['product_id'], [])
+        entry = (row['score'], -row['related_id'])
+        if len(heap) < ASSOCIATIONS_PER_PRODUCT:
+            heapq.heappush(heap, entry)
+        elif entry > heap[0]:
+            heapq.heapreplace(heap, entry)
+    return {
+        product_id: [(score, -negative_id) for score, negative_id in sorted(heap, reverse=True)]
+        for product_id, heap in top.items()
+    }
+
+
+def _category_fallbacks():
+    """Sản phẩm bán chạy (rồi mới nhất) của từng danh mục: {category_id: [product_id, ...]}."""
+    fallbacks = {}
+    products = (
+        _active_products().with_sales(days=90)
+        .order_by('category_id', '-units_sold', '-created_at')
+        .values_list('id', 'category_id')
+    )
+    for product_id, category_id in products.iterator(chunk_size=5000):
+        chosen = fallbacks.setdefault(category_id, [])
+        # Thêm một chỗ vì sản phẩm không tự gợi ý chính nó
+        if len(chosen) <= ASSOCIATIONS_PER_PRODUCT:
+            chosen.append(product_id)
+    return fallbacks
+
+
+def rebuild_associations():
+    """Dựng lại toàn bộ bảng gợi ý; trả về số dòng đã ghi."""
+    co_purchases = _co_purchases()
+    fallbacks = _category_fallbacks()
+
+    rows = []
+    for product_id, category_id in _active_products().values_list('id', 'category_id').iterator(chunk_size=5000):
+        related = co_purchases.get(product_id, [])
+        seen = {related_id for _, related_id in related}
+        for candidate in fallbacks.get(category_id, []):
+            if len(related) >= ASSOCIATIONS_PER_PRODUCT:
+                break
+            if candidate != product_id and candidate not in seen:
+                related.append((0, candidate))
+                seen.add(candidate)
+        rows.extend(
+            ProductAssociation(product_id=product_id, related_product_id=related_id, score=score)
+            for score, related_id in related
+        )
+
+    with transaction.atomic():
+        ProductAssociation.objects.all().delete()
+        ProductAssociation.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def random_products(limit, exclude_ids=()):
+    """Lấy ngẫu nhiên tối đa `limit` sản phẩm bằng cách bốc id trong khoảng [min, max]."""
+    bounds = cache.get_or_set(
+        ID_RANGE_CACHE_KEY,
+        lambda: _active_products().aggregate(low=Min('id'), high=Max('id')),
+        ID_RANGE_CACHE_TIMEOUT,
+    )
+    if bounds['low'] is None or limit <= 0:
+        return []
+
+    id_range = range(bounds['low'], bounds['high'] + 1)
+    found = {}
+    for _ in range(RANDOM_ATTEMPTS):
+        candidates = random.sample(id_range, min(len(id_range), limit * 4))
+        for product in _active_products().filter(id__in=candidates).exclude(id__in=exclude_ids):
+            found.setdefault(product.id, product)
+        if len(found) >= limit:
+            break
+    products = list(found.values())
+    random.shuffle(products)
+    return products[:limit]
+
+
+def recommend_for_products(product_ids, limit=4):
+    """Gợi ý cho các sản phẩm đang có trong giỏ, bổ sung ngẫu nhiên nếu chưa đủ."""
+    product_ids = list(product_ids)
+    recommended = []
+    if product_ids:
+        recommended = list(
+            _active_products()
+            .filter(associated_from__product_id__in=product_ids)
+            .exclude(id__in=product_ids)
+            .annotate(recommendation_score=Sum('associated_from__score'))
+            .order_by('-recommendation_score', '-id')[:limit]
+        )
+    if len(recommended) < limit:
+        exclude_ids = product_ids + [product.id for product in recommended]
+        recommended += random_products(limit - len(recommended), exclude_ids)
+    prefetch_related_objects(recommended, 'attribute_values__attribute')
+    return recommended
@@ -0,0 +1,124 @@
+# orders/sales.py
+"""
+Xếp hạng sản phẩm bán chạy từ dữ liệu OrderItem.
+
+Số lượng bán và doanh thu được gom theo (sản phẩm, ngày đặt hàng) vào
+ProductSalesDaily. Mỗi lần chạy chỉ tính lại những ngày có đơn hàng/thanh toán
+thay đổi kể từ mốc lần trước (SalesRankCheckpoint), rồi cộng dồn 90 ngày gần
+nhất thành số bán 7/30/90 ngày cho từng sản phẩm và từng cây danh mục. Các
+bảng thống kê theo ngày của orders.analytics được tính lại cho cùng các ngày
+đó; bảng theo ngày giữ toàn bộ lịch sử để API thống kê chọn khoảng bất kỳ.
+
+Đơn hàng bị xóa hẳn không được phát hiện theo mốc; chạy lại với full=True
+(lệnh `refresh_sales_rank --full`) sau khi xóa dữ liệu hàng loạt.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from books.models import SALES_WINDOWS
+from . import analytics
+from .models import (
+    CategorySalesRank, Order, OrderItem, ProductSalesDaily, ProductSalesRank, SalesRankCheckpoint,
+)
+
+MAX_WINDOW = max(SALES_WINDOWS)
+# Đơn cập nhật sát mốc có thể commit muộn hơn lần chạy; tính lại phần chồng lấn cho chắc
+CHECKPOINT_OVERLAP = timedelta(minutes=5)
+
+
+def _sold_items():
+    # Giống lịch sử đơn hàng: đơn COD hoặc đã thanh toán, và chưa bị hủy
+    return OrderItem.objects.exclude(order__status='canceled').filter(
+        Q(order__payment__method='cod') | Q(order__payment__status='completed')
+    )
+
+
+def _window_start(today):
+    return today - timedelta(days=MAX_WINDOW - 1)
+
+
+def _changed_days(since):
+    """Các ngày (giờ địa phương) có đơn hàng hoặc thanh toán thay đổi từ `since`."""
+    orders = Order.objects.filter(
+        Q(updated_at__gte=since) | Q(payment__created_at__gte=since) | Q(payment__paid_at__gte=since)
+    )
+    return {timezone.localdate(created_at) for created_at in orders.values_list('created_at', flat=True)}
+
+
+def _rebuild_days(days=None):
+    """Tính lại ProductSalesDaily cho các ngày `days` (hoặc toàn bộ nếu None)."""
+    items = _sold_items()
+    if days is None:
+        stale = ProductSalesDaily.objects.all()
+    else:
+        items = items.filter(order__created_at__date__in=days)
+        stale = ProductSalesDaily.objects.filter(date__in=days)
+
+    rows = (
+        items.order_by()
+        .values('product_id', day=TruncDate('order__created_at'))
+        .annotate(total=Sum('quantity'), revenue=Sum(F('price') * F('quantity')))
+    )
+    stale.delete()
+    ProductSalesDaily.objects.bulk_create(
+        [
+            ProductSalesDaily(product_id=row['product_id'], date=row['day'], units=row['total'], revenue=row['revenue'])
+            for row in rows
+        ],
+        batch_size=1000,
+    )
+    analytics.rebuild_days(days)
+
+
+def _refresh_ranks(today):
+    windows = {
+        f'units_{days}d': Sum('units', filter=Q(date__gte=today - timedelta(days=days - 1)), default=0)
+        for days in SALES_WINDOWS
+    }
+    rows = (
+        ProductSalesDaily.objects.filter(date__gte=_window_start(today))
+        .order_by().values('product_id').annotate(**windows)
+    )
+    ranks = [ProductSalesRank(**row) for row in rows if row[f'units_{MAX_WINDOW}d']]
+    ProductSalesRank.objects.all().delete()
+    ProductSalesRank.objects.bulk_create(ranks, batch_size=1000)
+
+    # Cộng dồn lên mọi danh mục tổ tiên qua bảng closure
+    category_rows = (
+        ProductSalesRank.objects.order_by()
+        .values(category_id=F('product__category__ancestor_links__ancestor_id'))
+        .annotate(**{f'units_{days}d': Sum(f'units_{days}d') for days in SALES_WINDOWS})
+    )
+    CategorySalesRank.objects.all().delete()
+    CategorySalesRank.objects.bulk_create(
+        [CategorySalesRank(**row) for row in category_rows if row['category_id']],
+        batch_size=1000,
+    )
+    return len(ranks)
+
+
+def refresh_sales_rank(full=False):
+    """Cập nhật bảng xếp hạng bán chạy; trả về số sản phẩm có doanh số trong cửa sổ dài nhất."""
+    started = timezone.now()
+    today = timezone.localdate(started)
+
+    with transaction.atomic():
+        checkpoint, _ = SalesRankCheckpoint.objects.select_for_update().get_or_create(pk=1)
+        if full or checkpoint.processed_until is None:
+            _rebuild_days()
+        else:
+            days = _changed_days(checkpoint.processed_until - CHECKPOINT_OVERLAP)
+            if days:
+                _rebuild_days(days)
+        count = _refresh_ranks(today)
+        checkpoint.processed_until = started
+        checkpoint.save(update_fields=['processed_until'])
+
+    from core.section_cache import invalidate
+    invalidate('best_sellers')
+    analytics.invalidate()
+    return count
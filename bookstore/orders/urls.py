@@ -15,4 +15,5 @@ urlpatterns = [
     path('history/', views.OrderHistoryView.as_view(), name='order_history'),
     path('detail/<int:pk>/', views.OrderDetailView.as_view(), name='order_detail'),
     path('cancel/<int:order_id>/', views.cancel_order, name='cancel_order'),
+    path('analytics/<slug:report>/', views.analytics_report, name='analytics_report'),
 ]
@@ -2,22 +2,26 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.views import View
 from django.views.decorators.http import require_POST
 from django.views.generic import DetailView, ListView
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from books.models import Product
 from users.models import Address, WishlistItem
-from .cart import Cart
+from . import analytics
+from .cart import get_cart
+from .recommendations import recommend_for_products
+from .coupons import default_shipping_fee, get_coupon_set
+from .checkout import CheckoutError, place_order, cancel_order as cancel_pending_order
 from .forms import CartAddProductForm, CheckoutForm
-from .models import Order, OrderItem, Coupon
+from .models import Order, OrderItem
 from payment.models import Payment
 from django.contrib import messages
 from django.db.models import Q, F
-from django.utils import timezone
 
 from django.http import JsonResponse
 
 @require_POST
 def cart_add(request, product_id):
-    cart = Cart(request)
+    cart = get_cart(request)
     product = get_object_or_404(Product, id=product_id)
     form = CartAddProductForm(request.POST)
     if form.is_valid():
@@ -34,14 +38,14 @@ def cart_add(request, product_id):
 
 @require_POST
 def cart_remove(request, product_id):
-    cart = Cart(request)
+    cart = get_cart(request)
     product = get_object_or_404(Product, id=product_id)
     cart.remove(product)
     return redirect('orders:cart_detail')
 
 @require_POST
 def cart_update_selection(request):
-    cart = Cart(request)
+    cart = get_cart(request)
     selected_items = request.POST.getlist('selected_items')
     select_all = request.POST.get('select_all')
 
@@ -61,14 +65,14 @@ def cart_update_selection(request):
             'selected_total': float(cart.get_selected_total_price()),
             'cart_total': float(cart.get_total_price()),
             'selected_count': len(selected_items) if select_all in [None, ''] else (
-                len(cart.cart) if select_all == '1' else 0
+                cart.item_count() if select_all == '1' else 0
             )
         })
 
     return redirect('orders:cart_detail')
 
 def cart_detail(request):
-    cart = Cart(request)
+    cart = get_cart(request)
     
     # Wrapper class to persist form data across iterations
     class CartWrapper:
@@ -100,10 +104,8 @@ def cart_detail(request):
     
     continue_shopping_url = request.session.get('continue_shopping_url', '/')
 
-    # Get random products for recommendations
-    import random
-    all_products = list(Product.objects.filter(is_active=True, category__is_active=True))
-    recommended_products = random.sample(all_products, min(len(all_products), 4))
+    # Gợi ý sản phẩm mua kèm với các sản phẩm trong giỏ
+    recommended_products = recommend_for_products([item['product'].id for item in cart_wrapper], limit=4)
 
     return render(request, 'orders/cart_detail.html', {
         'cart': cart_wrapper, 
@@ -113,61 +115,56 @@ def cart_detail(request):
     })
 
 class CheckoutView(LoginRequiredMixin, View):
+    def coupon_context(self, request, selected_total):
+        # Tình trạng mọi mã giảm giá với đơn hiện tại. Mã đang áp dụng (trong session)
+        # được giữ nếu còn dùng được, nếu không thì áp dụng luôn mã giảm nhiều nhất để
+        # lựa chọn hiển thị khớp với tổng tiền và với đơn được tạo
+        coupon_set = get_coupon_set()
+        shipping_fee = default_shipping_fee()
+        options = coupon_set.evaluate(selected_total, shipping_fee)
+        usable = [option for option in options if option.eligible and option.discount > 0]
+        best = max(usable, key=lambda option: option.discount, default=None)
+        applied = next((option for option in usable if option.coupon.id == request.session.get('coupon_id')), best)
+        if applied is None:
+            request.session.pop('coupon_id', None)
+        else:
+            request.session['coupon_id'] = applied.coupon.id
+        discount = applied.discount if applied else 0
+        return {
+            'available_coupons': options,
+            'best_coupon': best.coupon if best else None,
+            'applied_coupon': applied.coupon if applied else None,
+            'discount_amount': discount,
+            'checkout_total': selected_total + shipping_fee - discount,
+        }
+
     def get(self, request):
-        cart = Cart(request)
+        cart = get_cart(request)
         selected_items = cart.get_selected_items()
         if len(cart) == 0 or len(selected_items) == 0:
             messages.warning(request, "Vui lòng chọn ít nhất 1 sản phẩm để thanh toán.")
             return redirect('orders:cart_detail')
         
-        form = CheckoutForm()
         addresses = Address.objects.filter(user=request.user)
         default_address = addresses.filter(is_default=True).first() or addresses.first()
         
-        now = timezone.now()
         selected_total = cart.get_selected_total_price()
-        coupons = Coupon.objects.filter(is_active=True).order_by('-value', 'code')
-        available_coupons = []
-        for coupon in coupons:
-            if not (coupon.valid_from <= now <= coupon.valid_to):
-                available_coupons.append({
-                    'coupon': coupon,
-                    'eligible': False,
-                    'reason': 'Hết hạn hoặc chưa đến ngày áp dụng',
-                })
-                continue
-            if coupon.used_count >= coupon.max_uses:
-                available_coupons.append({
-                    'coupon': coupon,
-                    'eligible': False,
-                    'reason': 'Đã hết lượt sử dụng',
-                })
-                continue
-            if selected_total < coupon.min_order_value:
-                available_coupons.append({
-                    'coupon': coupon,
-                    'eligible': False,
-                    'reason': f'Đơn tối thiểu {coupon.min_order_value:,.0f}₫',
-                })
-                continue
-            available_coupons.append({
-                'coupon': coupon,
-                'eligible': True,
-                'reason': 'Có thể áp dụng',
-            })
+        coupon_context = self.coupon_context(request, selected_total)
+        applied_coupon = coupon_context['applied_coupon']
+        form = CheckoutForm(initial={'coupon_code': applied_coupon.code if applied_coupon else ''})
 
         return render(request, 'orders/checkout.html', {
             'cart': cart,
             'selected_items': selected_items,
             'selected_total': selected_total,
-            'available_coupons': available_coupons,
             'form': form,
             'addresses': addresses,
-            'default_address': default_address
+            'default_address': default_address,
+            **coupon_context,
         })
 
     def post(self, request):
-        cart = Cart(request)
+        cart = get_cart(request)
         selected_items = cart.get_selected_items()
         if len(cart) == 0 or len(selected_items) == 0:
             messages.warning(request, "Vui lòng chọn ít nhất 1 sản phẩm để thanh toán.")
@@ -217,112 +214,47 @@ class CheckoutView(LoginRequiredMixin, View):
                 else:
                     address = get_object_or_404(Address, id=address_id, user=request.user)
             
-            # Create Order
-            order = form.save(commit=False)
-            order.user = request.user
-            order.shipping_address = address
-            order.total_amount = cart.get_selected_total_price()
-            
-            # Apply Coupon
-            coupon_id = request.session.get('coupon_id')
-            if coupon_id:
-                try:
-                    coupon = Coupon.objects.get(id=coupon_id)
-                    if coupon.is_valid():
-                        discount = coupon.calculate_discount(order.total_amount, order.shipping_fee)
-                        order.coupon = coupon
-                        order.discount_amount = discount
-                        order.total_amount = float(order.total_amount) + float(order.shipping_fee) - float(discount)
-                        
-                        # Update usage
-                        coupon.used_count += 1
-                        coupon.save()
-                        
-                        # Clear session
-                        del request.session['coupon_id']
-                    else:
-                        # Coupon invalid, just calculate total with shipping
-                        order.total_amount = float(order.total_amount) + float(order.shipping_fee)
-                except Coupon.DoesNotExist:
-                     order.total_amount = float(order.total_amount) + float(order.shipping_fee)
-            else:
-                order.total_amount = float(order.total_amount) + float(order.shipping_fee)
-
-            order.save()
-            
-            # Create OrderItems
-            for item in selected_items:
-                OrderItem.objects.create(
-                    order=order,
-                    product=item['product'],
-                    price=item['price'],
-                    quantity=item['quantity']
-                )
-            
-            # Create Payment
+            # Đặt hàng: trừ kho, dùng mã giảm giá, tạo đơn trong một transaction
             payment_method = form.cleaned_data['payment_method']
-            Payment.objects.create(
-                order=order,
-                method=payment_method,
-                amount=order.total_amount
-            )
+            try:
+                result = place_order(
+                    user=request.user,
+                    address=address,
+                    items=selected_items,
+                    payment_method=payment_method,
+                    coupon_id=request.session.get('coupon_id'),
+                    note=form.cleaned_data.get('note', ''),
+                )
+            except CheckoutError as e:
+                messages.error(request, str(e))
+                return redirect('orders:cart_detail')
+            order = result.order
+            request.session.pop('coupon_id', None)
 
             # Clear cart only for COD; manual payments clear on confirm
             if payment_method == 'cod':
                 cart.remove_selected()
 
             # Redirect based on payment method
-            print(f"DEBUG: Payment method selected: {payment_method}")
-            
             if payment_method == 'vietqr':
-                return redirect('payment:payment_vietqr', order_id=order.id)
-            elif payment_method == 'cod':
-                return redirect('orders:order_success', order_id=order.id)
+                response = redirect('payment:payment_vietqr', order_id=order.id)
             else:
                 # For other methods (e.g. vnpay)
                 # TODO: Implement handlers for other methods
-                return redirect('orders:order_success', order_id=order.id)
+                response = redirect('orders:order_success', order_id=order.id)
+            response['Server-Timing'] = result.server_timing()
+            return response
                 
         addresses = Address.objects.filter(user=request.user)
-        now = timezone.now()
         selected_total = cart.get_selected_total_price()
-        coupons = Coupon.objects.filter(is_active=True).order_by('-value', 'code')
-        available_coupons = []
-        for coupon in coupons:
-            if not (coupon.valid_from <= now <= coupon.valid_to):
-                available_coupons.append({
-                    'coupon': coupon,
-                    'eligible': False,
-                    'reason': 'Hết hạn hoặc chưa đến ngày áp dụng',
-                })
-                continue
-            if coupon.used_count >= coupon.max_uses:
-                available_coupons.append({
-                    'coupon': coupon,
-                    'eligible': False,
-                    'reason': 'Đã hết lượt sử dụng',
-                })
-                continue
-            if selected_total < coupon.min_order_value:
-                available_coupons.append({
-                    'coupon': coupon,
-                    'eligible': False,
-                    'reason': f'Đơn tối thiểu {coupon.min_order_value:,.0f}₫',
-                })
-                continue
-            available_coupons.append({
-                'coupon': coupon,
-                'eligible': True,
-                'reason': 'Có thể áp dụng',
-            })
 
         return render(request, 'orders/checkout.html', {
             'cart': cart,
             'selected_items': selected_items,
             'selected_total': selected_total,
-            'available_coupons': available_coupons,
             'form': form,
-            'addresses': addresses
+            'addresses': addresses,
+            **self.coupon_context(request, selected_total),
         })
 
 def order_success(request, order_id):
@@ -396,13 +328,8 @@ class OrderDetailView(LoginRequiredMixin, DetailView):
 
 def cancel_order(request, order_id):
     order = get_object_or_404(Order, id=order_id, user=request.user)
-    if order.status == 'pending':
-        order.status = 'canceled'
-        order.save()
-        # Update payment status if exists
-        if hasattr(order, 'payment'):
-            order.payment.status = 'canceled'
-            order.payment.save()
+    # Hủy và hoàn lại tồn kho (kể cả trạng thái thanh toán nếu có)
+    if cancel_pending_order(order):
         messages.success(request, "Đã hủy đơn hàng thành công.")
     else:
         messages.error(request, "Không thể hủy đơn hàng này do trạng thái không hợp lệ.")
@@ -411,40 +338,62 @@ def cancel_order(request, order_id):
 @require_POST
 def apply_coupon(request):
     import json
-    from django.utils import timezone
-    from .models import Coupon
-    
+
     try:
         data = json.loads(request.body)
-        code = (data.get('code') or '').strip()
-        cart = Cart(request)
-        total_price = cart.get_selected_total_price()
-        shipping_fee = 30000 # Default shipping fee
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        return JsonResponse({'success': False, 'message': 'Dữ liệu không hợp lệ.'})
+
+    code = (data.get('code') or '').strip()
+    cart = get_cart(request)
+    total_price = cart.get_selected_total_price()
+    shipping_fee = default_shipping_fee()
+    coupon_set = get_coupon_set()
+
+    if code:
+        coupon = coupon_set.get(code)
+        if coupon is None:
+            return JsonResponse({'success': False, 'message': 'Mã giảm giá không tồn tại hoặc đã ngừng áp dụng.'})
+        option = coupon_set.evaluate_coupon(coupon, total_price, shipping_fee)
+        if not option.eligible:
+            return JsonResponse({'success': False, 'message': f'Không thể áp dụng mã {code}: {option.reason}.'})
+        if option.discount <= 0:
+            return JsonResponse({'success': False, 'message': 'Đơn hàng chưa đủ điều kiện áp dụng mã này.'})
+    else:
+        # Không nhập mã: tự chọn mã giảm nhiều nhất
+        option = coupon_set.best(total_price, shipping_fee)
+        if option is None:
+            return JsonResponse({'success': False, 'message': 'Chưa có mã giảm giá nào áp dụng được cho đơn hàng này.'})
+
+    # Store in session
+    request.session['coupon_id'] = option.coupon.id
+    final_total = float(total_price) + float(shipping_fee) - float(option.discount)
+    return JsonResponse({
+        'success': True,
+        'code': option.coupon.code,
+        'discount': float(option.discount),
+        'total': final_total,
+        'message': f'Áp dụng mã {option.coupon.code} thành công!'
+    })
 
-        if not code:
-            return JsonResponse({'success': False, 'message': 'Vui lòng chọn hoặc nhập mã giảm giá.'})
-        
-        try:
-            coupon = Coupon.objects.get(code=code)
-            if coupon.is_valid():
-                discount = coupon.calculate_discount(total_price, shipping_fee)
-                if discount > 0:
-                    # Store in session
-                    request.session['coupon_id'] = coupon.id
-                    
-                    final_total = float(total_price) + shipping_fee - float(discount)
-                    return JsonResponse({
-                        'success': True,
-                        'discount': float(discount),
-                        'total': final_total,
-                        'message': f'Áp dụng mã {code} thành công!'
-                    })
-                else:
-                    return JsonResponse({'success': False, 'message': 'Đơn hàng chưa đủ điều kiện áp dụng mã này.'})
-            else:
-                return JsonResponse({'success': False, 'message': 'Mã giảm giá không hợp lệ hoặc đã hết hạn.'})
-        except Coupon.DoesNotExist:
-            return JsonResponse({'success': False, 'message': 'Mã giảm giá không tồn tại.'})
-            
-    except Exception as e:
-        return JsonResponse({'success': False, 'message': str(e)})
+
+@staff_member_required
+def analytics_report(request, report):
+    """API thống kê cho trang admin: ?start=&end= (YYYY-MM-DD) hoặc ?days=, và ?limit= cho các bảng xếp hạng."""
+    if report not in analytics.REPORTS:
+        return JsonResponse({'error': 'Báo cáo không tồn tại.'}, status=404)
+    try:
+        start, end = analytics.date_range(request.GET)
+        limit = int(request.GET.get('limit') or analytics.DEFAULT_LIMIT)
+    except ValueError as e:
+        return JsonResponse({'error': f'Tham số không hợp lệ: {e}'}, status=400)
+    if limit < 1:
+        return JsonResponse({'error': 'Tham số không hợp lệ: limit phải lớn hơn 0'}, status=400)
+    return JsonResponse({
+        'report': report,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'data': analytics.report(report, start, end, limit),
+    })
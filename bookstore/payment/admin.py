@@ -1,7 +1,8 @@
 from django.contrib import admin
 from import_export.admin import ImportExportModelAdmin
 
-from .models import Payment
+from .models import Payment, PaymentWebhookEvent
+from .webhooks import replay_events
 
 
 @admin.register(Payment)
@@ -9,3 +10,17 @@ class PaymentAdmin(ImportExportModelAdmin):
     list_display = ("order", "method", "amount", "status", "paid_at", "created_at")
     list_filter = ("method", "status", "paid_at", "created_at")
     search_fields = ("order__order_number", "transaction_id")
+
+
+@admin.register(PaymentWebhookEvent)
+class PaymentWebhookEventAdmin(admin.ModelAdmin):
+    list_display = ("order_code", "reference", "code", "status", "attempts", "received_at", "processed_at")
+    list_filter = ("status", "code", "received_at")
+    search_fields = ("order_code", "reference")
+    readonly_fields = ("order_code", "reference", "code", "payload", "attempts", "last_error", "received_at", "claimed_at", "processed_at")
+    actions = ["replay"]
+
+    @admin.action(description="Xử lý lại sự kiện lỗi hoặc bị kẹt")
+    def replay(self, request, queryset):
+        count = replay_events(queryset)
+        self.message_user(request, f"Đã đưa {count} sự kiện trở lại hàng đợi.")
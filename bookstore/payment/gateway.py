@@ -0,0 +1,254 @@
+# payment/gateway.py
+"""
+Client PayOS dùng chung cho cả tiến trình.
+
+Mỗi tiến trình chỉ tạo một PayOS client trên một httpx.Client giữ kết nối
+keep-alive, với timeout kết nối/đọc ngắn thay cho mặc định 60 giây của SDK.
+Retry của SDK bị tắt vì nó thử lại cả lệnh tạo link thanh toán; ở đây chỉ
+các lệnh tra cứu (không làm thay đổi gì ở PayOS) mới được thử lại, giãn cách
+theo backoff có jitter.
+
+Circuit breaker đếm các lỗi hạ tầng liên tiếp (không kết nối được, quá thời
+gian, lỗi 5xx). Khi vượt ngưỡng, mọi lệnh gọi bị từ chối ngay bằng
+PayOSUnavailableError trong PAYOS_BREAKER_RESET giây, sau đó một lệnh gọi thử
+quyết định đóng mạch lại hay tiếp tục chặn. Số lượt gọi, lỗi và độ trễ của
+từng loại lệnh được đếm trong bộ nhớ, xem qua stats().
+
+Có thể trỏ PAYOS_BASE_URL tới một máy chủ PayOS giả lập để chạy thử.
+"""
+import logging
+import random
+import threading
+import time
+from dataclasses import asdict, dataclass
+
+import httpx
+from django.conf import settings
+from payos import APIError, ConnectionError, ConnectionTimeoutError, PayOS, PayOSError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONNECT_TIMEOUT = 3.0
+DEFAULT_READ_TIMEOUT = 10.0
+DEFAULT_MAX_CONNECTIONS = 10
+DEFAULT_LOOKUP_RETRIES = 2
+DEFAULT_RETRY_BACKOFF = 0.2
+DEFAULT_BREAKER_THRESHOLD = 5
+DEFAULT_BREAKER_RESET = 30.0
+
+
+class PayOSUnavailableError(PayOSError):
+    """PayOS đang lỗi liên tục nên lệnh gọi bị từ chối mà không gửi đi."""
+
+    def __init__(self):
+        super().__init__("PayOS tạm thời không phản hồi, vui lòng thử lại sau.")
+
+
+def is_transient(error):
+    """Lỗi do đường truyền hoặc PayOS quá tải, không phải do dữ liệu gửi đi."""
+    if isinstance(error, (ConnectionError, ConnectionTimeoutError)):
+        return True
+    return isinstance(error, APIError) and (error.status_code or 0) >= 500
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    @property
+    def state(self):
+        if self._opened_at is None:
+            return 'closed'
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._probing or time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            # Hết thời gian chờ: cho đúng một lệnh gọi thử
+            self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probing = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    logger.warning("PayOS circuit opened after %d failures", self._failures)
+                self._opened_at = time.monotonic()
+
+
+@dataclass
+class OperationStats:
+    calls: int = 0
+    errors: int = 0
+    retries: int = 0
+    rejected: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+
+    @property
+    def avg_ms(self):
+        return self.total_ms / self.calls if self.calls else 0.0
+
+
+class PayOSGateway:
+    def __init__(self, client, breaker, lookup_retries=DEFAULT_LOOKUP_RETRIES, retry_backoff=DEFAULT_RETRY_BACKOFF,
+                 http_client=None):
+        self.client = client
+        # SDK chỉ đóng http_client do nó tự tạo; client truyền vào phải được đóng ở đây
+        self.http_client = http_client
+        self.breaker = breaker
+        self.lookup_retries = lookup_retries
+        self.retry_backoff = retry_backoff
+        self._stats = {}
+        self._stats_lock = threading.Lock()
+
+    def _record(self, operation, **changes):
+        with self._stats_lock:
+            stats = self._stats.setdefault(operation, OperationStats())
+            duration = changes.pop('duration_ms', None)
+            if duration is not None:
+                stats.calls += 1
+                stats.total_ms += duration
+                stats.max_ms = max(stats.max_ms, duration)
+            for name, value in changes.items():
+                setattr(stats, name, getattr(stats, name) + value)
+
+    def _attempt(self, operation, func, *args):
+        if not self.breaker.allow():
+            self._record(operation, rejected=1)
+            raise PayOSUnavailableError()
+        started = time.perf_counter()
+        try:
+            result = func(*args)
+        except PayOSError as e:
+            self._record(operation, duration_ms=(time.perf_counter() - started) * 1000, errors=1)
+            if is_transient(e):
+                self.breaker.record_failure()
+            else:
+                # PayOS vẫn trả lời (ví dụ 404), chỉ là yêu cầu không hợp lệ
+                self.breaker.record_success()
+            raise
+        except Exception:
+            self._record(operation, duration_ms=(time.perf_counter() - started) * 1000, errors=1)
+            self.breaker.record_success()
+            raise
+        self._record(operation, duration_ms=(time.perf_counter() - started) * 1000)
+        self.breaker.record_success()
+        return result
+
+    def _call(self, operation, func, *args, retries=0):
+        attempt = 0
+        while True:
+            try:
+                return self._attempt(operation, func, *args)
+            except PayOSError as e:
+                if attempt >= retries or not is_transient(e):
+                    raise
+            # Full jitter: các tiến trình không cùng thử lại một lúc
+            time.sleep(random.uniform(0, self.retry_backoff * 2 ** attempt))
+            attempt += 1
+            self._record(operation, retries=1)
+
+    def get_payment(self, order_code):
+        return self._call('get', self.client.payment_requests.get, int(order_code), retries=self.lookup_retries)
+
+    def create_payment(self, payment_data):
+        # Không thử lại: lần gửi đầu có thể đã tạo link dù phản hồi bị mất
+        return self._call('create', self.client.payment_requests.create, payment_data)
+
+    def cancel_payment(self, order_code, reason=None):
+        return self._call('cancel', self.client.payment_requests.cancel, int(order_code), reason)
+
+    def verify_webhook(self, body):
+        # Chỉ kiểm tra chữ ký tại chỗ, không gọi ra PayOS
+        return self.client.webhooks.verify(body)
+
+    def stats(self):
+        with self._stats_lock:
+            snapshot = {
+                operation: dict(asdict(stats), avg_ms=stats.avg_ms) for operation, stats in self._stats.items()
+            }
+        return {'circuit': self.breaker.state, 'operations': snapshot}
+
+    def close(self):
+        self.client.close()
+        if self.http_client is not None:
+            self.http_client.close()
+
+
+def build_gateway():
+    timeout = httpx.Timeout(
+        getattr(settings, 'PAYOS_READ_TIMEOUT', DEFAULT_READ_TIMEOUT),
+        connect=getattr(settings, 'PAYOS_CONNECT_TIMEOUT', DEFAULT_CONNECT_TIMEOUT),
+    )
+    max_connections = getattr(settings, 'PAYOS_MAX_CONNECTIONS', DEFAULT_MAX_CONNECTIONS)
+    http_client = httpx.Client(
+        timeout=timeout,
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+    )
+    try:
+        client = PayOS(
+            client_id=settings.PAYOS_CLIENT_ID,
+            api_key=settings.PAYOS_API_KEY,
+            checksum_key=settings.PAYOS_CHECKSUM_KEY,
+            base_url=getattr(settings, 'PAYOS_BASE_URL', None) or None,
+            timeout=timeout.read,
+            max_retries=0,
+            http_client=http_client,
+        )
+    except PayOSError:
+        http_client.close()
+        raise
+    # SDK gắn self.timeout vào từng request; dùng httpx.Timeout để giữ riêng timeout kết nối
+    client.timeout = timeout
+    breaker = CircuitBreaker(
+        getattr(settings, 'PAYOS_BREAKER_THRESHOLD', DEFAULT_BREAKER_THRESHOLD),
+        getattr(settings, 'PAYOS_BREAKER_RESET', DEFAULT_BREAKER_RESET),
+    )
+    return PayOSGateway(
+        client,
+        breaker,
+        lookup_retries=getattr(settings, 'PAYOS_LOOKUP_RETRIES', DEFAULT_LOOKUP_RETRIES),
+        retry_backoff=getattr(settings, 'PAYOS_RETRY_BACKOFF', DEFAULT_RETRY_BACKOFF),
+        http_client=http_client,
+    )
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway():
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = build_gateway()
+    return _gateway
+
+
+def reset_gateway():
+    """Đóng client hiện tại; lần gọi sau tạo client mới (ví dụ sau khi đổi cấu hình)."""
+    global _gateway
+    with _gateway_lock:
+        if _gateway is not None:
+            _gateway.close()
+        _gateway = None
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from payment.webhooks import DEFAULT_BATCH_SIZE, process_pending
+
+
+class Command(BaseCommand):
+    help = "Áp dụng các webhook PayOS đang chờ trong hàng đợi vào đơn hàng và thanh toán."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help=f"Số sự kiện mỗi transaction (mặc định {DEFAULT_BATCH_SIZE}).")
+        parser.add_argument('--loop', action='store_true', help="Chạy liên tục thay vì xử lý hết hàng đợi rồi dừng.")
+        parser.add_argument('--interval', type=float, default=1.0, help="Số giây nghỉ khi hàng đợi trống (dùng với --loop).")
+
+    def handle(self, *args, **options):
+        while True:
+            result = process_pending(options['batch_size'])
+            if result.processed + result.ignored + result.failed:
+                self.stdout.write(
+                    f"Đã xử lý {result.processed} sự kiện ({result.paid} đơn được xác nhận), "
+                    f"bỏ qua {result.ignored}, lỗi {result.failed}."
+                )
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,21 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from payment.revenue import rebuild_all, rebuild_days
+
+
+class Command(BaseCommand):
+    help = "Dựng lại bảng doanh thu theo ngày (DailyRevenue) từ dữ liệu thanh toán."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help="Chỉ tính lại số ngày gần nhất thay vì toàn bộ.")
+
+    def handle(self, *args, **options):
+        if options['days']:
+            today = timezone.localdate()
+            count = rebuild_days(today - timedelta(days=i) for i in range(options['days']))
+        else:
+            count = rebuild_all()
+        self.stdout.write(self.style.SUCCESS(f"Đã ghi {count} dòng doanh thu theo ngày."))
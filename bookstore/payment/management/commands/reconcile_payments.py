@@ -0,0 +1,39 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from payos import PayOSError
+
+from payment.gateway import get_gateway
+from payment.reconciler import reconcile_pending
+
+
+class Command(BaseCommand):
+    help = "Hỏi PayOS trạng thái các đơn chuyển khoản còn chờ thanh toán (bù cho webhook bị lỡ)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=50, help="Số đơn tối đa mỗi lượt (mặc định 50).")
+        parser.add_argument('--rate', type=float, default=5.0, help="Số lượt gọi PayOS tối đa mỗi giây (mặc định 5).")
+        parser.add_argument('--max-age', type=int, default=24, help="Chỉ xét đơn tạo trong số giờ gần nhất (mặc định 24).")
+        parser.add_argument('--loop', action='store_true', help="Chạy liên tục thay vì một lượt.")
+        parser.add_argument('--interval', type=int, default=30, help="Số giây nghỉ giữa các lượt khi dùng --loop.")
+
+    def handle(self, *args, **options):
+        while True:
+            try:
+                result = reconcile_pending(
+                    limit=options['limit'],
+                    rate=options['rate'],
+                    max_age=timedelta(hours=options['max_age']),
+                )
+            except PayOSError as e:
+                raise CommandError(f"Không kết nối được PayOS: {e}")
+            self.stdout.write(
+                f"Đã kiểm tra {result.checked} đơn, xác nhận {result.paid} đơn đã thanh toán, {result.errors} lỗi"
+                + (" (PayOS báo quá tải, dừng lượt này)." if result.throttled else ".")
+            )
+            if options['verbosity'] > 1 and result.checked + result.errors:
+                self.stdout.write(f"PayOS: {get_gateway().stats()}")
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from payment.models import PaymentWebhookEvent
+from payment.webhooks import replay_events
+
+
+class Command(BaseCommand):
+    help = "Đưa các webhook PayOS bị lỗi hoặc bị kẹt trở lại hàng đợi để xử lý lại."
+
+    def add_arguments(self, parser):
+        parser.add_argument('ids', nargs='*', type=int, help="Chỉ xử lý lại các sự kiện có id này.")
+        parser.add_argument('--order', type=int, help="Chỉ xử lý lại sự kiện của mã đơn PayOS này.")
+
+    def handle(self, *args, **options):
+        events = PaymentWebhookEvent.objects.all()
+        if options['ids']:
+            events = events.filter(pk__in=options['ids'])
+        if options['order']:
+            events = events.filter(order_code=options['order'])
+        count = replay_events(events)
+        self.stdout.write(self.style.SUCCESS(f"Đã đưa {count} sự kiện trở lại hàng đợi."))
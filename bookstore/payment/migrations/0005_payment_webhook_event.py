@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payment', '0004_alter_payment_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentWebhookEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_code', models.BigIntegerField(verbose_name='Mã đơn PayOS')),
+                ('reference', models.CharField(blank=True, max_length=100, verbose_name='Mã tham chiếu')),
+                ('code', models.CharField(blank=True, max_length=10, verbose_name='Mã kết quả')),
+                ('payload', models.JSONField(verbose_name='Dữ liệu gốc')),
+                ('status', models.CharField(choices=[('pending', 'Chờ xử lý'), ('processing', 'Đang xử lý'), ('processed', 'Đã xử lý'), ('ignored', 'Bỏ qua'), ('failed', 'Lỗi')], default='pending', max_length=20, verbose_name='Trạng thái')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Số lần xử lý')),
+                ('last_error', models.TextField(blank=True, verbose_name='Lỗi gần nhất')),
+                ('received_at', models.DateTimeField(auto_now_add=True, verbose_name='Thời gian nhận')),
+                ('claimed_at', models.DateTimeField(blank=True, null=True, verbose_name='Thời gian bắt đầu xử lý')),
+                ('processed_at', models.DateTimeField(blank=True, null=True, verbose_name='Thời gian xử lý xong')),
+            ],
+            options={
+                'verbose_name': 'Sự kiện webhook thanh toán',
+                'verbose_name_plural': 'Sự kiện webhook thanh toán',
+                'indexes': [models.Index(fields=['status', 'id'], name='payment_pay_status_a74b63_idx')],
+                'unique_together': {('order_code', 'reference')},
+            },
+        ),
+    ]
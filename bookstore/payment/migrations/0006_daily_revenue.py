@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-18 14:47
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import Coalesce, TruncDate
+
+
+def backfill_daily_revenue(apps, schema_editor):
+    Payment = apps.get_model('payment', 'Payment')
+    DailyRevenue = apps.get_model('payment', 'DailyRevenue')
+    rows = (
+        Payment.objects.filter(status='completed')
+        .annotate(day=TruncDate(Coalesce('paid_at', 'created_at')))
+        .values('day', 'method', 'order__status')
+        .annotate(total=Sum('amount'), count=Count('id'))
+        .order_by()
+    )
+    DailyRevenue.objects.bulk_create([
+        DailyRevenue(
+            date=row['day'], method=row['method'], order_status=row['order__status'],
+            total_amount=row['total'], payment_count=row['count'],
+        )
+        for row in rows
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0006_order_number_sequence'),
+        ('payment', '0005_payment_webhook_event'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRevenue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Ngày')),
+                ('method', models.CharField(choices=[('cod', 'Thanh toán khi nhận hàng'), ('vietqr', 'VietQR')], max_length=20, verbose_name='Phương thức thanh toán')),
+                ('order_status', models.CharField(max_length=20, verbose_name='Trạng thái đơn hàng')),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Doanh thu')),
+                ('payment_count', models.PositiveIntegerField(default=0, verbose_name='Số thanh toán')),
+            ],
+            options={
+                'verbose_name': 'Doanh thu theo ngày',
+                'verbose_name_plural': 'Doanh thu theo ngày',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['status', 'paid_at'], name='payment_pay_status_606426_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dailyrevenue',
+            index=models.Index(fields=['date'], name='payment_dai_date_ba2552_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='dailyrevenue',
+            unique_together={('date', 'method', 'order_status')},
+        ),
+        migrations.RunPython(backfill_daily_revenue, migrations.RunPython.noop),
+    ]
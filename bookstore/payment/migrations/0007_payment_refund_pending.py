@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payment', '0006_daily_revenue'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='payment',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Chờ thanh toán'), ('completed', 'Đã thanh toán'), ('failed', 'Thất bại'), ('canceled', 'Đã hủy'), ('refund_pending', 'Chờ hoàn tiền')], default='pending', max_length=20, verbose_name='Trạng thái'),
+        ),
+    ]
@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
 from orders.models import Order
 
 class Payment(models.Model):
@@ -12,6 +14,8 @@ class Payment(models.Model):
         ('completed', 'Đã thanh toán'),
         ('failed', 'Thất bại'), 
         ('canceled', 'Đã hủy'),
+        # Khách trả tiền cho đơn đã hủy (webhook/đối soát đến muộn): cần hoàn tiền thủ công
+        ('refund_pending', 'Chờ hoàn tiền'),
     ]
 
     order = models.OneToOneField(Order, on_delete=models.CASCADE, related_name='payment', verbose_name="Đơn hàng")
@@ -25,6 +29,98 @@ class Payment(models.Model):
     class Meta:
         verbose_name = "Thanh toán"
         verbose_name_plural = "Lịch sử thanh toán"
+        indexes = [models.Index(fields=['status', 'paid_at'])]
 
     def __str__(self):
         return f"Thanh toán {self.order.order_number}"
+
+
+class PaymentWebhookEvent(models.Model):
+    """Webhook PayOS đã xác thực chữ ký, chờ worker áp dụng (xem payment/webhooks.py)."""
+    STATUS_CHOICES = [
+        ('pending', 'Chờ xử lý'),
+        ('processing', 'Đang xử lý'),
+        ('processed', 'Đã xử lý'),
+        ('ignored', 'Bỏ qua'),
+        ('failed', 'Lỗi'),
+    ]
+
+    order_code = models.BigIntegerField(verbose_name="Mã đơn PayOS")
+    reference = models.CharField(max_length=100, blank=True, verbose_name="Mã tham chiếu")
+    code = models.CharField(max_length=10, blank=True, verbose_name="Mã kết quả")
+    payload = models.JSONField(verbose_name="Dữ liệu gốc")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', verbose_name="Trạng thái")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="Số lần xử lý")
+    last_error = models.TextField(blank=True, verbose_name="Lỗi gần nhất")
+    received_at = models.DateTimeField(auto_now_add=True, verbose_name="Thời gian nhận")
+    claimed_at = models.DateTimeField(null=True, blank=True, verbose_name="Thời gian bắt đầu xử lý")
+    processed_at = models.DateTimeField(null=True, blank=True, verbose_name="Thời gian xử lý xong")
+
+    class Meta:
+        verbose_name = "Sự kiện webhook thanh toán"
+        verbose_name_plural = "Sự kiện webhook thanh toán"
+        # PayOS gửi lại cùng một giao dịch khi không nhận được phản hồi: chỉ lưu một lần
+        unique_together = ('order_code', 'reference')
+        indexes = [models.Index(fields=['status', 'id'])]
+
+    def __str__(self):
+        return f"Webhook {self.order_code} ({self.reference or '-'})"
+
+
+class DailyRevenue(models.Model):
+    """Doanh thu đã thanh toán gom theo ngày (giờ địa phương), phương thức và trạng thái đơn; xem payment/revenue.py."""
+    date = models.DateField(verbose_name="Ngày")
+    method = models.CharField(max_length=20, choices=Payment.METHOD_CHOICES, verbose_name="Phương thức thanh toán")
+    order_status = models.CharField(max_length=20, verbose_name="Trạng thái đơn hàng")
+    total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name="Doanh thu")
+    payment_count = models.PositiveIntegerField(default=0, verbose_name="Số thanh toán")
+
+    class Meta:
+        verbose_name = "Doanh thu theo ngày"
+        verbose_name_plural = "Doanh thu theo ngày"
+        unique_together = ('date', 'method', 'order_status')
+        indexes = [models.Index(fields=['date'])]
+
+    def __str__(self):
+        return f"{self.date} {self.method} {self.order_status}: {self.total_amount}"
+
+
+# Giữ bảng doanh thu theo ngày khớp với Payment và trạng thái đơn hàng
+@receiver(pre_save, sender=Payment)
+def remember_revenue_day(sender, instance, **kwargs):
+    instance._revenue_before = (
+        Payment.objects.filter(pk=instance.pk).values_list('status', 'paid_at', 'created_at').first()
+        if instance.pk else None
+    )
+
+
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+def refresh_payment_revenue(sender, instance, **kwargs):
+    from .revenue import payment_day, refresh_days_on_commit
+
+    days = set()
+    if instance.status == 'completed':
+        days.add(payment_day(instance.paid_at, instance.created_at))
+    before = getattr(instance, '_revenue_before', None)
+    if before is not None and before[0] == 'completed':
+        days.add(payment_day(before[1], before[2]))
+    refresh_days_on_commit(days)
+
+
+@receiver(pre_save, sender=Order)
+def remember_order_status(sender, instance, update_fields=None, **kwargs):
+    # Chỉ trạng thái đơn có trong bảng doanh thu; lưu mà không đổi status thì bỏ qua
+    if not instance.pk or (update_fields is not None and 'status' not in update_fields):
+        instance._status_before = None
+        return
+    instance._status_before = Order.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
+
+
+@receiver(post_save, sender=Order)
+def refresh_order_revenue(sender, instance, created, **kwargs):
+    before = getattr(instance, '_status_before', None)
+    if created or before is None or before == instance.status:
+        return
+    from .revenue import refresh_orders_on_commit
+    refresh_orders_on_commit([instance.pk])
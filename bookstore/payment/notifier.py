@@ -0,0 +1,54 @@
+# payment/notifier.py
+"""
+Kênh đẩy trạng thái thanh toán tới trình duyệt.
+
+publish() ghi trạng thái mới vào Django cache rồi đánh thức ngay các kết nối
+SSE đang chờ trong cùng tiến trình. Cache và Event chỉ là đường tắt: kết nối ở
+tiến trình khác (webhook worker, reconcile_payments) nhận thay đổi trong lần
+kiểm tra kế tiếp (vài giây) bằng cách đọc lại trạng thái đơn trong DB khi cache
+không có, nên không có request nào phải gọi ra PayOS để hỏi trạng thái.
+"""
+import asyncio
+import threading
+
+from django.core.cache import cache
+
+STATUS_CACHE_TIMEOUT = 3600
+
+_waiters = {}
+_waiters_lock = threading.Lock()
+
+
+def _key(order_id):
+    return f'payment:status:{order_id}'
+
+
+def publish(order_id, status):
+    cache.set(_key(order_id), status, STATUS_CACHE_TIMEOUT)
+    with _waiters_lock:
+        waiters = list(_waiters.get(order_id, ()))
+    for loop, event in waiters:
+        # publish() có thể chạy ở thread khác với event loop của kết nối
+        loop.call_soon_threadsafe(event.set)
+
+
+async def aget_status(order_id):
+    return await cache.aget(_key(order_id))
+
+
+async def wait_for_update(order_id, timeout):
+    """Chờ tới khi có thông báo cho đơn hàng trong tiến trình này, hoặc hết timeout."""
+    waiter = (asyncio.get_running_loop(), asyncio.Event())
+    with _waiters_lock:
+        _waiters.setdefault(order_id, set()).add(waiter)
+    try:
+        await asyncio.wait_for(waiter[1].wait(), timeout)
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        with _waiters_lock:
+            waiters = _waiters.get(order_id)
+            if waiters is not None:
+                waiters.discard(waiter)
+                if not waiters:
+                    del _waiters[order_id]
@@ -0,0 +1,66 @@
+# payment/reconciler.py
+"""
+Đối soát định kỳ các đơn chuyển khoản còn chờ thanh toán với PayOS.
+
+Webhook là nguồn cập nhật chính; đối soát chỉ bù cho webhook bị lỡ (ví dụ
+chạy ở localhost). Mỗi lượt hỏi PayOS cho tối đa `limit` đơn, giãn cách theo
+`rate` lượt/giây để không vượt giới hạn của PayOS, và dừng ngay khi bị PayOS
+báo quá tải.
+"""
+import time
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.utils import timezone
+from payos import PayOSError, TooManyRequestsError
+
+from orders.models import Order
+from .gateway import PayOSUnavailableError
+from .utils import get_payos_client, mark_order_paid
+
+DEFAULT_MAX_AGE = timedelta(hours=24)
+
+
+@dataclass
+class ReconcileResult:
+    checked: int = 0
+    paid: int = 0
+    errors: int = 0
+    throttled: bool = False
+
+
+def pending_orders(max_age=DEFAULT_MAX_AGE):
+    return Order.objects.filter(
+        status='pending',
+        payment__method='vietqr',
+        payment__status='pending',
+        created_at__gte=timezone.now() - max_age,
+    ).order_by('created_at')
+
+
+def reconcile_pending(limit=50, rate=5.0, max_age=DEFAULT_MAX_AGE, client=None):
+    result = ReconcileResult()
+    orders = list(pending_orders(max_age)[:limit])
+    if not orders:
+        return result
+    client = client or get_payos_client()
+    interval = 1.0 / rate if rate > 0 else 0
+
+    for order in orders:
+        started = time.monotonic()
+        try:
+            info = client.get_payment(order.id)
+        except (TooManyRequestsError, PayOSUnavailableError):
+            result.throttled = True
+            break
+        except PayOSError:
+            # Đơn chưa tạo link PayOS (chuyển khoản thủ công) hoặc lỗi tạm thời
+            result.errors += 1
+        else:
+            result.checked += 1
+            if info.status == 'PAID' and mark_order_paid(order):
+                result.paid += 1
+        elapsed = time.monotonic() - started
+        if elapsed < interval:
+            time.sleep(interval - elapsed)
+    return result
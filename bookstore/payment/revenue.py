@@ -0,0 +1,100 @@
+# payment/revenue.py
+"""
+Bảng doanh thu gom sẵn theo ngày cho biểu đồ trên trang admin.
+
+DailyRevenue giữ tổng tiền các thanh toán đã hoàn tất theo (ngày, phương thức,
+trạng thái đơn). Mỗi khi thanh toán hoàn tất hoặc đơn hàng đổi trạng thái, chỉ
+những ngày bị ảnh hưởng được tính lại từ bảng Payment (sau khi transaction
+commit), nên bảng luôn khớp dữ liệu gốc mà không phải quét cả bảng. Biểu đồ
+tuần/tháng chỉ cần cộng vài trăm dòng của bảng này.
+
+Thay đổi bằng SQL trực tiếp hoặc xóa hàng loạt không đi qua các hook; chạy
+lệnh `rebuild_revenue` để dựng lại.
+"""
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .models import DailyRevenue, Payment
+
+
+def payment_day(paid_at, created_at):
+    return timezone.localdate(paid_at or created_at)
+
+
+def _completed_payments():
+    return Payment.objects.filter(status='completed').annotate(ts=Coalesce('paid_at', 'created_at'))
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _rollup_rows(payments):
+    rows = (
+        payments.annotate(day=TruncDate('ts'))
+        .values('day', 'method', 'order__status')
+        .annotate(total=Sum('amount'), count=Count('id'))
+        .order_by()
+    )
+    return [
+        DailyRevenue(
+            date=row['day'],
+            method=row['method'],
+            order_status=row['order__status'],
+            total_amount=row['total'],
+            payment_count=row['count'],
+        )
+        for row in rows
+    ]
+
+
+def rebuild_days(days):
+    """Tính lại DailyRevenue cho các ngày `days`; trả về số dòng."""
+    days = set(days)
+    if not days:
+        return 0
+    start, end = _day_start(min(days)), _day_start(max(days) + timedelta(days=1))
+    payments = _completed_payments().filter(
+        Q(paid_at__gte=start, paid_at__lt=end) | Q(paid_at__isnull=True, created_at__gte=start, created_at__lt=end)
+    )
+    rows = [row for row in _rollup_rows(payments) if row.date in days]
+    with transaction.atomic():
+        DailyRevenue.objects.filter(date__in=days).delete()
+        DailyRevenue.objects.bulk_create(rows)
+    return len(rows)
+
+
+def rebuild_all():
+    rows = _rollup_rows(_completed_payments())
+    with transaction.atomic():
+        DailyRevenue.objects.all().delete()
+        DailyRevenue.objects.bulk_create(rows, batch_size=500)
+    return len(rows)
+
+
+def refresh_days_on_commit(days):
+    days = set(days)
+    if days:
+        transaction.on_commit(lambda: rebuild_days(days))
+
+
+def refresh_orders_on_commit(order_ids):
+    """Tính lại các ngày có thanh toán của những đơn hàng này, sau khi commit."""
+    order_ids = list(order_ids)
+
+    def refresh():
+        moments = Payment.objects.filter(order_id__in=order_ids).values_list('paid_at', 'created_at')
+        rebuild_days({payment_day(paid_at, created_at) for paid_at, created_at in moments})
+
+    if order_ids:
+        transaction.on_commit(refresh)
+
+
+def daily_totals(start):
+    """Doanh thu theo ngày từ ngày `start`: {date: Decimal}."""
+    rows = DailyRevenue.objects.filter(date__gte=start).values('date').annotate(total=Sum('total_amount'))
+    return {row['date']: row['total'] for row in rows}
@@ -10,5 +10,6 @@ urlpatterns = [
     path('return/<int:order_id>/', views.payment_return, name='payment_return'),
     path('cancel/<int:order_id>/', views.payment_cancel, name='payment_cancel'),
     path('check-status/<int:order_id>/', views.check_payment_status, name='check_status'),
+    path('status-stream/<int:order_id>/', views.payment_status_stream, name='status_stream'),
     path('webhook/', views.webhook, name='webhook'),
 ]
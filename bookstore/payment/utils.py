@@ -1,12 +1,18 @@
 from django.conf import settings
-from payos import PayOS
+from django.db import transaction
+from django.utils import timezone
 from payos.types import ItemData, CreatePaymentLinkRequest
 from orders.models import Order
+from .gateway import get_gateway
+import logging
 import time
 import sys
 import os
 
+logger = logging.getLogger(__name__)
+
 def get_payos_client():
+    # Client dùng chung cho cả tiến trình (keep-alive, timeout, circuit breaker): xem payment/gateway.py
     client_id = settings.PAYOS_CLIENT_ID
     api_key = settings.PAYOS_API_KEY
     checksum_key = settings.PAYOS_CHECKSUM_KEY
@@ -14,11 +20,7 @@ def get_payos_client():
     if not client_id or not api_key or not checksum_key:
         print("DEBUG PAYOS: ERROR - One or more keys are missing!", file=sys.stderr)
 
-    return PayOS(
-        client_id=client_id,
-        api_key=api_key,
-        checksum_key=checksum_key
-    )
+    return get_gateway()
 
 def create_or_get_payment_link(order, domain=None):
     payos = get_payos_client()
@@ -27,7 +29,7 @@ def create_or_get_payment_link(order, domain=None):
     
     # 1. Try to get existing payment link first to ensure consistency (orderCode = order.id)
     try:
-        existing_link = payos.payment_requests.get(int(order.id))
+        existing_link = payos.get_payment(order.id)
         if existing_link and existing_link.status != "CANCELLED":
             print(f"DEBUG PAYOS: Found existing link for Order {order.id}", file=sys.stderr)
             return existing_link
@@ -55,4 +57,63 @@ def create_or_get_payment_link(order, domain=None):
         returnUrl=f"{domain}/payment/return/{order.id}/"
     )
     
-    return payos.payment_requests.create(payment_data)
+    return payos.create_payment(payment_data)
+
+
+PAID_ORDER_STATUSES = ('confirmed', 'shipping', 'delivered')
+
+
+def order_payment_status(order):
+    """Trạng thái thanh toán gửi cho trình duyệt: PAID, CANCELLED hoặc PENDING."""
+    if order.status in PAID_ORDER_STATUSES:
+        return 'PAID'
+    if order.status == 'canceled':
+        return 'CANCELLED'
+    return 'PENDING'
+
+
+def mark_orders_paid(orders, references=None):
+    """
+    Xác nhận các đơn hàng đã thanh toán trong một transaction và báo cho các
+    trang đang chờ; `references` (order_id -> mã giao dịch) được ghi vào
+    Payment. Chỉ đơn còn chờ thanh toán được xác nhận; đơn đã hủy (tồn kho đã
+    hoàn lại) mà vẫn nhận được tiền thì thanh toán được đánh dấu chờ hoàn tiền.
+    Trả về tập id các đơn vừa chuyển sang đã thanh toán.
+    """
+    from .models import Payment
+    from .notifier import publish
+    from .revenue import refresh_orders_on_commit
+
+    order_ids = [order.pk for order in orders]
+    references = references or {}
+    now = timezone.now()
+    with transaction.atomic():
+        statuses = dict(Order.objects.select_for_update().filter(pk__in=order_ids).values_list('pk', 'status'))
+        newly_paid = {pk for pk, status in statuses.items() if status == 'pending'}
+        canceled = {pk for pk, status in statuses.items() if status == 'canceled'}
+        Order.objects.filter(pk__in=newly_paid, status='pending').update(status='confirmed', updated_at=now)
+
+        payments = Payment.objects.exclude(status__in=('completed', 'refund_pending'))
+        for order_id in statuses:
+            status = 'refund_pending' if order_id in canceled else 'completed'
+            changes = {'status': status, 'paid_at': now}
+            if references.get(order_id):
+                changes['transaction_id'] = references[order_id]
+            if payments.filter(order_id=order_id).update(**changes) and order_id in canceled:
+                logger.warning("Order %s was paid after being canceled; payment flagged for refund", order_id)
+        refresh_orders_on_commit(order_ids)
+    for order in orders:
+        if order.pk in newly_paid:
+            order.status = 'confirmed'
+
+    def publish_paid():
+        for order_id in newly_paid:
+            publish(order_id, 'PAID')
+
+    transaction.on_commit(publish_paid)
+    return newly_paid
+
+
+def mark_order_paid(order, reference=''):
+    """Xác nhận một đơn hàng đã thanh toán; trả về False nếu đã xác nhận trước đó."""
+    return bool(mark_orders_paid([order], {order.pk: reference}))
@@ -1,17 +1,26 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import JsonResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.conf import settings
 from orders.models import Order
-from orders.cart import Cart
+from orders.cart import get_cart
 from .models import Payment
-from .utils import get_payos_client, create_or_get_payment_link
+from . import notifier, webhooks
+from .utils import get_payos_client, create_or_get_payment_link, mark_order_paid, order_payment_status
 from payos.types import ItemData, CreatePaymentLinkRequest
+import asyncio
 import json
 from django.views.decorators.http import require_POST
 from django.contrib import messages
 from urllib.parse import quote_plus
 
+# Luồng trạng thái thanh toán (giây; riêng retry cho WSGI tính bằng mili giây)
+STATUS_STREAM_CHECK_INTERVAL = 2
+STATUS_STREAM_KEEPALIVE = 20
+STATUS_STREAM_MAX_DURATION = 600
+STATUS_STREAM_WSGI_RETRY = 3000
+
 def payment_vietqr(request, order_id):
     order = get_object_or_404(Order, id=order_id)
     payment_content = f"DH {order.order_number}"
@@ -44,7 +53,7 @@ def payment_vietqr_confirm(request, order_id):
         payment.transaction_id = payment.transaction_id or 'USER_REPORTED'
         payment.save()
 
-    cart = Cart(request)
+    cart = get_cart(request)
     cart.clear()
 
     messages.success(request, 'Đã ghi nhận thanh toán. Đơn hàng sẽ được xác minh thủ công.')
@@ -82,13 +91,13 @@ def create_payment(request, order_id):
     
     payos = get_payos_client()
     try:
-        payment_link_data = payos.payment_requests.create(payment_data)
+        payment_link_data = payos.create_payment(payment_data)
         return redirect(payment_link_data.checkoutUrl)
     except Exception as e:
         print(f"Error creating payment link: {e}")
         # For demo purposes, if error (e.g. duplicate orderCode), try to get existing link
         try:
-             payment_link_data = payos.payment_requests.get(int(order.id))
+             payment_link_data = payos.get_payment(order.id)
              # If status is PENDING, redirect to checkout
              if payment_link_data.status == "PENDING":
                  return redirect(payment_link_data.checkoutUrl)
@@ -105,15 +114,10 @@ def payment_return(request, order_id):
     # For now, we assume success if they reach this URL with code=00
     code = request.GET.get('code')
     if code == '00':
-        order.status = 'confirmed'
-        order.save()
-        
-        if hasattr(order, 'payment'):
-            order.payment.status = 'completed'
-            order.payment.save()
-            
+        mark_order_paid(order)
+
         # Clear cart on successful payment
-        cart = Cart(request)
+        cart = get_cart(request)
         cart.clear()
             
         return redirect('orders:order_success', order_id=order.id)
@@ -121,34 +125,60 @@ def payment_return(request, order_id):
         return redirect('orders:checkout')
 
 def check_payment_status(request, order_id):
-    try:
-        order = Order.objects.get(id=order_id)
-        
-        # 1. Nếu đơn hàng đã được xác nhận trong DB rồi thì trả về PAID ngay
-        if order.status == 'confirmed':
-            return JsonResponse({'status': 'PAID'})
-            
-        # 2. Nếu chưa, server sẽ chủ động hỏi PayOS (Dành cho localhost không có webhook)
-        try:
-            payos = get_payos_client()
-            payment_link_info = payos.payment_requests.get(int(order_id))
-            
-            if payment_link_info.status == "PAID":
-                # Cập nhật trạng thái đơn hàng ngay lập tức
-                order.status = 'confirmed'
-                order.save()
-                
-                if hasattr(order, 'payment'):
-                    order.payment.status = 'completed'
-                    order.payment.save()
-                    
-                return JsonResponse({'status': 'PAID'})
-        except Exception as e:
-            print(f"Lỗi khi kiểm tra trạng thái PayOS: {e}")
-            
-        return JsonResponse({'status': 'PENDING'})
-    except Order.DoesNotExist:
+    # Chỉ đọc trạng thái trong DB; việc hỏi PayOS do webhook và lệnh reconcile_payments đảm nhiệm
+    order = Order.objects.filter(id=order_id).only('status').first()
+    if order is None:
         return JsonResponse({'status': 'ERROR'}, status=404)
+    status = order_payment_status(order)
+    return JsonResponse({'status': 'PAID' if status == 'PAID' else 'PENDING'})
+
+
+def _status_event(status, retry=None):
+    event = f"event: status\ndata: {json.dumps({'status': status})}\n\n"
+    if retry:
+        event = f"retry: {retry}\n" + event
+    return event
+
+
+async def _status_events(order_id, status):
+    yield _status_event(status)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + STATUS_STREAM_MAX_DURATION
+    idle = 0
+    while status == 'PENDING' and loop.time() < deadline:
+        await notifier.wait_for_update(order_id, STATUS_STREAM_CHECK_INTERVAL)
+        # Cache chỉ là đường tắt (có thể không dùng chung giữa các tiến trình): hụt thì đọc DB
+        latest = await notifier.aget_status(order_id)
+        if not latest or latest == status:
+            order = await Order.objects.filter(id=order_id).only('status').afirst()
+            latest = order_payment_status(order) if order is not None else status
+        if latest != status:
+            status = latest
+            idle = 0
+            yield _status_event(status)
+        else:
+            idle += STATUS_STREAM_CHECK_INTERVAL
+            if idle >= STATUS_STREAM_KEEPALIVE:
+                idle = 0
+                # Dòng chú thích giữ kết nối qua proxy
+                yield ": keepalive\n\n"
+
+
+async def payment_status_stream(request, order_id):
+    """Server-Sent Events: đẩy trạng thái thanh toán khi webhook/đối soát xác nhận đơn hàng."""
+    order = await Order.objects.filter(id=order_id).only('status').afirst()
+    if order is None:
+        return JsonResponse({'status': 'ERROR'}, status=404)
+    status = order_payment_status(order)
+
+    if status != 'PENDING' or not isinstance(request, ASGIRequest):
+        # Chạy dưới WSGI không giữ được kết nối: trả trạng thái hiện tại, trình duyệt tự kết nối lại sau `retry`
+        response = HttpResponse(_status_event(status, retry=STATUS_STREAM_WSGI_RETRY), content_type='text/event-stream')
+    else:
+        response = StreamingHttpResponse(_status_events(order_id, status), content_type='text/event-stream')
+        response['X-Accel-Buffering'] = 'no'
+    response['Cache-Control'] = 'no-cache'
+    return response
 
 @csrf_exempt
 def webhook(request):
@@ -158,21 +188,12 @@ def webhook(request):
             body = json.loads(request.body)
             
             # Verify webhook data
-            webhook_data = payos.webhooks.verify(body)
-            
-            # Process data
-            order_id = webhook_data.orderCode
-            order = Order.objects.get(id=order_id)
-            
-            if webhook_data.code == "00": # Success
-                order.status = 'confirmed'
-                order.save()
-                if hasattr(order, 'payment'):
-                    order.payment.status = 'completed'
-                    order.payment.save()
-            
-            return JsonResponse({'success': True})
+            webhook_data = payos.verify_webhook(body)
         except Exception as e:
             print(f"Webhook error: {e}")
             return JsonResponse({'success': False, 'error': str(e)}, status=400)
+
+        # Chỉ lưu sự kiện rồi trả lời ngay; worker process_payment_events cập nhật đơn hàng
+        webhooks.record_event(webhook_data, body)
+        return JsonResponse({'success': True})
     return JsonResponse({'success': False}, status=405)
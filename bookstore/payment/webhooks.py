@@ -0,0 +1,126 @@
+# payment/webhooks.py
+"""
+Hàng đợi webhook thanh toán.
+
+View webhook chỉ xác thực chữ ký rồi lưu sự kiện gốc vào PaymentWebhookEvent
+và trả lời PayOS ngay. Khóa duy nhất (order_code, reference) khiến các lần
+PayOS gửi lại cùng một giao dịch không tạo bản ghi mới. Worker
+(lệnh process_payment_events) nhận từng lô sự kiện đang chờ và áp dụng cả lô
+trong một transaction; nếu lô lỗi thì xử lý lại từng sự kiện để chỉ sự kiện
+hỏng bị đánh dấu lỗi. Sự kiện lỗi hoặc bị kẹt ở trạng thái đang xử lý (worker
+chết giữa chừng) được đưa lại hàng đợi bằng replay_events().
+"""
+import logging
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from orders.models import Order
+from .models import PaymentWebhookEvent
+from .utils import mark_orders_paid
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 100
+# Sự kiện "đang xử lý" lâu hơn mức này coi như worker đã chết
+STUCK_AFTER = timedelta(minutes=10)
+
+
+@dataclass
+class ProcessResult:
+    processed: int = 0
+    ignored: int = 0
+    failed: int = 0
+    paid: int = 0
+
+
+def record_event(webhook_data, payload):
+    """Lưu webhook đã xác thực; trả về (event, created). Webhook trùng không được lưu lại."""
+    return PaymentWebhookEvent.objects.get_or_create(
+        order_code=webhook_data.order_code,
+        reference=webhook_data.reference or '',
+        defaults={'code': webhook_data.code or '', 'payload': payload},
+    )
+
+
+def _claim(batch_size):
+    ids = list(
+        PaymentWebhookEvent.objects.filter(status='pending').order_by('id').values_list('id', flat=True)[:batch_size]
+    )
+    if not ids:
+        return []
+    claimed_at = timezone.now()
+    # UPDATE có điều kiện: hai worker chạy cùng lúc không nhận trùng sự kiện
+    PaymentWebhookEvent.objects.filter(pk__in=ids, status='pending').update(
+        status='processing', claimed_at=claimed_at, attempts=F('attempts') + 1,
+    )
+    return list(PaymentWebhookEvent.objects.filter(pk__in=ids, status='processing', claimed_at=claimed_at).order_by('id'))
+
+
+def _apply(events, result):
+    now = timezone.now()
+    orders = Order.objects.in_bulk({event.order_code for event in events})
+    paid_orders, references = {}, {}
+    for event in events:
+        order = orders.get(event.order_code)
+        event.processed_at = now
+        event.last_error = ''
+        if order is None:
+            event.status = 'failed'
+            event.last_error = 'Không tìm thấy đơn hàng'
+        elif event.code != '00':
+            event.status = 'ignored'
+        else:
+            event.status = 'processed'
+            paid_orders[order.pk] = order
+            references[order.pk] = event.reference
+
+    with transaction.atomic():
+        newly_paid = mark_orders_paid(list(paid_orders.values()), references) if paid_orders else set()
+        PaymentWebhookEvent.objects.bulk_update(events, ['status', 'processed_at', 'last_error'])
+
+    result.paid += len(newly_paid)
+    for event in events:
+        if event.status == 'processed':
+            result.processed += 1
+        elif event.status == 'ignored':
+            result.ignored += 1
+        else:
+            result.failed += 1
+
+
+def _fail(event, error):
+    event.status = 'failed'
+    event.last_error = str(error) or error.__class__.__name__
+    event.processed_at = timezone.now()
+    PaymentWebhookEvent.objects.filter(pk=event.pk).update(
+        status=event.status, last_error=event.last_error, processed_at=event.processed_at,
+    )
+
+
+def process_pending(batch_size=DEFAULT_BATCH_SIZE):
+    """Áp dụng một lô sự kiện đang chờ; trả về ProcessResult (rỗng nếu hàng đợi trống)."""
+    result = ProcessResult()
+    events = _claim(batch_size)
+    if not events:
+        return result
+    try:
+        _apply(events, result)
+    except Exception:
+        logger.exception("Webhook batch %s-%s failed, retrying one by one", events[0].pk, events[-1].pk)
+        for event in events:
+            try:
+                _apply([event], result)
+            except Exception as e:
+                result.failed += 1
+                _fail(event, e)
+    return result
+
+
+def replay_events(queryset):
+    """Đưa các sự kiện lỗi hoặc bị kẹt trở lại hàng đợi; trả về số sự kiện."""
+    stuck = Q(status='processing', claimed_at__lt=timezone.now() - STUCK_AFTER)
+    return queryset.filter(Q(status='failed') | stuck).update(status='pending', claimed_at=None)
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from reviews.models import rebuild_rating_summary
+
+
+class Command(BaseCommand):
+    help = "Tính lại số đánh giá, tổng điểm và phân bố sao được lưu trên từng sản phẩm."
+
+    def handle(self, *args, **options):
+        count = rebuild_rating_summary()
+        self.stdout.write(self.style.SUCCESS(f"Đã cập nhật tổng hợp đánh giá cho {count} sản phẩm."))
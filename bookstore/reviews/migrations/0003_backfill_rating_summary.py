@@ -0,0 +1,33 @@
+from django.db import migrations
+from django.db.models import Count
+
+
+def backfill(apps, schema_editor):
+    Product = apps.get_model('books', 'Product')
+    Review = apps.get_model('reviews', 'Review')
+    grouped = {}
+    for row in Review.objects.filter(is_approved=True).values('product_id', 'rating').annotate(total=Count('id')):
+        grouped.setdefault(row['product_id'], {})[row['rating']] = row['total']
+
+    products = list(Product.objects.filter(pk__in=grouped.keys()))
+    for product in products:
+        counts = grouped[product.id]
+        product.rating_count = sum(counts.values())
+        product.rating_sum = sum(star * total for star, total in counts.items())
+        product.rating_average = product.rating_sum / product.rating_count if product.rating_count else 0
+        for i in range(1, 6):
+            setattr(product, f'rating_star_{i}', counts.get(i, 0))
+    fields = ['rating_count', 'rating_sum', 'rating_average'] + [f'rating_star_{i}' for i in range(1, 6)]
+    Product.objects.bulk_update(products, fields, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reviews', '0002_alter_review_options_alter_review_comment_and_more'),
+        ('books', '0009_product_rating_summary'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
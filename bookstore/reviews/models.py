@@ -1,4 +1,7 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, F, FloatField, Case, When, Value, ExpressionWrapper
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
 from books.models import Product
 from django.contrib.auth.models import User
 
@@ -20,3 +23,90 @@ class Review(models.Model):
 
     def __str__(self):
         return f"{self.user.username} - {self.product.name} ({self.rating} sao)"
+
+
+# --- Tổng hợp đánh giá trên Product ---
+
+def _refresh_average(product_id):
+    Product.objects.filter(pk=product_id).update(
+        rating_average=Case(
+            When(rating_count__gt=0, then=ExpressionWrapper(
+                F('rating_sum') * 1.0 / F('rating_count'), output_field=FloatField()
+            )),
+            default=Value(0.0),
+        )
+    )
+
+
+def _apply_rating(product_id, rating, sign):
+    """Cộng (sign=1) hoặc trừ (sign=-1) một đánh giá vào bảng tổng hợp bằng F() để tránh race."""
+    with transaction.atomic():
+        Product.objects.filter(pk=product_id).update(**{
+            'rating_count': F('rating_count') + sign,
+            'rating_sum': F('rating_sum') + sign * rating,
+            f'rating_star_{rating}': F(f'rating_star_{rating}') + sign,
+        })
+        _refresh_average(product_id)
+
+
+def rebuild_rating_summary(product_ids=None):
+    """Tính lại toàn bộ tổng hợp đánh giá từ bảng Review (dùng sau cập nhật hàng loạt)."""
+    products = Product.objects.all()
+    if product_ids is not None:
+        products = products.filter(pk__in=product_ids)
+
+    grouped = {}
+    approved = Review.objects.filter(is_approved=True, product__in=products)
+    for row in approved.order_by().values('product_id', 'rating').annotate(total=Count('id')):
+        grouped.setdefault(row['product_id'], {})[row['rating']] = row['total']
+
+    updated = []
+    for product in products.only('id'):
+        counts = grouped.get(product.id, {})
+        product.rating_count = sum(counts.values())
+        product.rating_sum = sum(star * total for star, total in counts.items())
+        product.rating_average = product.rating_sum / product.rating_count if product.rating_count else 0
+        for i in range(1, 6):
+            setattr(product, f'rating_star_{i}', counts.get(i, 0))
+        updated.append(product)
+
+    fields = ['rating_count', 'rating_sum', 'rating_average'] + [f'rating_star_{i}' for i in range(1, 6)]
+    Product.objects.bulk_update(updated, fields, batch_size=500)
+    return len(updated)
+
+
+@receiver(pre_save, sender=Review)
+def remember_previous_review(sender, instance, **kwargs):
+    instance._previous_state = None
+    if instance.pk:
+        instance._previous_state = (
+            Review.objects.filter(pk=instance.pk).values_list('product_id', 'rating', 'is_approved').first()
+        )
+
+
+def _refresh_cached_product(review):
+    # Tổng hợp được cập nhật bằng F() trong DB; đồng bộ lại Product đang gắn trên review
+    # để lần save() sau của instance đó không ghi đè bằng số cũ
+    if Review.product.is_cached(review):
+        review.product.refresh_from_db(fields=Product.RATING_FIELDS)
+
+
+@receiver(post_save, sender=Review)
+def update_rating_summary_on_save(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_state', None)
+    current = (instance.product_id, instance.rating, instance.is_approved)
+    if previous == current:
+        return
+    with transaction.atomic():
+        if previous and previous[2]:
+            _apply_rating(previous[0], previous[1], -1)
+        if instance.is_approved:
+            _apply_rating(instance.product_id, instance.rating, 1)
+    _refresh_cached_product(instance)
+
+
+@receiver(post_delete, sender=Review)
+def update_rating_summary_on_delete(sender, instance, **kwargs):
+    if instance.is_approved:
+        _apply_rating(instance.product_id, instance.rating, -1)
+        _refresh_cached_product(instance)
@@ -1,3 +1,32 @@
+from django.contrib.auth.models import User
 from django.test import TestCase
 
-# Create your tests here.
+from books.models import Category, Product
+from .models import Review
+
+
+class RatingSummaryTests(TestCase):
+    def setUp(self):
+        category = Category.objects.create(name="Văn học")
+        self.product = Product.objects.create(name="Nhà giả kim", category=category, price=90000)
+        self.user = User.objects.create_user(username='reader', password='secret')
+
+    def test_saving_stale_product_keeps_rating_summary(self):
+        stale = Product.objects.get(pk=self.product.pk)
+        Review.objects.create(product=self.product, user=self.user, rating=5, comment="Hay")
+
+        stale.price = 95000
+        stale.save()
+
+        product = Product.objects.get(pk=self.product.pk)
+        self.assertEqual(product.price, 95000)
+        self.assertEqual(product.rating_count, 1)
+        self.assertEqual(product.rating_average, 5.0)
+        self.assertEqual(product.rating_star_5, 1)
+
+    def test_review_refreshes_attached_product(self):
+        review = Review.objects.create(product=self.product, user=self.user, rating=4, comment="Khá")
+        self.assertEqual(review.product.rating_count, 1)
+
+        review.delete()
+        self.assertEqual(self.product.rating_count, 0)
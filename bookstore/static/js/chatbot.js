@@ -10,6 +10,7 @@
     }
 
     const askUrl = chatbotWindow.getAttribute("data-ask-url") || "";
+    const streamUrl = chatbotWindow.getAttribute("data-stream-url") || "";
     const csrfToken = chatbotWindow.getAttribute("data-csrf") || "";
 
     let userMessage = null;
@@ -39,49 +40,98 @@
         }
     };
 
+    const renderAnswer = (chatElement, text, products) => {
+        const messageElement = chatElement.querySelector(".message-content");
+        let formattedText = text
+            .replace(/\n/g, '<br>')
+            .replace(/\*\*(.*?)\*\*/g, '<strong>$1</strong>');
+
+        if (products && products.length > 0) {
+            chatElement.classList.add("has-products");
+            updateWindowSizeForProducts(products.length);
+            formattedText += '<div class="chat-products">';
+            products.forEach(p => {
+                formattedText += `
+                    <a href="${p.url}" class="chat-product-card" target="_blank">
+                        <img src="${p.image}" alt="${p.name}" onerror="this.src='/static/img/default-book-cover.jpg'">
+                        <div class="info">
+                            <h4>${p.name}</h4>
+                            <span>${p.price}</span>
+                        </div>
+                    </a>
+                `;
+            });
+            formattedText += '</div>';
+        } else {
+            chatElement.classList.remove("has-products");
+            updateWindowSizeForProducts(0);
+        }
+
+        messageElement.innerHTML = formattedText;
+    };
+
+    const renderJson = (chatElement, data) => {
+        const messageElement = chatElement.querySelector(".message-content");
+        if (data.error) {
+            messageElement.textContent = "Lỗi: " + data.error;
+        } else if (data.response) {
+            renderAnswer(chatElement, data.response, data.products);
+        } else {
+            messageElement.textContent = "Không có phản hồi.";
+        }
+    };
+
+    // Đọc từng dòng JSON (NDJSON) và hiển thị câu trả lời ngay khi nhận được
+    const readStream = async (res, chatElement) => {
+        const reader = res.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = "";
+        let text = "";
+        let products = [];
+
+        const handleEvent = (event) => {
+            if (event.type === "products") {
+                products = event.products || [];
+            } else if (event.type === "token") {
+                text += event.text;
+                renderAnswer(chatElement, text, products);
+                chatbox.scrollTo(0, chatbox.scrollHeight);
+            } else if (event.type === "error") {
+                renderAnswer(chatElement, event.message, []);
+            }
+        };
+
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            const lines = buffer.split("\n");
+            buffer = lines.pop();
+            lines.filter(line => line.trim()).forEach(line => handleEvent(JSON.parse(line)));
+        }
+        if (buffer.trim()) handleEvent(JSON.parse(buffer));
+        if (!text) {
+            chatElement.querySelector(".message-content").textContent = "Không có phản hồi.";
+        }
+    };
+
     const generateResponse = (chatElement) => {
         const messageElement = chatElement.querySelector(".message-content");
+        const url = (window.ReadableStream && window.TextDecoder && streamUrl) || askUrl;
 
-        fetch(askUrl, {
+        fetch(url, {
             method: "POST",
             headers: {
                 "Content-Type": "application/json",
                 "X-CSRFToken": csrfToken
             },
             body: JSON.stringify({ message: userMessage })
-        }).then(res => res.json()).then(data => {
-            if (data.error) {
-                messageElement.textContent = "Lỗi: " + data.error;
-            } else if (data.response) {
-                let formattedText = data.response
-                    .replace(/\n/g, '<br>')
-                    .replace(/\*\*(.*?)\*\*/g, '<strong>$1</strong>');
-
-                if (data.products && data.products.length > 0) {
-                    chatElement.classList.add("has-products");
-                    updateWindowSizeForProducts(data.products.length);
-                    formattedText += '<div class="chat-products">';
-                    data.products.forEach(p => {
-                        formattedText += `
-                            <a href="${p.url}" class="chat-product-card" target="_blank">
-                                <img src="${p.image}" alt="${p.name}" onerror="this.src='/static/img/default-book-cover.jpg'">
-                                <div class="info">
-                                    <h4>${p.name}</h4>
-                                    <span>${p.price}</span>
-                                </div>
-                            </a>
-                        `;
-                    });
-                    formattedText += '</div>';
-                } else {
-                    chatElement.classList.remove("has-products");
-                    updateWindowSizeForProducts(0);
-                }
-
-                messageElement.innerHTML = formattedText;
-            } else {
-                messageElement.textContent = "Không có phản hồi.";
+        }).then(res => {
+            const contentType = res.headers.get("Content-Type") || "";
+            if (contentType.includes("ndjson") && res.body) {
+                return readStream(res, chatElement);
             }
+            return res.json().then(data => renderJson(chatElement, data));
         }).catch((err) => {
             console.error(err);
             messageElement.textContent = "Xin lỗi, đã có lỗi mạng xảy ra.";
@@ -11,33 +11,48 @@ document.addEventListener('DOMContentLoaded', function () {
     // Countdown Timer
 
 
-    // Poll for payment status
+    // Nhận trạng thái thanh toán do server đẩy về (SSE); trình duyệt cũ thì hỏi định kỳ
     const orderIdElement = document.getElementById('order-id-data');
     if (orderIdElement) {
         const disablePolling = orderIdElement.dataset.disablePolling === '1';
         if (disablePolling) return;
         const orderId = orderIdElement.dataset.orderId;
-        console.log("Start polling for Order ID:", orderId);
-
-        const pollInterval = setInterval(() => {
-            fetch(`/payment/check-status/${orderId}/`)
-                .then(response => response.json())
-                .then(data => {
-                    console.log("Payment status:", data.status);
-                    if (data.status === 'PAID') {
-                        clearInterval(pollInterval);
-
-                        // Show success modal
-                        document.getElementById('successModal').style.display = 'flex';
-
-                        // Redirect after a short delay
-                        setTimeout(() => {
-                            window.location.href = `/orders/success/${orderId}/`;
-                        }, 2000);
-                    }
-                })
-                .catch(err => console.error('Error checking status:', err));
-        }, 3000); // Check every 3 seconds
+
+        const onPaid = () => {
+            // Show success modal
+            document.getElementById('successModal').style.display = 'flex';
+
+            // Redirect after a short delay
+            setTimeout(() => {
+                window.location.href = `/orders/success/${orderId}/`;
+            }, 2000);
+        };
+
+        if (window.EventSource) {
+            const source = new EventSource(`/payment/status-stream/${orderId}/`);
+            source.addEventListener('status', (event) => {
+                const data = JSON.parse(event.data);
+                console.log("Payment status:", data.status);
+                if (data.status === 'PAID') {
+                    source.close();
+                    onPaid();
+                } else if (data.status === 'CANCELLED') {
+                    source.close();
+                }
+            });
+        } else {
+            const pollInterval = setInterval(() => {
+                fetch(`/payment/check-status/${orderId}/`)
+                    .then(response => response.json())
+                    .then(data => {
+                        if (data.status === 'PAID') {
+                            clearInterval(pollInterval);
+                            onPaid();
+                        }
+                    })
+                    .catch(err => console.error('Error checking status:', err));
+            }, 3000); // Check every 3 seconds
+        }
     }
 });
 